@@ -22,3 +22,4 @@
 from .schemas import arm_servo_schema as ServoSchema, me_arm_schema as meArmSchema
 from .arm_servo import me_armServo
 from .me_arm import me_arm
+from .trajectory import Trajectory, MOVE_CARTESIAN, MOVE_ADAPTIVE, MOVE_JOINT
@@ -29,6 +29,8 @@ from .schemas import arm_servo_schema, schema_store
 class me_armServo(object):
     """This class describes a servo attached to the meArm and associated attributes"""
 
+    __slots__ = ('_channel', '_servo', '_neutral', '_max', '_min', '_trim')
+
     def __init__(self, channel: int, attributes: ServoAttributes, neutral: float, min: float, max: float, trim: float = 0.0):
         """__init___
         Initializes me_armServo. 
@@ -22,14 +22,30 @@
 # pylint: disable=C0103
 """Module allowing control of a meArm using the RPI"""
 import time
+import math
 import logging
+import os
 import json
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from jsonschema import validate, RefResolver, Draft4Validator, ValidationError, SchemaError
 from controller import PCA9685, Servo, ServoAttributes, MiuzeiSG90Attributes, ES08MAIIAttributes, CustomServoAttributes, software_reset
-from kinematics import Kinematics, Point
+from controller.PCA9685 import resolve_backend
+from controller.calibration import DEFAULT_CALIBRATION_FILE
+from controller.tracing import Tracer, DEFAULT_SAMPLE_RATE
+from kinematics import Kinematics, IncrementalSolver, Point
 from .arm_servo import me_armServo
 from .arm_kinematics import me_armKinematics
 from .schemas import me_arm_schema, schema_store
+from .reachability import ReachabilityIndex, BoundaryProjector, OUTSIDE, INSIDE, BOUNDARY, DEFAULT_VOXEL_SIZE
+from .trajectory import Trajectory, TrajectoryCompiler, TrajectoryExecutor, MOVE_CARTESIAN, MOVE_JOINT, MOVE_ADAPTIVE
+
+IK_CLOSED_FORM = 'closed-form'
+IK_INCREMENTAL = 'incremental'
+
+# shortest step of an adaptive move in mm, keeps moves close to singularities finite
+ADAPTIVE_MIN_STEP = 0.1
 
 class me_arm(object):
     """Control meArm"""
@@ -57,6 +73,8 @@ class me_arm(object):
 
     _instances = {}
     _controllers: [int] = []
+    _registry_lock = threading.RLock()
+    _boot_timing = {}
 
     def __init__(self, 
             controller: PCA9685,
@@ -65,7 +83,8 @@ class me_arm(object):
             shoulder_channel: int = 13,
             gripper_channel: int = 14,
             initialize: bool = True,
-            logging_level: str = 'INFO'):
+            logging_level: str = 'INFO',
+            trace_sample_rate: int = DEFAULT_SAMPLE_RATE):
         """__init__
         Default initialization of arm. Avoid using this and instead create a meArm using the meArm.createWithParameters
         method, which ensures that a meArm is not registered twice.
@@ -90,11 +109,16 @@ class me_arm(object):
 
         :param logging_level: The logging level to use for this arm. 
         :type logging_level: string
+
+        :param trace_sample_rate: Log one in trace_sample_rate movement steps. 0 disables the
+                                  logging of movement steps.
+        :type trace_sample_rate: int
         """
         self._servo_tag: str = str(hip_channel).zfill(2) + str(elbow_channel).zfill(2) + str(shoulder_channel).zfill(2) + str(gripper_channel).zfill(2)
         self._id: str = str(controller.address).zfill(6) + self._servo_tag
         self._logger = logging.getLogger("%s.%s" % (__name__, self._id))
         self._logger.setLevel(logging_level)
+        self._tracer = Tracer(self._logger.name, trace_sample_rate)
 
         if hip_channel < 0 or hip_channel > 15 or \
            elbow_channel < 0 or elbow_channel > 15 or \
@@ -109,21 +133,36 @@ class me_arm(object):
             self._logger.error(msg)
             raise Exception(msg)
 
-        if self._id in me_arm._instances:
-            msg = "meArm Instance already exists. Cannot create a new instance. Release the existing \
-                instance by calling me_arm.delete()"
-            self._logger.error(msg)
-            raise Exception(msg)
+        with me_arm._registry_lock:
+            if self._id in me_arm._instances:
+                msg = "meArm Instance already exists. Cannot create a new instance. Release the existing \
+                    instance by calling me_arm.delete()"
+                self._logger.error(msg)
+                raise Exception(msg)
         
         self._controller = controller
         self._kinematics = Kinematics()
         self._turnedOff = False
+        self._reachability = None
+        self._reachability_voxel = DEFAULT_VOXEL_SIZE
+        self._reachability_directory = None
+        self._reachability_lock = threading.Lock()
+        self._reachability_thread = None
+        self._projector = None
+        self._clamp = False
+        self._configuration = None
+        self._ik_mode = IK_CLOSED_FORM
+        self._solver = None
+        self._planned_steps = 0
+        self._executor = TrajectoryExecutor(self)
+        self._baseline_steps = 0
 
         self.__setup_defaults(hip_channel, elbow_channel, shoulder_channel, gripper_channel)
 
         if initialize: self.initialize()
-        me_arm._instances[self._id] = self
-        if controller.address not in me_arm._controllers: me_arm._controllers.append(controller.address)
+        with me_arm._registry_lock:
+            me_arm._instances[self._id] = self
+            if controller.address not in me_arm._controllers: me_arm._controllers.append(controller.address)
         self._logger.info("meArm with id %s created", self._id)
     
     def __setup_defaults(self, hip_channel: int, elbow_channel: int, shoulder_channel: int, gripper_channel: int):
@@ -152,12 +191,16 @@ class me_arm(object):
         self._gripper_servo = me_armServo(gripper_channel, MiuzeiSG90Attributes(), 
                                 0, me_arm.gripper_open_angle, me_arm.gripper_closed_angle, me_arm.gripper_trim)     
         self._position = Point.fromCartesian(0, 0, 0)
+        self._hip_angle = None
+        self._shoulder_angle = None
+        self._elbow_angle = None
 
     @classmethod
     def boot_from_json_file(cls, json_file:str):
         """boot_from_json_file
         Generates a meArm environment from json file
-        :param json_file: name of the file containing the json data. Must adhere to me_arm.meArmSchema
+        :param json_file: name of the file containing the json data. Must adhere to me_arm.meArmSchema.
+                          Relative cache paths in the file are resolved against its directory.
         :type json_file: str
         """
         with open(json_file) as file:
@@ -167,7 +210,7 @@ class me_arm(object):
             validator.check_schema(me_arm_schema)
             #if not validator.is_valid(data):
             #    raise ValidationError('Could not validate meArm json. Check your json file', instance = 1)
-        return cls.boot_from_dict(data)
+        return cls.boot_from_dict(data, os.path.dirname(os.path.abspath(json_file)))
 
     @classmethod
     def boot_from_json(cls, json_string:str):
@@ -185,14 +228,52 @@ class me_arm(object):
         return cls.boot_from_dict(data)
 
     @classmethod
-    def boot_from_dict(cls, data:{}):
+    def boot_from_dict(cls, data:{}, base_directory: str = None):
         """boot_from_dict
         Generates a meArm environment from dictionary
         :param data: The dictionary containing the servo data. Must adhere to me_arm.meArmSchema
         :type data: dictionary
+        :param base_directory: Directory against which the relative reachability cache directories and
+                               calibration files are resolved. None for the working directory.
+        :type base_directory: str
         """
+        # Boards on different buses boot in parallel, boards sharing a bus one after another.
+        buses = {}
         for c in data:
-            controller = PCA9685.from_dict(c['controller'])
+            key = (resolve_backend(c['controller'].get('backend')), c['controller'].get('busnum'))
+            buses.setdefault(key, []).append(c)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(buses) or 1, thread_name_prefix='meArm-boot') as pool:
+            timings = dict(zip(buses, pool.map(partial(cls._boot_bus, base_directory=base_directory), buses.values())))
+        cls._boot_timing = {'total': time.perf_counter() - start, 'buses': timings}
+        logging.getLogger(__name__).info('Booted %d controllers on %d buses in %.3fs',
+                                         len(data), len(buses), cls._boot_timing['total'])
+        return cls._instances
+
+    @classmethod
+    def _boot_bus(cls, data: [], base_directory: str = None) -> {}:
+        """_boot_bus
+        Boots the controllers and arms on one bus. All arms on the bus move to their neutral position
+        together and are turned off after a single settle time.
+
+        :param data: The controller entries of the environment dictionary sharing the bus.
+        :type data: list
+        :param base_directory: Directory against which relative cache paths are resolved.
+        :type base_directory: str
+
+        :return: Boot time in seconds per controller address.
+        :rtype: dictionary
+        """
+        timing = {}
+        arms = []
+        for c in data:
+            start = time.perf_counter()
+            settings = c['controller']
+            if base_directory is not None:
+                settings = dict(settings)
+                settings['calibration_file'] = os.path.join(base_directory, settings.get('calibration_file', DEFAULT_CALIBRATION_FILE))
+            controller = PCA9685.from_dict(settings)
             for a in c['arms']:
                 level = "INFO"
                 s = a['servos']
@@ -201,17 +282,37 @@ class me_arm(object):
 
                 if id in me_arm._instances: continue
                 if a['logging_level'] is not None: level = a['logging_level']
-                obj = cls(controller, s['hip']['channel'], s['elbow']['channel'], s['shoulder']['channel'], s['gripper']['channel'], False, level)
+                obj = cls(controller, s['hip']['channel'], s['elbow']['channel'], s['shoulder']['channel'], s['gripper']['channel'], False, level,
+                          a.get('trace-sample-rate', DEFAULT_SAMPLE_RATE))
                 obj._hip_servo = me_armServo.from_dict(s['hip'])
                 obj._shoulder_servo = me_armServo.from_dict(s['shoulder']) 
                 obj._elbow_servo = me_armServo.from_dict(s['elbow']) 
                 obj._gripper_servo = me_armServo.from_dict(s['gripper'])
                 obj._arm_kinematics = me_armKinematics.from_dict(a['kinematics'])
-                obj._kinematics = Kinematics(False, obj._arm_kinematics.humerus, obj._arm_kinematics.radius, obj._arm_kinematics.clavicle + obj._arm_kinematics.phalanx)
+                cache = a.get('ik-cache', {})
+                obj._kinematics = Kinematics(False, obj._arm_kinematics.humerus, obj._arm_kinematics.radius, obj._arm_kinematics.clavicle + obj._arm_kinematics.phalanx,
+                                             cache.get('size', 0))
                 obj._inc = a['angle-increment']
-                obj.initialize()
-                cls._instances[id] = obj
-        return cls._instances
+                if 'reachability' in a:
+                    obj._reachability_voxel = a['reachability'].get('voxel-size', DEFAULT_VOXEL_SIZE)
+                    directory = a['reachability'].get('cache-directory')
+                    if directory is not None and base_directory is not None:
+                        directory = os.path.join(base_directory, directory)
+                    obj._reachability_directory = directory
+                obj._clamp = a.get('clamp-to-reachable', False)
+                if 'control-period' in a:
+                    obj._executor = TrajectoryExecutor(obj, a['control-period'] / 1000.0)
+                obj._ik_mode = a.get('ik-mode', IK_CLOSED_FORM)
+                obj.initialize(False)
+                arms.append(obj)
+                with cls._registry_lock:
+                    cls._instances[id] = obj
+            timing[controller.address] = time.perf_counter() - start
+        if arms:
+            time.sleep(0.3)
+            for obj in arms:
+                obj.turn_off()
+        return timing
 
     @classmethod
     def createWithServoParameters(cls, controller: PCA9685,
@@ -260,13 +361,16 @@ class me_arm(object):
         :type clear:    bool
         """
         arm: cls = None
+        interfaces = []
         for key  in me_arm._instances:
             arm = me_arm._instances[key]
             arm.reset()
             arm.turn_off()
+            if arm._controller.i2c not in interfaces: interfaces.append(arm._controller.i2c)
         if clear: 
             cls._instances.clear()
-            software_reset()
+            for i2c in interfaces or [None]:
+                software_reset(i2c)
 
     @classmethod
     def get(cls, id: str):
@@ -293,6 +397,16 @@ class me_arm(object):
         """
         return cls._instances.keys()
 
+    @classmethod
+    def get_boot_timing(cls) -> {}:
+        """get_boot_timing
+        Gets the timing of the last boot from dictionary.
+
+        :return: Total boot time in seconds and boot time per controller address grouped by bus.
+        :rtype: dictionary
+        """
+        return cls._boot_timing
+
     @classmethod
     def get_controllers(cls) -> [int]:
         """get_controllers
@@ -330,6 +444,221 @@ class me_arm(object):
         """
         return self._position
 
+    @property
+    def ik_mode(self) -> str:
+        """Gets the inverse kinematics mode, 'closed-form' or 'incremental'
+
+        :return: The inverse kinematics mode
+        :rtype: str
+        """
+        return self._ik_mode
+
+    @ik_mode.setter
+    def ik_mode(self, value: str):
+        """Sets the inverse kinematics mode
+
+        :param value: 'closed-form' to solve every point from scratch, 'incremental' to update the
+                      previous solution with the Jacobian of the arm for small steps
+        :type value: str
+        """
+        if value not in (IK_CLOSED_FORM, IK_INCREMENTAL):
+            msg = "Unknown inverse kinematics mode %s" % value
+            self._logger.error(msg)
+            raise ValueError(msg)
+        self._ik_mode = value
+
+    @property
+    def ik_statistics(self) -> {}:
+        """Gets the number of incremental and closed-form solutions of the incremental solver
+
+        :return: The solver statistics, empty in closed-form mode
+        :rtype: dictionary
+        """
+        solver = self._solver
+        return solver.statistics if solver is not None else {}
+
+    @property
+    def step_statistics(self) -> {}:
+        """Gets the number of steps planned by adaptive moves and the number of steps the same moves
+        take at their fixed resolution
+
+        :return: The planned and baseline step counts
+        :rtype: dictionary
+        """
+        return {'planned': self._planned_steps, 'baseline': self._baseline_steps}
+
+    @property
+    def control_period(self) -> float:
+        """Gets the control period in seconds at which trajectories are executed
+
+        :return: The control period, None if frames are written as fast as possible
+        :rtype: float
+        """
+        return self._executor.period
+
+    @control_period.setter
+    def control_period(self, value: float):
+        """Sets the control period in seconds at which trajectories are executed
+
+        :param value: The control period, for example 0.02 for one frame per 50Hz PWM cycle. None to
+                      write frames as fast as possible.
+        :type value: float
+        """
+        if value is not None and value <= 0:
+            msg = "Control period must be greater than 0"
+            self._logger.error(msg)
+            raise ValueError(msg)
+        self._executor = TrajectoryExecutor(self, value)
+
+    @property
+    def execution_statistics(self) -> {}:
+        """Gets the written, dropped and overrun frames and the write jitter of trajectory executions
+
+        :return: The execution statistics
+        :rtype: dictionary
+        """
+        return self._executor.statistics
+
+    @property
+    def ik_cache_statistics(self) -> {}:
+        """Gets size, capacity, hits and misses of the inverse kinematics cache
+
+        :return: The cache statistics
+        :rtype: dictionary
+        """
+        return self._kinematics.cacheStatistics
+
+    def _check_configuration(self):
+        """_check_configuration
+        Drops the inverse kinematics cache, the incremental solver, the reachability index and the
+        projector when the kinematics, the servos, their trims or the inverse kinematics mode have
+        changed since they were last used.
+        """
+        configuration = (self._kinematics, self._ik_mode, self._hip_servo, self._shoulder_servo, self._elbow_servo,
+                         self._hip_servo.trim, self._shoulder_servo.trim, self._elbow_servo.trim)
+        if configuration != self._configuration:
+            with self._reachability_lock:
+                if self._configuration is not None:
+                    self._logger.info("Arm configuration changed, clearing kinematics cache and reachability")
+                self._kinematics.clearCache()
+                self._solver = IncrementalSolver(self._kinematics) if self._ik_mode == IK_INCREMENTAL else None
+                self._reachability = None
+                self._projector = None
+                self._configuration = configuration
+
+    @property
+    def reachability(self) -> ReachabilityIndex:
+        """Gets the reachability index of the arm, waiting for it to be loaded or built.
+
+        :return: The reachability index
+        :rtype: ReachabilityIndex
+        """
+        index = self._reachability_index()
+        thread = self._reachability_thread
+        if index is None and thread is not None:
+            thread.join()
+            index = self._reachability
+        if index is None:
+            index = self._build_reachability(self._configuration)
+        return index
+
+    def _reachability_index(self) -> ReachabilityIndex:
+        """_reachability_index
+        Gets the reachability index if it is available. The first call starts loading or building it
+        on a background thread, so booting the arm does not wait for it.
+
+        :return: The reachability index, None while it is being loaded or built
+        :rtype: ReachabilityIndex
+        """
+        index = self._reachability
+        if index is None and self._reachability_thread is None:
+            with self._reachability_lock:
+                if self._reachability is None and self._reachability_thread is None:
+                    self._reachability_thread = threading.Thread(
+                        target=self._build_reachability, args=(self._configuration,),
+                        name='meArm-reachability-%s' % self._id, daemon=True)
+                    self._reachability_thread.start()
+        return index
+
+    def _build_reachability(self, configuration: tuple) -> ReachabilityIndex:
+        """_build_reachability
+        Loads or builds the reachability index, and the projector if the arm clamps unreachable
+        targets. They are only kept if the arm configuration has not changed meanwhile.
+
+        :param configuration: The arm configuration the index is built for.
+        :type configuration: tuple
+
+        :return: The reachability index
+        :rtype: ReachabilityIndex
+        """
+        try:
+            limits = [(s.min, s.max, s.trim) for s in (self._hip_servo, self._shoulder_servo, self._elbow_servo)]
+            index = ReachabilityIndex.load_or_build(
+                self._kinematics, limits, self._reachability_voxel, self._reachability_directory)
+            with self._reachability_lock:
+                if self._configuration is configuration:
+                    self._reachability = index
+            if self._clamp and self._projector is None:
+                projector = BoundaryProjector.build(self._kinematics, limits)
+                with self._reachability_lock:
+                    if self._configuration is configuration and self._projector is None:
+                        self._projector = projector
+            return index
+        except Exception:
+            self._logger.exception("Could not build the reachability index")
+            raise
+        finally:
+            if self._reachability_thread is threading.current_thread():
+                self._reachability_thread = None
+
+    @property
+    def projector(self) -> BoundaryProjector:
+        """Gets the projector onto the reachable space of the arm. It is built on first use, or
+        together with the reachability index if the arm clamps unreachable targets.
+
+        :return: The boundary projector
+        :rtype: BoundaryProjector
+        """
+        projector = self._projector
+        thread = self._reachability_thread
+        if projector is None and thread is not None and thread is not threading.current_thread():
+            thread.join()
+            projector = self._projector
+        if projector is None:
+            with self._reachability_lock:
+                if self._projector is None:
+                    limits = [(s.min, s.max, s.trim) for s in (self._hip_servo, self._shoulder_servo, self._elbow_servo)]
+                    self._projector = BoundaryProjector.build(self._kinematics, limits)
+                projector = self._projector
+        return projector
+
+    @property
+    def clamp(self) -> bool:
+        """Gets whether unreachable targets are moved to the nearest reachable point by default
+
+        :return: True to clamp unreachable targets
+        :rtype: bool
+        """
+        return self._clamp
+
+    @clamp.setter
+    def clamp(self, value: bool):
+        """Sets whether unreachable targets are moved to the nearest reachable point by default
+
+        :param value: True to clamp unreachable targets
+        :type value: bool
+        """
+        self._clamp = value
+
+    @property
+    def tracer(self) -> Tracer:
+        """Gets the tracer counting and sampling the movement steps of the arm
+
+        :return: The tracer
+        :rtype: Tracer
+        """
+        return self._tracer
+
     def delete(self):
         """delete
         Deletes the meArm
@@ -348,23 +677,71 @@ class me_arm(object):
         """is_reachable
 
         Returns True if the point is (theoretically) reachable by the gripper and the associated 
-        servo angles
+        servo angles. Points the reachability index places outside the reachable space are rejected
+        without inverse kinematics, points inside skip the servo limit checks. Until the index is
+        available every point gets the exact check. The angles come from the closed-form inverse
+        kinematics, so probing points leaves the incremental solver of the motion path alone.
 
         :param point: The point to evaluate
         :type point: Point
 
-        :return: A tuple indicating whether the point is reachable and the associated hip, shoulder and elbow angles
+        :return: A tuple indicating whether the point is reachable and the associated hip, shoulder and elbow angles.
+                 The angles are NaN if the arm geometry cannot reach the point.
         :rtype: (bool, float, float, float)
         
         """
-        hip, shoulder, elbow = self._kinematics.fromCartesian(point.x, point.y, point.z)
+        return self._reachable(point, False)
+
+    def _reachable(self, point: Point, move: bool) -> (bool, float, float, float):
+        """_reachable
+        is_reachable for a point that is either probed or moved to. Points the arm moves to are
+        solved by the incremental solver if the arm has one, which advances its state.
+
+        :param point: The point to evaluate
+        :type point: Point
+        :param move: True if the arm moves to the point.
+        :type move: bool
+
+        :rtype: (bool, float, float, float)
+        """
+        self._check_configuration()
+        index = self._reachability_index()
+        state = BOUNDARY if index is None else index.classify(point.x, point.y, point.z)
+        if state == OUTSIDE:
+            return False, math.nan, math.nan, math.nan
+        try:
+            if move and self._solver is not None:
+                hip, shoulder, elbow = self._solver.solve(point.x, point.y, point.z)
+            else:
+                hip, shoulder, elbow = self._kinematics.fromCartesian(point.x, point.y, point.z)
+        except Exception:
+            return False, math.nan, math.nan, math.nan
+        if state == INSIDE:
+            return True, hip, shoulder, elbow
         isReachable = True
         if hip - self._hip_servo.trim < self._hip_servo.min or hip - self._hip_servo.trim > self._hip_servo.max: isReachable = False
         if shoulder - self._shoulder_servo.trim < self._shoulder_servo.min or shoulder - self._shoulder_servo.trim > self._shoulder_servo.max: isReachable = False
         if elbow - self._elbow_servo.trim < self._elbow_servo.min or elbow - self._elbow_servo.trim > self._elbow_servo.max: isReachable = False
         return isReachable, hip, shoulder, elbow
 
-    def go_directly_to_point(self, target: Point, raiseOutOfBoundsException: bool = True) -> bool:
+    def project_to_reachable(self, point: Point) -> Point:
+        """project_to_reachable
+
+        Finds the reachable point nearest to a point.
+
+        :param point: The point to project
+        :type point: Point
+
+        :return: The point itself if it is reachable, otherwise the nearest reachable point
+        :rtype: Point
+        """
+        if self.is_reachable(point)[0]:
+            return point
+        x, y, z = self.projector.project(point.x, point.y, point.z,
+                                         lambda x, y, z: self.is_reachable(Point.fromCartesian(x, y, z))[0])
+        return Point.fromCartesian(x, y, z)
+
+    def go_directly_to_point(self, target: Point, raiseOutOfBoundsException: bool = True, clamp: bool = None) -> bool:
         """go_directly_to_point
         
         Set servo angles so as to place the gripper at a given Cartesian point as quickly as possible, 
@@ -374,45 +751,124 @@ class me_arm(object):
         :type target: Point
         :param raiseOutOfBoundsException: True to raise an outOfBoundsException if target is not reachable.
         :type raiseOutOfBoundsException: bool
+        :param clamp: True to go to the nearest reachable point if the target is not reachable. None to use the
+                      clamp setting of the arm.
+        :type clamp: bool
 
         :return: True if the operation was executed. False otherwise. False will be returned if the 
                  target is considered unreachable by the arm.
         :rtype: bool
         """
-        is_reachable, hip, shoulder, elbow = self.is_reachable(target)
+        target, is_reachable, hip, shoulder, elbow = self._resolve_target(target, clamp, True)
         if not is_reachable:
             msg = "Point (%f, %f, %f) is not reachable" % (target.x, target.y, target.z)
             self._logger.error(msg)
             if raiseOutOfBoundsException: raise Exception(msg)
             return False       
 
-        self._controller.set_servo_angle(self._hip_servo.channel, hip - self._hip_servo.trim )
-        self._controller.set_servo_angle(self._shoulder_servo.channel, shoulder - self._shoulder_servo.trim)
-        self._controller.set_servo_angle(self._elbow_servo.channel, elbow - self._elbow_servo.trim)
+        self._set_joint_angles(target, hip, shoulder, elbow)
+        return True
+
+    def _resolve_target(self, target: Point, clamp: bool, move: bool = False) -> (Point, bool, float, float, float):
+        """_resolve_target
+        Solves the joint angles for a target, replacing an unreachable target by the nearest
+        reachable point when clamping.
+
+        :param target: The target point of the operation
+        :type target: Point
+        :param clamp: True to clamp unreachable targets. None to use the clamp setting of the arm.
+        :type clamp: bool
+        :param move: True if the arm moves to the target, so the incremental solver may solve it.
+        :type move: bool
+
+        :return: The (possibly clamped) target, whether it is reachable and the hip, shoulder and elbow angles.
+        :rtype: (Point, bool, float, float, float)
+        """
+        is_reachable, hip, shoulder, elbow = self._reachable(target, move)
+        if not is_reachable and (self._clamp if clamp is None else clamp):
+            clamped = self.project_to_reachable(target)
+            self._tracer.trace('clamp', "Point (%f, %f, %f) clamped to (%f, %f, %f)",
+                               target.x, target.y, target.z, clamped.x, clamped.y, clamped.z)
+            target = clamped
+            is_reachable, hip, shoulder, elbow = self._reachable(target, move)
+        if not is_reachable and move and self._solver is not None:
+            # the arm stays where it is, the solver state must not run ahead of it
+            self._solver.reset()
+        return target, is_reachable, hip, shoulder, elbow
+
+    def _set_joint_angles(self, target: Point, hip: float, shoulder: float, elbow: float):
+        """_set_joint_angles
+        Writes the hip, shoulder and elbow angles in one frame and records the new position.
+
+        :param target: The gripper position the angles place the gripper at
+        :type target: Point
+        :param hip: The hip angle
+        :type hip: float
+        :param shoulder: The shoulder angle
+        :type shoulder: float
+        :param elbow: The elbow angle
+        :type elbow: float
+        """
+        self._controller.set_servo_angles({
+            self._hip_servo.channel: hip - self._hip_servo.trim,
+            self._shoulder_servo.channel: shoulder - self._shoulder_servo.trim,
+            self._elbow_servo.channel: elbow - self._elbow_servo.trim
+        })
         self._position = target
         self._hip_angle = hip
         self._shoulder_angle = shoulder
         self._elbow_angle = elbow
-        self._logger.info("Goto point (%f,%f, %f) -> (%f, %f, %f)",
+        self._tracer.trace('goto', "Goto point (%f,%f, %f) -> (%f, %f, %f)",
             target.x, target.y, target.z,
             hip - self._hip_servo.trim , shoulder - self._shoulder_servo.trim, elbow - self._elbow_servo.trim)
-        return True
 
-    def go_to_point(self, target: Point, resolution: float = 10, raiseOutOfBoundsException: bool = True) -> int:
+    def joint_resolution(self) -> (float, float, float):
+        """joint_resolution
+        Gets the hip, shoulder and elbow angle changes that move the respective servo by at most one tick.
+
+        :return: The hip, shoulder and elbow angles per tick in degrees
+        :rtype: (float, float, float)
+        """
+        return (self._controller.get_servo(self._hip_servo.channel).angle_resolution,
+                self._controller.get_servo(self._shoulder_servo.channel).angle_resolution,
+                self._controller.get_servo(self._elbow_servo.channel).angle_resolution)
+
+    def go_to_point(self, target: Point, resolution: float = 10, raiseOutOfBoundsException: bool = True,
+                    clamp: bool = None, mode: str = MOVE_CARTESIAN) -> int:
         """go_to_point
         
-        Travel in a straight line from current position to a requested position
+        Travel from current position to a requested position. In cartesian mode the gripper moves
+        in a straight line, solving the inverse kinematics for every step. Adaptive mode moves in
+        a straight line as well, but chooses each step so the largest joint change is about one
+        servo tick. In joint mode only the target is solved and the hip, shoulder and elbow angles
+        are interpolated, with as many steps as needed to move no servo by more than one tick per step.
         
         :param target: The target point of the operation
         :type target: Point
-        :param resolution: The increment for each movement along the path.
+        :param resolution: The increment for each movement along the path. In adaptive mode the number
+                           of steps at this resolution is reported as the baseline. Ignored in joint mode.
         :type resolution: int
         :param raiseOutOfBoundsException: True to raise an outOfBoundsException if target is not reachable.
         :type raiseOutOfBoundsException: bool
+        :param clamp: True to replace unreachable points on the path by the nearest reachable points. None to
+                      use the clamp setting of the arm.
+        :type clamp: bool
+        :param mode: 'cartesian' to move in a straight line, 'adaptive' to move in a straight line with
+                     steps of about one servo tick, 'joint' to interpolate the joint angles.
+        :type mode: str
 
         :return: The number of movements executed
         :rtype: int       
         """
+        if mode == MOVE_JOINT:
+            return self._go_to_point_joint(target, raiseOutOfBoundsException, clamp)
+        if mode == MOVE_ADAPTIVE:
+            return self._go_to_point_adaptive(target, resolution, raiseOutOfBoundsException, clamp)
+        if mode != MOVE_CARTESIAN:
+            msg = "Unknown move mode %s" % mode
+            self._logger.error(msg)
+            raise ValueError(msg)
+
         dist = self._position.distance(target)
         p = self._position
         cycles = dist/resolution
@@ -424,22 +880,178 @@ class me_arm(object):
         dz = (target.z - p.z) / cycles
         i = 1
         c = 1
+        skipped = self._controller.skipped_writes
         while i < cycles:
             p1 = Point.fromCartesian(p.x + dx, p.y + dy, p.z + dz)
-            if self.go_directly_to_point(p1, raiseOutOfBoundsException): c += 1
+            if self.go_directly_to_point(p1, raiseOutOfBoundsException, clamp): c += 1
             i += 1
             p = p1
-        self.go_directly_to_point(target, raiseOutOfBoundsException)
+        self.go_directly_to_point(target, raiseOutOfBoundsException, clamp)
+        self._logger.info("Moved in %d steps, %d unchanged servo writes skipped", c,
+                          self._controller.skipped_writes - skipped)
         return c
 
-    def initialize(self):
-        """Registers the servo.""" 
+    def _go_to_point_adaptive(self, target: Point, resolution: float, raiseOutOfBoundsException: bool,
+                              clamp: bool) -> int:
+        """_go_to_point_adaptive
+        Travel in a straight line to a requested position. The length of each step is chosen from
+        the joint rates at the current angles so that the joint with the largest change moves by
+        about one servo tick.
+
+        :param target: The target point of the operation
+        :type target: Point
+        :param resolution: The fixed step length the planned number of steps is reported against.
+        :type resolution: float
+        :param raiseOutOfBoundsException: True to raise an outOfBoundsException if target is not reachable.
+        :type raiseOutOfBoundsException: bool
+        :param clamp: True to replace unreachable points on the path by the nearest reachable points. None to
+                      use the clamp setting of the arm.
+        :type clamp: bool
+
+        :return: The number of movements executed
+        :rtype: int
+        """
+        p = self._position
+        dist = p.distance(target)
+        if dist == 0:
+            return 0
+        if self._hip_angle is None:
+            return 1 if self.go_directly_to_point(target, raiseOutOfBoundsException, clamp) else 0
+
+        ux = (target.x - p.x) / dist
+        uy = (target.y - p.y) / dist
+        uz = (target.z - p.z) / dist
+        rh, rs, re = self.joint_resolution()
+        travelled = 0.0
+        steps = 1
+        c = 1
+        skipped = self._controller.skipped_writes
+        while True:
+            dh, ds, de = self._kinematics.jointRates(self._hip_angle, self._shoulder_angle, self._elbow_angle, ux, uy, uz)
+            step = min(rh / abs(dh) if dh else math.inf,
+                       rs / abs(ds) if ds else math.inf,
+                       re / abs(de) if de else math.inf)
+            travelled += max(step, ADAPTIVE_MIN_STEP)
+            if travelled >= dist:
+                break
+            steps += 1
+            p1 = Point.fromCartesian(p.x + ux * travelled, p.y + uy * travelled, p.z + uz * travelled)
+            if self.go_directly_to_point(p1, raiseOutOfBoundsException, clamp): c += 1
+        self.go_directly_to_point(target, raiseOutOfBoundsException, clamp)
+
+        baseline = int(math.ceil(dist / resolution))
+        self._planned_steps += steps
+        self._baseline_steps += baseline
+        self._logger.info("Moved in %d adaptive steps (%d at %.2fmm resolution), %d unchanged servo writes skipped",
+                          c, baseline, resolution, self._controller.skipped_writes - skipped)
+        return c
+
+    def _go_to_point_joint(self, target: Point, raiseOutOfBoundsException: bool, clamp: bool) -> int:
+        """_go_to_point_joint
+        Travel to a requested position interpolating the joint angles. The joint limits form a box,
+        so every interpolated set of angles between two reachable points is reachable as well.
+
+        :param target: The target point of the operation
+        :type target: Point
+        :param raiseOutOfBoundsException: True to raise an outOfBoundsException if target is not reachable.
+        :type raiseOutOfBoundsException: bool
+        :param clamp: True to go to the nearest reachable point if the target is not reachable. None to
+                      use the clamp setting of the arm.
+        :type clamp: bool
+
+        :return: The number of movements executed
+        :rtype: int
+        """
+        if self._hip_angle is None:
+            return 1 if self.go_directly_to_point(target, raiseOutOfBoundsException, clamp) else 0
+        target, is_reachable, hip, shoulder, elbow = self._resolve_target(target, clamp, True)
+        if not is_reachable:
+            msg = "Point (%f, %f, %f) is not reachable" % (target.x, target.y, target.z)
+            self._logger.error(msg)
+            if raiseOutOfBoundsException: raise Exception(msg)
+            return 0
+
+        hip0 = self._hip_angle
+        shoulder0 = self._shoulder_angle
+        elbow0 = self._elbow_angle
+        dh = hip - hip0
+        ds = shoulder - shoulder0
+        de = elbow - elbow0
+        rh, rs, re = self.joint_resolution()
+        steps = int(math.ceil(max(abs(dh) / rh, abs(ds) / rs, abs(de) / re)))
+        if steps == 0:
+            return 0
+
+        skipped = self._controller.skipped_writes
+        hip_channel = self._hip_servo.channel
+        shoulder_channel = self._shoulder_servo.channel
+        elbow_channel = self._elbow_servo.channel
+        hip0 -= self._hip_servo.trim
+        shoulder0 -= self._shoulder_servo.trim
+        elbow0 -= self._elbow_servo.trim
+        for i in range(1, steps):
+            f = i / steps
+            self._controller.set_servo_angles({
+                hip_channel: hip0 + dh * f,
+                shoulder_channel: shoulder0 + ds * f,
+                elbow_channel: elbow0 + de * f
+            })
+        self._set_joint_angles(target, hip, shoulder, elbow)
+        self._logger.info("Moved in %d joint steps, %d unchanged servo writes skipped", steps,
+                          self._controller.skipped_writes - skipped)
+        return steps
+
+    def compile_operations(self, operations: [(str, Point)], resolution: float = 2.5,
+                           mode: str = MOVE_CARTESIAN, clamp: bool = None) -> Trajectory:
+        """compile_operations
+        Compiles an operation list into a trajectory of tick frames starting at the current position.
+        Nothing is written to the controller, so unreachable points can be checked before the arm moves.
+
+        :param operations: The operations as (type, target) pairs, type being 'moveTo', 'grab', 'release'
+                           or 'test'.
+        :type operations: list of (str, Point)
+        :param resolution: The increment for each movement along the path in cartesian mode.
+        :type resolution: float
+        :param mode: 'cartesian' to move in straight lines, 'joint' to interpolate the joint angles.
+        :type mode: str
+        :param clamp: True to replace unreachable points by the nearest reachable points. None to use the
+                      clamp setting of the arm.
+        :type clamp: bool
+
+        :return: The compiled trajectory
+        :rtype: Trajectory
+        """
+        return TrajectoryCompiler(self).compile(operations, resolution, mode, clamp)
+
+    def execute_trajectory(self, trajectory: Trajectory) -> int:
+        """execute_trajectory
+        Streams the frames of a compiled trajectory to the controller, one frame per control period
+        if the arm has one.
+
+        :param trajectory: The trajectory, compiled from the current position with compile_operations.
+        :type trajectory: Trajectory
+
+        :return: The number of movements executed
+        :rtype: int
+        """
+        return self._executor.execute(trajectory)
+
+    def initialize(self, settle: bool = True):
+        """initialize
+        Registers the servos and moves the arm directly to its neutral position. 
+
+        :param settle: True to wait for the servos to reach the neutral position and turn them off.
+                       False to return immediately, leaving the servos on. The caller is then
+                       responsible for turning the arm off.
+        :type settle: bool
+        """ 
         self._controller.add_servo(self._hip_servo.channel, self._hip_servo.attributes)
         self._controller.add_servo(self._shoulder_servo.channel, self._shoulder_servo.attributes)
         self._controller.add_servo(self._elbow_servo.channel, self._elbow_servo.attributes)
         self._controller.add_servo(self._gripper_servo.channel, self._gripper_servo.attributes)
-        self.reset()
-        self.turn_off()
+        # the arm position is unknown before initialization, so there is no path to sweep along
+        self.reset(False, settle)
+        if settle: self.turn_off()
         self._logger.info("meArm with id %s initialized,", self._id)
 
     def open(self):
@@ -450,9 +1062,15 @@ class me_arm(object):
         self._controller.set_servo_angle(self._gripper_servo.channel, self._gripper_servo.min - self._gripper_servo.trim)
         time.sleep(0.3)
 
-    def reset(self):
+    def reset(self, sweep: bool = True, settle: bool = True):
         """reset
-        Resets the arm at neutral position"""
+        Resets the arm at neutral position
+
+        :param sweep: True to travel to the neutral position in a straight line, False to go there directly.
+        :type sweep: bool
+        :param settle: True to wait for the servos to reach the neutral position.
+        :type settle: bool
+        """
         self._logger.info('Resetting arm %s...', self._id)
         
         # set neutral angles
@@ -460,11 +1078,14 @@ class me_arm(object):
         shoulder = self._shoulder_servo.neutral + self._shoulder_servo.trim
         hip = self._hip_servo.neutral + self._hip_servo.trim
         x, y, z = self._kinematics.toCartesian(hip, shoulder, elbow)
-        self.go_to_point(Point.fromCartesian(x, y, z), 2.5, False)        
+        if sweep:
+            self.go_to_point(Point.fromCartesian(x, y, z), 2.5, False)        
+        else:
+            self.go_directly_to_point(Point.fromCartesian(x, y, z), False)
         self._logger.info("(%f, %f, %f) -> (%f, %f, %f", 
                           self._hip_servo.neutral, self._shoulder_servo.neutral, self._elbow_servo.neutral,
                           self._position.x, self._position.y, self._position.z)
-        time.sleep(0.3)
+        if settle: time.sleep(0.3)
 
     def turn_off(self):
         """turn_off
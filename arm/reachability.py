@@ -0,0 +1,486 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""
+    Reachability index for a meArm. The workspace is divided into cubic voxels and the lattice
+    points at the voxel corners are tested with batch inverse kinematics and the servo limits.
+    A voxel whose corners are all reachable is inside, one whose corners are all unreachable is
+    outside and everything else, widened by one voxel, is boundary. Inside and outside points are
+    classified with two bit lookups, boundary points need the exact test.
+"""
+import os
+import math
+import json
+import hashlib
+import logging
+import numpy as np
+from kinematics import Kinematics
+
+OUTSIDE = 0
+INSIDE = 1
+BOUNDARY = 2
+
+DEFAULT_VOXEL_SIZE = 10.0
+INDEX_VERSION = 1
+
+# joint angle step in degrees for sampling the workspace boundary and edge length in mm of the
+# cells the samples are bucketed in for the nearest sample search
+DEFAULT_BOUNDARY_STEP = 1.0
+DEFAULT_CELL_SIZE = 32.0
+# boundary samples are thinned to one per cube of this edge length in mm
+SAMPLE_SPACING = 2.0
+# distance in mm at which the refinement of a projected point stops
+PROJECTION_TOLERANCE = 0.1
+
+def reachable_mask(kinematics: Kinematics, limits: [(float, float, float)], xyz: np.ndarray) -> (np.ndarray, np.ndarray):
+    """reachable_mask
+    Tests points with the same comparisons as me_arm.is_reachable.
+
+    :param kinematics: The arm kinematics.
+    :type kinematics: Kinematics
+
+    :param limits: (min, max, trim) for the hip, shoulder and elbow servo.
+    :type limits: list of tuple
+
+    :param xyz: The points, one row (x, y, z) per point.
+    :type xyz: numpy.ndarray of shape (N, 3)
+
+    :return: The reachable mask and the hip, shoulder and elbow angles (NaN if the geometry cannot reach a point).
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    angles = kinematics.fromCartesian_batch(xyz)
+    reachable = ~np.isnan(angles).any(axis=1)
+    for column, (low, high, trim) in enumerate(limits):
+        servo = angles[:, column] - trim
+        reachable &= ~((servo < low) | (servo > high))
+    return reachable, angles
+
+
+def sample_boundary(kinematics: Kinematics, limits: [(float, float, float)], step: float = DEFAULT_BOUNDARY_STEP) -> np.ndarray:
+    """sample_boundary
+    Samples the surface of the reachable space. The surface is the image of the faces of the joint
+    limit box and of the faces where the arm is fully stretched or folded. Points on the faces are
+    mapped with forward kinematics and only those passing the reachability test are kept.
+
+    :param kinematics: The arm kinematics.
+    :type kinematics: Kinematics
+
+    :param limits: (min, max, trim) for the hip, shoulder and elbow servo.
+    :type limits: list of tuple
+
+    :param step: Joint angle step in degrees (radians if the kinematics use radians).
+    :type step: float
+
+    :return: The boundary points, one row (x, y, z) per point.
+    :rtype: numpy.ndarray of shape (N, 3)
+    """
+    _pi = np.pi if kinematics.useRadians else 180.0
+    epsilon = 1e-6 * _pi
+    ranges = [(low + trim + epsilon, high + trim - epsilon) for low, high, trim in limits]
+    axes = [np.append(np.arange(low, high, step), high) for low, high in ranges]
+
+    faces = []
+    for fixed in range(3):
+        free = [axis for axis in range(3) if axis != fixed]
+        grid = np.meshgrid(axes[free[0]], axes[free[1]], indexing='ij')
+        for value in ranges[fixed]:
+            angles = np.empty(grid[0].shape + (3,))
+            angles[..., fixed] = value
+            angles[..., free[0]] = grid[0]
+            angles[..., free[1]] = grid[1]
+            faces.append(angles.reshape(-1, 3))
+    # stretched and folded arm: the inner elbow angle (elbow + shoulder) at 0 or 180 degrees
+    hip, shoulder = np.meshgrid(axes[0], axes[1], indexing='ij')
+    for inner in (epsilon, _pi - epsilon):
+        faces.append(np.stack((hip.ravel(), shoulder.ravel(), inner - shoulder.ravel()), axis=1))
+
+    points = kinematics.toCartesian_batch(np.concatenate(faces))
+    points = points[reachable_mask(kinematics, limits, points)[0]]
+    # the faces are sampled much denser near the base than at full reach
+    cubes = np.floor(points / SAMPLE_SPACING).astype(np.int64)
+    return points[np.unique(cubes, axis=0, return_index=True)[1]]
+
+
+class BoundaryProjector(object):
+    """Projects points onto the nearest reachable point. The boundary samples are bucketed in grid
+    cells; a nearest sample search visits the cells in the order of the distance to their bounding
+    box and stops when the next box is farther than the best sample found."""
+
+    def __init__(self, samples: np.ndarray, cell: float = DEFAULT_CELL_SIZE):
+        """__init__
+        Initializes the projector.
+
+        :param samples: Reachable points on the boundary of the reachable space.
+        :type samples: numpy.ndarray of shape (N, 3)
+
+        :param cell: Edge length of the grid cells in mm.
+        :type cell: float
+        """
+        samples = np.asarray(samples, dtype=float).reshape(-1, 3)
+        keys = np.floor(samples / cell).astype(np.int64)
+        order = np.lexsort((keys[:, 2], keys[:, 1], keys[:, 0]))
+        self._samples = samples[order]
+        self._cell = float(cell)
+        if len(samples):
+            starts = np.unique(keys[order], axis=0, return_index=True)[1]
+            starts.sort()
+            self._starts = starts.tolist()
+            self._ends = starts[1:].tolist() + [len(samples)]
+            self._low = np.minimum.reduceat(self._samples, starts, axis=0)
+            self._high = np.maximum.reduceat(self._samples, starts, axis=0)
+        else:
+            self._starts = []
+            self._ends = []
+            self._low = np.empty((0, 3))
+            self._high = np.empty((0, 3))
+
+    @classmethod
+    def build(cls, kinematics: Kinematics, limits: [(float, float, float)],
+              step: float = DEFAULT_BOUNDARY_STEP, cell: float = DEFAULT_CELL_SIZE) -> "BoundaryProjector":
+        """build
+        Samples the boundary of the reachable space and creates a projector for it.
+
+        :param kinematics: The arm kinematics.
+        :type kinematics: Kinematics
+
+        :param limits: (min, max, trim) for the hip, shoulder and elbow servo.
+        :type limits: list of tuple
+
+        :rtype: BoundaryProjector
+        """
+        return cls(sample_boundary(kinematics, limits, step), cell)
+
+    @property
+    def samples(self) -> np.ndarray:
+        """Gets the boundary samples."""
+        return self._samples
+
+    def nearest(self, x: float, y: float, z: float) -> (float, float, float):
+        """nearest
+        Finds the boundary sample nearest to a point.
+
+        :rtype: (float, float, float)
+        """
+        if not self._starts:
+            raise ValueError('The projector has no boundary samples')
+        point = np.array((x, y, z))
+        gap = np.maximum(self._low - point, 0.0) + np.maximum(point - self._high, 0.0)
+        bound = np.einsum('ij,ij->i', gap, gap)
+        best = math.inf
+        nearest = None
+        for cell in np.argsort(bound).tolist():
+            if bound[cell] >= best:
+                break
+            d = self._samples[self._starts[cell]:self._ends[cell]] - point
+            distance = np.einsum('ij,ij->i', d, d)
+            index = distance.argmin()
+            if distance[index] < best:
+                best = distance[index]
+                nearest = self._starts[cell] + index
+        return tuple(self._samples[nearest].tolist())
+
+    def project(self, x: float, y: float, z: float, reachable, tolerance: float = PROJECTION_TOLERANCE) -> (float, float, float):
+        """project
+        Projects an unreachable point onto the nearest reachable point. Starting from the nearest
+        boundary sample, the reachable edge on the way to the point is found by bisection. The
+        result has always passed the reachability test; if the nearest sample fails it, the
+        samples are tried in the order of their distance.
+
+        :param reachable: Exact reachability test taking x, y and z.
+        :type reachable: callable
+
+        :param tolerance: Bisection stops when the interval is shorter than this, in mm.
+        :type tolerance: float
+
+        :return: A reachable point.
+        :rtype: (float, float, float)
+        """
+        inside = self.nearest(x, y, z)
+        verified = False
+        outside = (x, y, z)
+        length = math.sqrt(sum((o - i) ** 2 for o, i in zip(outside, inside)))
+        # the edge is usually within a few samples of the nearest one, try a short interval first
+        near = 2 * (SAMPLE_SPACING + self._cell)
+        if length > near:
+            point = tuple(i + (o - i) * near / length for o, i in zip(outside, inside))
+            if not reachable(*point):
+                outside = point
+                length = near
+        while length > tolerance:
+            middle = tuple((o + i) / 2 for o, i in zip(outside, inside))
+            if reachable(*middle):
+                inside = middle
+                verified = True
+            else:
+                outside = middle
+            length /= 2
+        if verified or reachable(*inside):
+            return inside
+
+        logging.getLogger(__name__).warning('Boundary sample (%f, %f, %f) is not reachable', *inside)
+        d = self._samples - (x, y, z)
+        for index in np.argsort(np.einsum('ij,ij->i', d, d)).tolist():
+            sample = tuple(self._samples[index].tolist())
+            if reachable(*sample):
+                return sample
+        raise ValueError('No reachable boundary sample for (%f, %f, %f)' % (x, y, z))
+
+
+class ReachabilityIndex(object):
+    """Voxel bitsets classifying points as inside, outside or near the boundary of the reachable space."""
+
+    def __init__(self, key: str, origin: (float, float, float), voxel: float, shape: (int, int, int),
+                 inside: bytes, boundary: bytes):
+        """__init__
+        Initializes the index from its bitsets. Use build or load_or_build to create an index.
+
+        :param key: Hash of the arm configuration the index was built for.
+        :type key: str
+
+        :param origin: Corner of the indexed box with the lowest coordinates.
+        :type origin: (float, float, float)
+
+        :param voxel: Edge length of a voxel in mm.
+        :type voxel: float
+
+        :param shape: Number of voxels along x, y and z.
+        :type shape: (int, int, int)
+
+        :param inside: Packed bits of the inside voxels in C order.
+        :type inside: bytes
+
+        :param boundary: Packed bits of the boundary voxels in C order.
+        :type boundary: bytes
+        """
+        self._key = key
+        self._origin = tuple(float(o) for o in origin)
+        self._voxel = float(voxel)
+        self._scale = 1.0 / self._voxel
+        self._shape = tuple(int(n) for n in shape)
+        self._inside = bytes(inside)
+        self._boundary = bytes(boundary)
+
+    @staticmethod
+    def config_key(kinematics: Kinematics, limits: [(float, float, float)], voxel: float) -> str:
+        """config_key
+        Hashes everything the index depends on.
+
+        :param kinematics: The arm kinematics.
+        :type kinematics: Kinematics
+
+        :param limits: (min, max, trim) for the hip, shoulder and elbow servo.
+        :type limits: list of tuple
+
+        :param voxel: Edge length of a voxel in mm.
+        :type voxel: float
+
+        :rtype: str
+        """
+        config = {
+            'version': INDEX_VERSION,
+            'kinematics': [kinematics.shoulderToElbow, kinematics.elbowToWrist, kinematics.wristToHand, kinematics.useRadians],
+            'limits': [list(limit) for limit in limits],
+            'voxel': voxel
+        }
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def build(cls, kinematics: Kinematics, limits: [(float, float, float)], voxel: float = DEFAULT_VOXEL_SIZE) -> "ReachabilityIndex":
+        """build
+        Builds the index by testing all voxel corners.
+
+        :param kinematics: The arm kinematics.
+        :type kinematics: Kinematics
+
+        :param limits: (min, max, trim) for the hip, shoulder and elbow servo.
+        :type limits: list of tuple
+
+        :param voxel: Edge length of a voxel in mm.
+        :type voxel: float
+
+        :rtype: ReachabilityIndex
+        """
+        # nothing beyond the stretched arm is reachable, one voxel of margin on each side
+        reach_z = kinematics.shoulderToElbow + kinematics.elbowToWrist
+        reach_xy = reach_z + abs(kinematics.wristToHand)
+        half = np.ceil(np.array([reach_xy, reach_xy, reach_z]) / voxel) + 1
+        shape = tuple(int(n) for n in 2 * half)
+        origin = tuple(-half * voxel)
+
+        axes = [origin[i] + voxel * np.arange(shape[i] + 1) for i in range(3)]
+        lattice = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+        corners = reachable_mask(kinematics, limits, lattice)[0].reshape(tuple(n + 1 for n in shape))
+
+        count = np.zeros(shape, dtype=np.uint8)
+        for dx in (0, 1):
+            for dy in (0, 1):
+                for dz in (0, 1):
+                    count += corners[dx:dx + shape[0], dy:dy + shape[1], dz:dz + shape[2]]
+        inside = count == 8
+        boundary = (count > 0) & ~inside
+        # widen the boundary by a voxel for features that fall between lattice points
+        dilated = boundary.copy()
+        for axis in range(3):
+            for shift in (-1, 1):
+                dilated |= np.roll(boundary, shift, axis=axis)
+        inside &= ~dilated
+
+        return cls(cls.config_key(kinematics, limits, voxel), origin, voxel, shape,
+                   np.packbits(inside, axis=None).tobytes(), np.packbits(dilated, axis=None).tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> "ReachabilityIndex":
+        """load
+        Loads an index saved with save.
+
+        :param path: The .npz file.
+        :type path: str
+
+        :rtype: ReachabilityIndex
+        """
+        with np.load(path) as data:
+            return cls(str(data['key']), tuple(data['origin']), float(data['voxel']), tuple(data['shape']),
+                       data['inside'].tobytes(), data['boundary'].tobytes())
+
+    @classmethod
+    def load_or_build(cls, kinematics: Kinematics, limits: [(float, float, float)],
+                      voxel: float = DEFAULT_VOXEL_SIZE, directory: str = None) -> "ReachabilityIndex":
+        """load_or_build
+        Loads the index for the configuration from the cache directory or builds and saves it.
+
+        :param kinematics: The arm kinematics.
+        :type kinematics: Kinematics
+
+        :param limits: (min, max, trim) for the hip, shoulder and elbow servo.
+        :type limits: list of tuple
+
+        :param voxel: Edge length of a voxel in mm.
+        :type voxel: float
+
+        :param directory: Cache directory. None to always build.
+        :type directory: str
+
+        :rtype: ReachabilityIndex
+        """
+        logger = logging.getLogger(__name__)
+        key = cls.config_key(kinematics, limits, voxel)
+        path = None if directory is None else os.path.join(directory, 'reachability-%s.npz' % key)
+        if path is not None and os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.key == key:
+                    return index
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning('Could not load reachability index %s: %s', path, e)
+        index = cls.build(kinematics, limits, voxel)
+        logger.info('Built reachability index %s with %d voxels', key, index.voxels)
+        if path is not None:
+            try:
+                index.save(path)
+            except OSError as e:
+                logger.warning('Could not save reachability index %s: %s', path, e)
+        return index
+
+    @property
+    def key(self) -> str:
+        """Gets the hash of the arm configuration the index was built for."""
+        return self._key
+
+    @property
+    def voxel(self) -> float:
+        """Gets the voxel edge length in mm."""
+        return self._voxel
+
+    @property
+    def origin(self) -> (float, float, float):
+        """Gets the corner of the indexed box with the lowest coordinates."""
+        return self._origin
+
+    @property
+    def shape(self) -> (int, int, int):
+        """Gets the number of voxels along x, y and z."""
+        return self._shape
+
+    @property
+    def voxels(self) -> int:
+        """Gets the number of voxels."""
+        return self._shape[0] * self._shape[1] * self._shape[2]
+
+    def save(self, path: str):
+        """save
+        Saves the index. The file is written next to the target and moved in place.
+
+        :param path: The .npz file.
+        :type path: str
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = path + '.tmp.npz'
+        np.savez_compressed(temp, key=self._key, origin=np.array(self._origin), voxel=self._voxel,
+                            shape=np.array(self._shape),
+                            inside=np.frombuffer(self._inside, dtype=np.uint8),
+                            boundary=np.frombuffer(self._boundary, dtype=np.uint8))
+        os.replace(temp, path)
+
+    def classify(self, x: float, y: float, z: float) -> int:
+        """classify
+        Classifies a point.
+
+        :return: OUTSIDE, INSIDE or BOUNDARY. Boundary points need the exact test.
+        :rtype: int
+        """
+        fx = (x - self._origin[0]) * self._scale
+        fy = (y - self._origin[1]) * self._scale
+        fz = (z - self._origin[2]) * self._scale
+        nx, ny, nz = self._shape
+        if fx < 0 or fy < 0 or fz < 0 or fx >= nx or fy >= ny or fz >= nz:
+            return OUTSIDE
+        bit = (int(fx) * ny + int(fy)) * nz + int(fz)
+        mask = 0x80 >> (bit & 7)
+        if self._boundary[bit >> 3] & mask:
+            return BOUNDARY
+        if self._inside[bit >> 3] & mask:
+            return INSIDE
+        return OUTSIDE
+
+    def classify_batch(self, xyz: np.ndarray) -> np.ndarray:
+        """classify_batch
+        Vectorized version of classify.
+
+        :param xyz: The points, one row (x, y, z) per point.
+        :type xyz: numpy.ndarray of shape (N, 3)
+
+        :return: OUTSIDE, INSIDE or BOUNDARY for each point.
+        :rtype: numpy.ndarray
+        """
+        xyz = np.asarray(xyz, dtype=float).reshape(-1, 3)
+        f = (xyz - np.array(self._origin)) * self._scale
+        shape = np.array(self._shape)
+        valid = ((f >= 0) & (f < shape)).all(axis=1)
+        cells = np.where(valid[:, None], f, 0).astype(np.int64)
+        bits = (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+        inside = np.unpackbits(np.frombuffer(self._inside, dtype=np.uint8))[bits] == 1
+        boundary = np.unpackbits(np.frombuffer(self._boundary, dtype=np.uint8))[bits] == 1
+        result = np.where(boundary, BOUNDARY, np.where(inside, INSIDE, OUTSIDE))
+        result[~valid] = OUTSIDE
+        return result
@@ -56,6 +56,23 @@ me_arm_schema = {
             "properties": {
                 "logging_level": {"type": "string", "enum": ["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG", "NOTSET"]},
                 "angle-increment": {"type": "number"},
+                "trace-sample-rate": {"type": "integer", "minimum": 0},
+                "clamp-to-reachable": {"type": "boolean"},
+                "control-period": {"type": "number", "minimum": 0, "exclusiveMinimum": True},
+                "ik-mode": {"type": "string", "enum": ["closed-form", "incremental"]},
+                "ik-cache": {
+                    "type": "object",
+                    "properties": {
+                        "size": {"type": "integer", "minimum": 0}
+                    }
+                },
+                "reachability": {
+                    "type": "object",
+                    "properties": {
+                        "voxel-size": {"type": "number", "minimum": 0, "exclusiveMinimum": True},
+                        "cache-directory": {"type": "string"}
+                    }
+                },
                 "servos": {
                     "type": "object",
                     "properties": {
@@ -0,0 +1,77 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Tests for the meArm package. The arms run on the simulated I2C backend."""
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from controller import simulated_i2c
+from arm import me_arm
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'me_arm.json')
+
+
+class ArmTestCase(unittest.TestCase):
+    """Boots the arms of me_arm.json on the simulated backend from a copy in a temporary directory,
+    so the caches the arms write end up there."""
+
+    def setUp(self):
+        self._environment = {key: os.environ.get(key) for key in
+                             ('MEARM_I2C_BACKEND', 'MEARM_I2C_LATENCY', 'MEARM_I2C_BUS_SPEED')}
+        os.environ['MEARM_I2C_BACKEND'] = 'simulated'
+        os.environ['MEARM_I2C_LATENCY'] = '0'
+        os.environ['MEARM_I2C_BUS_SPEED'] = '0'
+        simulated_i2c.reset()
+        self.directory = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.directory, 'me_arm.json')
+        shutil.copy(CONFIG_FILE, self.config_file)
+
+    def tearDown(self):
+        me_arm.shutdown(True)
+        simulated_i2c.reset()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        for key, value in self._environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    def write_config(self, update):
+        """Changes the configuration copy before booting.
+
+        :param update: Function receiving the configuration data to change in place.
+        """
+        with open(self.config_file) as file:
+            data = json.load(file)
+        update(data)
+        with open(self.config_file, 'w') as file:
+            json.dump(data, file)
+
+    def boot(self):
+        """Boots the configuration copy and returns the first arm.
+
+        :rtype: me_arm
+        """
+        me_arm.boot_from_json_file(self.config_file)
+        return me_arm.get(sorted(me_arm.get_names())[0])
@@ -0,0 +1,200 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for booting a meArm and its reachability index."""
+import os
+import copy
+import json
+import time
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+from jsonschema import Draft4Validator
+from arm import me_arm
+from arm.schemas import me_arm_schema
+from arm.reachability import OUTSIDE, reachable_mask
+from arm.arm_servo import me_armServo
+from arm.test import ArmTestCase
+from controller import PCA9685
+from kinematics import Point
+
+
+class TestBoot(ArmTestCase):
+    """Boot path of the shipped configuration"""
+
+    def test_schema_is_draft4(self):
+        Draft4Validator.check_schema(me_arm_schema)
+
+    def test_boot_from_json_file(self):
+        arm = self.boot()
+        self.assertEqual(len(me_arm.get_names()), 2)
+        self.assertTrue(arm.is_reachable(arm.position)[0])
+
+    def test_caches_next_to_config(self):
+        arm = self.boot()
+        arm.reachability
+        files = os.listdir(os.path.join(self.directory, 'reachability'))
+        self.assertTrue(any(name.startswith('reachability-') and name.endswith('.npz') for name in files))
+
+
+class TestParallelBoot(ArmTestCase):
+    """Boards on different buses boot in parallel, boards on one bus one after another"""
+
+    def data(self):
+        with open(self.config_file) as file:
+            template = json.load(file)[0]
+        template['arms'] = template['arms'][:1]
+        data = []
+        for address, busnum in ((0x40, 1), (0x41, 1), (0x42, 2)):
+            entry = copy.deepcopy(template)
+            entry['controller'].update({'address': address, 'busnum': busnum, 'simulation': {'latency': 0.002}})
+            data.append(entry)
+        return data
+
+    def test_buses_boot_in_parallel(self):
+        spans = {}
+        from_dict = PCA9685.from_dict.__func__
+        def record(cls, settings):
+            start = time.perf_counter()
+            controller = from_dict(cls, settings)
+            spans[settings['address']] = (threading.current_thread().name, start, time.perf_counter())
+            return controller
+        with mock.patch.object(PCA9685, 'from_dict', classmethod(record)):
+            me_arm.boot_from_dict(self.data(), self.directory)
+
+        self.assertEqual(len(me_arm.get_names()), 3)
+        # one thread per bus, the boards of a bus one after another on it
+        self.assertEqual(spans[0x40][0], spans[0x41][0])
+        self.assertNotEqual(spans[0x40][0], spans[0x42][0])
+        self.assertLessEqual(spans[0x40][2], spans[0x41][1])
+        # the board on bus 2 boots while the first board on bus 1 does
+        self.assertLess(spans[0x42][1], spans[0x40][2])
+        self.assertLess(spans[0x40][1], spans[0x42][2])
+
+    def test_boot_timing(self):
+        me_arm.boot_from_dict(self.data(), self.directory)
+        timing = me_arm.get_boot_timing()
+        self.assertEqual(set(timing['buses']), {('simulated', 1), ('simulated', 2)})
+        self.assertEqual(set(timing['buses'][('simulated', 1)]), {0x40, 0x41})
+        self.assertEqual(set(timing['buses'][('simulated', 2)]), {0x42})
+        bus1 = sum(timing['buses'][('simulated', 1)].values())
+        bus2 = sum(timing['buses'][('simulated', 2)].values())
+        self.assertGreater(min(bus1, bus2), 0)
+        self.assertGreaterEqual(timing['total'], max(bus1, bus2))
+
+
+class TestReachability(ArmTestCase):
+    """Classification with the reachability index"""
+
+    def test_index_agrees_with_exact_check(self):
+        arm = self.boot()
+        index = arm.reachability
+        for x in range(-200, 201, 20):
+            for y in range(-50, 251, 20):
+                for z in range(-100, 201, 20):
+                    reachable = arm.is_reachable(Point.fromCartesian(x, y, z))[0]
+                    if index.classify(x, y, z) == OUTSIDE:
+                        self.assertFalse(reachable)
+
+
+class TestProjection(ArmTestCase):
+    """Clamping unreachable targets onto the reachable space"""
+
+    def test_boundary_samples_are_reachable(self):
+        arm = self.boot()
+        for x, y, z in arm.projector.samples[::97]:
+            self.assertTrue(arm.is_reachable(Point.fromCartesian(x, y, z))[0])
+
+    def test_projections_are_reachable(self):
+        arm = self.boot()
+        generator = np.random.RandomState(19)
+        for x, y, z in generator.uniform(-400, 400, (50, 3)):
+            point = Point.fromCartesian(x, y, z)
+            projected = arm.project_to_reachable(point)
+            self.assertTrue(arm.is_reachable(projected)[0])
+            if not arm.is_reachable(point)[0]:
+                self.assertTrue(arm.go_directly_to_point(point, False, True))
+
+
+class TestConfigurationChange(ArmTestCase):
+    """Caches derived from the arm configuration"""
+
+    def test_trim_change_clears_caches(self):
+        arm = self.boot()
+        point = Point.fromCartesian(arm.position.x + 10, arm.position.y, arm.position.z)
+        before = arm.is_reachable(point)
+        index = arm.reachability
+        self.assertGreater(arm.ik_cache_statistics['size'], 0)
+
+        hip = arm._hip_servo
+        arm._hip_servo = me_armServo(hip.channel, hip.attributes, hip.neutral, hip.min, hip.max, hip.trim + 5)
+        after = arm.is_reachable(point)
+        statistics = arm.ik_cache_statistics
+        self.assertEqual((statistics['size'], statistics['hits'], statistics['misses']), (1, 0, 1))
+        self.assertIsNot(arm.reachability, index)
+        self.assertEqual(after[1:], before[1:])
+
+    def test_cached_angles_match_batch(self):
+        arm = self.boot()
+        xyz = np.array([(x, y, z) for x in range(-150, 151, 25) for y in range(0, 226, 25) for z in range(-75, 151, 25)], dtype=float)
+        limits = [(s.min, s.max, s.trim) for s in (arm._hip_servo, arm._shoulder_servo, arm._elbow_servo)]
+        mask, angles = reachable_mask(arm._kinematics, limits, xyz)
+        for _ in range(2):
+            for row, (x, y, z) in enumerate(xyz):
+                self.assertEqual(arm.is_reachable(Point.fromCartesian(x, y, z))[0], mask[row])
+
+
+class TestIncrementalMode(ArmTestCase):
+    """The incremental solver on the motion path"""
+
+    def test_probes_leave_the_solver_alone(self):
+        arm = self.boot()
+        arm.ik_mode = 'incremental'
+        start = arm.position
+        target = Point.fromCartesian(start.x + 20, start.y, start.z)
+        arm.go_to_point(target, 1.0)
+        solver = arm._solver
+        state = solver._state
+        statistics = solver.statistics
+        self.assertGreater(statistics['incremental'], 0)
+
+        arm.is_reachable(Point.fromCartesian(-start.x, start.y + 40, start.z - 30))
+        arm.project_to_reachable(Point.fromCartesian(400.0, 400.0, 400.0))
+        self.assertIs(solver._state, state)
+        self.assertEqual(solver.statistics, statistics)
+
+        arm.go_to_point(Point.fromCartesian(target.x + 5, target.y, target.z), 1.0)
+        self.assertEqual(solver.statistics['fallbacks'], statistics['fallbacks'])
+
+    def test_motion_matches_closed_form(self):
+        arm = self.boot()
+        arm.ik_mode = 'incremental'
+        start = arm.position
+        target = Point.fromCartesian(start.x - 15, start.y + 10, start.z + 5)
+        arm.go_to_point(target, 1.0)
+        expected = arm._kinematics.fromCartesian(target.x, target.y, target.z)
+        np.testing.assert_allclose((arm._hip_angle, arm._shoulder_angle, arm._elbow_angle), expected, atol=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the move modes of go_to_point."""
+import math
+import unittest
+from unittest import mock
+from arm import MOVE_JOINT, MOVE_ADAPTIVE
+from arm.me_arm import ADAPTIVE_MIN_STEP
+from arm.test import ArmTestCase
+from kinematics import Point
+
+
+class MoveTestCase(ArmTestCase):
+    """Records the frames an arm writes"""
+
+    def setUp(self):
+        super().setUp()
+        self.arm = self.boot()
+        self.frames = []
+        set_servo_angles = self.arm._controller.set_servo_angles
+
+        def record(angles):
+            self.frames.append(dict(angles))
+            return set_servo_angles(angles)
+        patcher = mock.patch.object(self.arm._controller, 'set_servo_angles', side_effect=record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def angles(self) -> (float, float, float):
+        return self.arm._hip_angle, self.arm._shoulder_angle, self.arm._elbow_angle
+
+    def channels(self) -> (int, int, int):
+        return self.arm._hip_servo.channel, self.arm._shoulder_servo.channel, self.arm._elbow_servo.channel
+
+
+class TestJointMove(MoveTestCase):
+    """go_to_point interpolating the joint angles"""
+
+    def test_steps_and_target(self):
+        start = self.angles()
+        target = Point.fromCartesian(self.arm.position.x + 40, self.arm.position.y - 20, self.arm.position.z + 30)
+        reachable, hip, shoulder, elbow = self.arm.is_reachable(target)
+        self.assertTrue(reachable)
+        resolution = self.arm.joint_resolution()
+        expected = int(math.ceil(max(abs(b - a) / r for a, b, r in zip(start, (hip, shoulder, elbow), resolution))))
+        self.assertGreater(expected, 1)
+
+        self.assertEqual(self.arm.go_to_point(target, mode=MOVE_JOINT), expected)
+        self.assertEqual(len(self.frames), expected)
+        self.assertIs(self.arm.position, target)
+        self.assertEqual(self.angles(), (hip, shoulder, elbow))
+
+    def test_steps_move_each_joint_by_at_most_one_tick(self):
+        target = Point.fromCartesian(self.arm.position.x - 30, self.arm.position.y + 10, self.arm.position.z - 20)
+        trims = (self.arm._hip_servo.trim, self.arm._shoulder_servo.trim, self.arm._elbow_servo.trim)
+        previous = [a - t for a, t in zip(self.angles(), trims)]
+        self.arm.go_to_point(target, mode=MOVE_JOINT)
+        for frame in self.frames:
+            angles = [frame[channel] for channel in self.channels()]
+            for a, b, r in zip(previous, angles, self.arm.joint_resolution()):
+                self.assertLessEqual(abs(b - a), r * (1 + 1e-9))
+            previous = angles
+
+    def test_no_move(self):
+        self.assertEqual(self.arm.go_to_point(self.arm.position, mode=MOVE_JOINT), 0)
+        self.assertEqual(self.frames, [])
+
+    def test_unreachable_target(self):
+        position = self.arm.position
+        target = Point.fromCartesian(400.0, 400.0, 400.0)
+        self.assertEqual(self.arm.go_to_point(target, raiseOutOfBoundsException=False, clamp=False, mode=MOVE_JOINT), 0)
+        with self.assertRaises(Exception):
+            self.arm.go_to_point(target, clamp=False, mode=MOVE_JOINT)
+        self.assertIs(self.arm.position, position)
+        self.assertEqual(self.frames, [])
+
+
+class TestAdaptiveMove(MoveTestCase):
+    """go_to_point with steps sized from the joint rates"""
+
+    def record_steps(self):
+        """Records the points of the steps and the joint angles the step was sized at."""
+        steps = []
+        go_directly_to_point = self.arm.go_directly_to_point
+
+        def record(target, *args):
+            steps.append((target, self.angles()))
+            return go_directly_to_point(target, *args)
+        patcher = mock.patch.object(self.arm, 'go_directly_to_point', side_effect=record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return steps
+
+    def direction(self, start: Point, target: Point) -> (float, float, float):
+        dist = start.distance(target)
+        return (target.x - start.x) / dist, (target.y - start.y) / dist, (target.z - start.z) / dist
+
+    def test_steps_are_sized_from_the_joint_rates(self):
+        start = self.arm.position
+        target = Point.fromCartesian(start.x + 30, start.y + 10, start.z - 20)
+        steps = self.record_steps()
+        count = self.arm.go_to_point(target, mode=MOVE_ADAPTIVE)
+        self.assertEqual(count, len(steps))
+        self.assertGreater(count, 2)
+        self.assertIs(steps[-1][0], target)
+
+        direction = self.direction(start, target)
+        resolution = self.arm.joint_resolution()
+        previous = start
+        for point, angles in steps[:-1]:
+            rates = self.arm._kinematics.jointRates(*angles, *direction)
+            expected = max(min(r / abs(d) for r, d in zip(resolution, rates) if d), ADAPTIVE_MIN_STEP)
+            self.assertAlmostEqual(previous.distance(point), expected, places=6)
+            previous = point
+        self.assertEqual(self.angles(), self.arm.is_reachable(target)[1:])
+
+    def test_minimum_step_near_singularities(self):
+        start = self.arm.position
+        target = Point.fromCartesian(start.x + 1, start.y, start.z)
+        steps = self.record_steps()
+        singular = (math.inf, math.inf, math.inf)
+        with mock.patch.object(self.arm._kinematics, 'jointRates', return_value=singular):
+            count = self.arm.go_to_point(target, mode=MOVE_ADAPTIVE)
+        self.assertEqual(count, len(steps))
+        self.assertIn(count, (10, 11))
+        previous = start
+        for point, angles in steps[:-1]:
+            self.assertAlmostEqual(previous.distance(point), ADAPTIVE_MIN_STEP)
+            previous = point
+        self.assertLessEqual(previous.distance(target), ADAPTIVE_MIN_STEP + 1e-9)
+
+    def test_planned_and_baseline_steps(self):
+        start = self.arm.position
+        moves = [(Point.fromCartesian(start.x + 30, start.y, start.z), 10.0),
+                 (Point.fromCartesian(start.x + 30, start.y + 25, start.z + 5), 2.5)]
+        planned = 0
+        baseline = 0
+        for target, resolution in moves:
+            dist = self.arm.position.distance(target)
+            with self.assertLogs(self.arm._logger, 'INFO') as logs:
+                count = self.arm.go_to_point(target, resolution, mode=MOVE_ADAPTIVE)
+            planned += count
+            baseline += int(math.ceil(dist / resolution))
+            self.assertEqual(self.arm.step_statistics, {'planned': planned, 'baseline': baseline})
+            self.assertTrue(any('Moved in %d adaptive steps (%d at %.2fmm resolution)' %
+                                (count, int(math.ceil(dist / resolution)), resolution) in message
+                                for message in logs.output))
+
+    def test_no_move(self):
+        self.assertEqual(self.arm.go_to_point(self.arm.position, mode=MOVE_ADAPTIVE), 0)
+        self.assertEqual(self.arm.step_statistics, {'planned': 0, 'baseline': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
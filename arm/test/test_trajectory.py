@@ -0,0 +1,163 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for compiling and executing trajectories."""
+import math
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from arm.trajectory import GRAB, RELEASE, MOVE_TO, TEST, MOVE_JOINT, GRIPPER_DWELL
+from arm.test import ArmTestCase
+from kinematics import Point
+
+
+class TestCompiler(ArmTestCase):
+    """Compiling operation lists into tick frames"""
+
+    def setUp(self):
+        super().setUp()
+        self.arm = self.boot()
+        self.servos = [self.arm._controller.get_servo(s.channel) for s in
+                       (self.arm._hip_servo, self.arm._shoulder_servo, self.arm._elbow_servo, self.arm._gripper_servo)]
+
+    def current(self) -> [int]:
+        return [servo.ticks for servo in self.servos]
+
+    def joint_ticks(self, angles: (float, float, float)) -> [int]:
+        trims = (self.arm._hip_servo.trim, self.arm._shoulder_servo.trim, self.arm._elbow_servo.trim)
+        return [int(servo.ticks_from_angles([angle - trim])[0]) for servo, angle, trim in zip(self.servos, angles, trims)]
+
+    def test_compiling_writes_nothing(self):
+        target = Point.fromCartesian(self.arm.position.x + 20, self.arm.position.y, self.arm.position.z)
+        with mock.patch.object(self.arm._controller, 'commit_frame') as commit:
+            self.arm.compile_operations([(MOVE_TO, target), (GRAB, None), (RELEASE, None)])
+        commit.assert_not_called()
+
+    def test_move_frames(self):
+        start = self.arm.position
+        target = Point.fromCartesian(start.x + 20, start.y, start.z)
+        current = self.current()
+        trajectory = self.arm.compile_operations([(MOVE_TO, target)], 2.5)
+        self.assertIs(trajectory.start, start)
+        self.assertEqual(trajectory.channels, tuple(servo.channel for servo in self.servos))
+        self.assertEqual(trajectory.ticks.dtype, np.uint16)
+        self.assertEqual(trajectory.ticks.shape, (8, 4))
+        self.assertEqual(trajectory.dwell.tolist(), [0.0] * 8)
+        self.assertEqual(trajectory.ticks[:, 3].tolist(), [current[3]] * 8)
+
+        reachable, hip, shoulder, elbow = self.arm.is_reachable(target)
+        self.assertTrue(reachable)
+        self.assertEqual(trajectory.ticks[-1, :3].tolist(), self.joint_ticks((hip, shoulder, elbow)))
+        (end, operation, position, angles, movements), = trajectory.marks
+        self.assertEqual((end, operation, position, movements), (8, MOVE_TO, target, 8))
+        # the path is solved in a batch, which can differ from the scalar solution in the last bit
+        np.testing.assert_allclose(angles, (hip, shoulder, elbow), rtol=0, atol=1e-9)
+        self.assertEqual((trajectory.frames, trajectory.movements), (8, 8))
+        self.assertEqual((trajectory.unreachable, trajectory.unreachable_targets), ([], []))
+
+    def test_gripper_frames_and_dwell(self):
+        current = self.current()
+        gripper = self.arm._gripper_servo
+        trajectory = self.arm.compile_operations([(GRAB, None), (TEST, None), (RELEASE, None)])
+        closed = int(self.servos[3].ticks_from_angles([gripper.max - gripper.trim])[0])
+        opened = int(self.servos[3].ticks_from_angles([gripper.min - gripper.trim])[0])
+        self.assertEqual(trajectory.ticks.tolist(), [current[:3] + [closed], current[:3] + [opened]])
+        self.assertEqual(trajectory.dwell.tolist(), [GRIPPER_DWELL, GRIPPER_DWELL])
+        self.assertEqual([mark[:2] + mark[3:] for mark in trajectory.marks],
+                         [(1, GRAB, (gripper.max - gripper.trim,), 1), (1, TEST, None, 0),
+                          (2, RELEASE, (gripper.min - gripper.trim,), 1)])
+        self.assertEqual(trajectory.movements, 2)
+
+    def test_joint_frames(self):
+        start = self.arm.position
+        target = Point.fromCartesian(start.x - 30, start.y + 10, start.z + 20)
+        reachable, hip, shoulder, elbow = self.arm.is_reachable(target)
+        angles = (self.arm._hip_angle, self.arm._shoulder_angle, self.arm._elbow_angle)
+        steps = int(math.ceil(max(abs(b - a) / r for a, b, r in
+                                  zip(angles, (hip, shoulder, elbow), self.arm.joint_resolution()))))
+        trajectory = self.arm.compile_operations([(MOVE_TO, target)], mode=MOVE_JOINT)
+        self.assertEqual(trajectory.frames, steps)
+        self.assertEqual(trajectory.ticks[-1, :3].tolist(), self.joint_ticks((hip, shoulder, elbow)))
+        (end, operation, position, angles, movements), = trajectory.marks
+        self.assertEqual((end, operation, position, movements), (steps, MOVE_TO, target, steps))
+        np.testing.assert_allclose(angles, (hip, shoulder, elbow), rtol=0, atol=1e-9)
+
+    def test_unreachable_target_is_skipped(self):
+        start = self.arm.position
+        target = Point.fromCartesian(start.x, start.y + 400, start.z)
+        trajectory = self.arm.compile_operations([(MOVE_TO, target)], 10.0, clamp=False)
+        self.assertEqual(trajectory.unreachable_targets, [0])
+        self.assertGreater(len(trajectory.unreachable), 0)
+        self.assertEqual(trajectory.frames + len(trajectory.unreachable), 40)
+        position = trajectory.marks[0][2]
+        self.assertIsNot(position, target)
+        self.assertTrue(self.arm.is_reachable(position)[0])
+
+    def test_unreachable_target_is_clamped(self):
+        start = self.arm.position
+        target = Point.fromCartesian(start.x, start.y + 400, start.z)
+        trajectory = self.arm.compile_operations([(MOVE_TO, target)], 10.0, clamp=True)
+        self.assertEqual((trajectory.unreachable, trajectory.unreachable_targets), ([], []))
+        self.assertEqual(trajectory.frames, 40)
+        position = trajectory.marks[0][2]
+        self.assertLess(position.distance(target), 400)
+        reachable, hip, shoulder, elbow = self.arm.is_reachable(position)
+        self.assertTrue(reachable)
+        self.assertEqual(trajectory.ticks[-1, :3].tolist(), self.joint_ticks((hip, shoulder, elbow)))
+
+    def test_executing_a_grab_records_the_gripper_state(self):
+        gripper = self.arm._gripper_servo
+        trajectory = self.arm.compile_operations([(GRAB, None)])
+        with mock.patch.object(self.arm._controller, 'set_servo_angle') as set_servo_angle:
+            self.assertEqual(self.arm.execute_trajectory(trajectory), 1)
+        set_servo_angle.assert_not_called()
+        self.assertEqual(self.servos[3]._angle, gripper.max - gripper.trim)
+        self.assertEqual(self.servos[3].ticks, trajectory.ticks[-1, 3])
+        self.assertEqual(self.arm._controller.committed_ticks(gripper.channel), trajectory.ticks[-1, 3])
+
+
+class TestExecutor(ArmTestCase):
+    """Execution of compiled trajectories with a control period"""
+
+    def execute(self, arm, operations) -> float:
+        arm.control_period = 0.002
+        arm.turn_on()
+        trajectory = arm.compile_operations(operations)
+        start = time.monotonic()
+        arm.execute_trajectory(trajectory)
+        return time.monotonic() - start
+
+    def test_waits_for_final_grab(self):
+        self.assertGreaterEqual(self.execute(self.boot(), [(GRAB, None)]), GRIPPER_DWELL)
+
+    def test_waits_for_final_release(self):
+        self.assertGreaterEqual(self.execute(self.boot(), [(GRAB, None), (RELEASE, None)]), 2 * GRIPPER_DWELL)
+
+    def test_move_is_not_held_for_dwell(self):
+        arm = self.boot()
+        target = Point.fromCartesian(arm.position.x + 10, arm.position.y, arm.position.z)
+        self.assertLess(self.execute(arm, [(MOVE_TO, target)]), GRIPPER_DWELL)
+
+
+if __name__ == '__main__':
+    unittest.main()
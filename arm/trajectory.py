@@ -0,0 +1,445 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""
+    Trajectory compiler for a meArm. An operation list is turned into an array of frames ahead of
+    time, one row of hip, shoulder, elbow and gripper ticks per frame with the time to dwell after
+    it. Inverse kinematics, reachability and the servo lookup tables are evaluated in batches
+    during compilation, so unreachable points are known before the arm moves. The executor only
+    streams the frames to the controller.
+"""
+import math
+import time
+import logging
+import numpy as np
+from kinematics import Point
+from .reachability import reachable_mask
+
+MOVE_CARTESIAN = 'cartesian'
+MOVE_JOINT = 'joint'
+MOVE_ADAPTIVE = 'adaptive'
+
+MOVE_TO = 'moveTo'
+GRAB = 'grab'
+RELEASE = 'release'
+TEST = 'test'
+
+# time in seconds the gripper needs to open or close
+GRIPPER_DWELL = 0.3
+
+# the executor sleeps until this many nanoseconds before a deadline and spins for the rest
+SPIN_NS = 500000
+
+
+class Trajectory(object):
+    """A compiled operation list."""
+
+    def __init__(self, start: Point, channels: (int, int, int, int), ticks: np.ndarray, dwell: np.ndarray,
+                 marks: [tuple], unreachable: [(int, Point)], unreachable_targets: [int]):
+        """__init__
+        Initializes the trajectory
+
+        :param start: The gripper position the trajectory was compiled from.
+        :type start: Point
+        :param channels: The hip, shoulder, elbow and gripper channel.
+        :type channels: (int, int, int, int)
+        :param ticks: The off ticks of the four channels, one row per frame.
+        :type ticks: numpy.ndarray of shape (N, 4)
+        :param dwell: The time in seconds to wait after each frame.
+        :type dwell: numpy.ndarray of shape (N,)
+        :param marks: One (end frame, operation type, position, angles, movements) tuple per operation.
+        :type marks: list of tuple
+        :param unreachable: The index of the operation and the point for each unreachable point.
+        :type unreachable: list of (int, Point)
+        :param unreachable_targets: The index of each operation whose target is unreachable.
+        :type unreachable_targets: list of int
+        """
+        self._start = start
+        self._channels = channels
+        self._ticks = ticks
+        self._dwell = dwell
+        self._marks = marks
+        self._unreachable = unreachable
+        self._unreachable_targets = unreachable_targets
+
+    @property
+    def start(self) -> Point:
+        """Gets the gripper position the trajectory was compiled from"""
+        return self._start
+
+    @property
+    def channels(self) -> (int, int, int, int):
+        """Gets the hip, shoulder, elbow and gripper channel"""
+        return self._channels
+
+    @property
+    def ticks(self) -> np.ndarray:
+        """Gets the off ticks of the four channels, one row per frame"""
+        return self._ticks
+
+    @property
+    def dwell(self) -> np.ndarray:
+        """Gets the time in seconds to wait after each frame"""
+        return self._dwell
+
+    @property
+    def marks(self) -> [tuple]:
+        """Gets the (end frame, operation type, position, angles, movements) tuple of each operation"""
+        return self._marks
+
+    @property
+    def unreachable(self) -> [(int, Point)]:
+        """Gets the operation index and the point for each unreachable point"""
+        return self._unreachable
+
+    @property
+    def unreachable_targets(self) -> [int]:
+        """Gets the index of each operation whose target is unreachable"""
+        return self._unreachable_targets
+
+    @property
+    def frames(self) -> int:
+        """Gets the number of frames"""
+        return len(self._ticks)
+
+    @property
+    def movements(self) -> int:
+        """Gets the number of movements, excluding test operations"""
+        return sum(mark[4] for mark in self._marks)
+
+
+class TrajectoryCompiler(object):
+    """Compiles operation lists for a meArm into trajectories."""
+
+    def __init__(self, arm):
+        """__init__
+        Initializes the compiler
+
+        :param arm: The arm to compile for.
+        :type arm: me_arm
+        """
+        self._arm = arm
+        self._logger = arm._logger
+
+    def compile(self, operations: [(str, Point)], resolution: float = 2.5, mode: str = MOVE_CARTESIAN,
+                clamp: bool = None) -> Trajectory:
+        """compile
+        Compiles an operation list starting at the current position of the arm. Unreachable points
+        are left out of the frames, as go_to_point skips them, and listed in Trajectory.unreachable.
+        Operations whose target is unreachable are listed in Trajectory.unreachable_targets.
+
+        :param operations: The operations as (type, target) pairs. The type is 'moveTo', 'grab',
+                           'release' or 'test', the target is only used by 'moveTo'.
+        :type operations: list of (str, Point)
+        :param resolution: The increment for each movement along the path in cartesian mode.
+        :type resolution: float
+        :param mode: 'cartesian' to move in straight lines, 'joint' to interpolate the joint angles.
+        :type mode: str
+        :param clamp: True to replace unreachable points by the nearest reachable points. None to use
+                      the clamp setting of the arm.
+        :type clamp: bool
+
+        :return: The trajectory
+        :rtype: Trajectory
+        """
+        if mode not in (MOVE_CARTESIAN, MOVE_JOINT):
+            msg = "Move mode %s cannot be compiled" % mode
+            self._logger.error(msg)
+            raise ValueError(msg)
+        start_time = time.perf_counter()
+        arm = self._arm
+        arm._check_configuration()
+        joints = (arm._hip_servo, arm._shoulder_servo, arm._elbow_servo)
+        channels = tuple(s.channel for s in joints) + (arm._gripper_servo.channel,)
+        servos = [arm._controller.get_servo(channel) for channel in channels]
+        clamp = arm.clamp if clamp is None else clamp
+
+        position = arm.position
+        angles = (arm._hip_angle, arm._shoulder_angle, arm._elbow_angle)
+        current = np.array([servo.ticks for servo in servos], dtype=np.uint16)
+        blocks = []
+        dwells = []
+        marks = []
+        unreachable = []
+        unreachable_targets = []
+        frames = 0
+        for index, (operation, target) in enumerate(operations):
+            if operation == MOVE_TO:
+                if mode == MOVE_JOINT:
+                    xyz, path, reachable = self._joint_path(position, angles, target, clamp)
+                    movements = int(reachable.sum())
+                else:
+                    xyz, path, reachable = self._cartesian_path(position, target, resolution, clamp)
+                    movements = 1 + int(reachable[:-1].sum()) if len(xyz) else 0
+                for row in np.flatnonzero(~reachable):
+                    unreachable.append((index, Point.fromCartesian(*xyz[row])))
+                if len(reachable) and not reachable[-1]:
+                    unreachable_targets.append(index)
+                path = path[reachable]
+                if len(path):
+                    block = np.empty((len(path), 4), dtype=np.uint16)
+                    for column, joint in enumerate(joints):
+                        block[:, column] = servos[column].ticks_from_angles(path[:, column] - joint.trim)
+                    block[:, 3] = current[3]
+                    blocks.append(block)
+                    dwells.append(np.zeros(len(block)))
+                    frames += len(block)
+                    current = block[-1]
+                    angles = tuple(path[-1].tolist())
+                    position = target if reachable[-1] and xyz[-1].tolist() == [target.x, target.y, target.z] \
+                        else Point.fromCartesian(*xyz[reachable][-1])
+                marks.append((frames, operation, position, angles, movements))
+            elif operation in (GRAB, RELEASE):
+                gripper = arm._gripper_servo
+                angle = (gripper.max if operation == GRAB else gripper.min) - gripper.trim
+                block = current.reshape(1, 4).copy()
+                block[0, 3] = servos[3].ticks_from_angles([angle])[0]
+                blocks.append(block)
+                dwells.append(np.full(1, GRIPPER_DWELL))
+                frames += 1
+                current = block[0]
+                marks.append((frames, operation, position, (angle,), 1))
+            elif operation == TEST:
+                marks.append((frames, operation, position, None, 0))
+            else:
+                msg = "Unknown operation type %s" % operation
+                self._logger.error(msg)
+                raise ValueError(msg)
+
+        ticks = np.concatenate(blocks) if blocks else np.empty((0, 4), dtype=np.uint16)
+        dwell = np.concatenate(dwells) if dwells else np.empty(0)
+        trajectory = Trajectory(arm.position, channels, ticks, dwell, marks, unreachable, unreachable_targets)
+        self._logger.info("Compiled %d operations into %d frames in %.1f ms, %d unreachable points",
+                          len(marks), len(ticks), (time.perf_counter() - start_time) * 1000, len(unreachable))
+        return trajectory
+
+    def _limits(self) -> [(float, float, float)]:
+        """_limits
+        Gets (min, max, trim) of the hip, shoulder and elbow servo.
+        """
+        arm = self._arm
+        return [(s.min, s.max, s.trim) for s in (arm._hip_servo, arm._shoulder_servo, arm._elbow_servo)]
+
+    def _cartesian_path(self, start: Point, target: Point, resolution: float,
+                        clamp: bool) -> (np.ndarray, np.ndarray, np.ndarray):
+        """_cartesian_path
+        Solves the points of a straight line move with the same steps as go_to_point.
+
+        :return: The points, their hip, shoulder and elbow angles and whether they are reachable.
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        dist = start.distance(target)
+        if dist == 0:
+            return np.empty((0, 3)), np.empty((0, 3)), np.empty(0, dtype=bool)
+        cycles = dist / resolution
+        origin = np.array([start.x, start.y, start.z])
+        step = (np.array([target.x, target.y, target.z]) - origin) / cycles
+        xyz = np.vstack((origin + np.outer(np.arange(1, math.ceil(cycles)), step),
+                         [[target.x, target.y, target.z]]))
+        reachable, path = reachable_mask(self._arm._kinematics, self._limits(), xyz)
+        if clamp:
+            for row in np.flatnonzero(~reachable):
+                target, reachable[row], hip, shoulder, elbow = self._arm._resolve_target(
+                    Point.fromCartesian(*xyz[row]), True)
+                xyz[row] = (target.x, target.y, target.z)
+                path[row] = (hip, shoulder, elbow)
+        return xyz, path, reachable
+
+    def _joint_path(self, start: Point, angles: (float, float, float), target: Point,
+                    clamp: bool) -> (np.ndarray, np.ndarray, np.ndarray):
+        """_joint_path
+        Interpolates the joint angles of a move with the same steps as go_to_point in joint mode.
+
+        :return: The points, their hip, shoulder and elbow angles and whether they are reachable.
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        arm = self._arm
+        resolved, is_reachable, hip, shoulder, elbow = arm._resolve_target(target, clamp)
+        end = np.array([[hip, shoulder, elbow]])
+        if not is_reachable or angles[0] is None:
+            return np.array([[resolved.x, resolved.y, resolved.z]]), end, np.array([is_reachable])
+        delta = end[0] - np.array(angles)
+        steps = int(math.ceil(max(abs(delta) / np.array(arm.joint_resolution()))))
+        if steps == 0:
+            return np.empty((0, 3)), np.empty((0, 3)), np.empty(0, dtype=bool)
+        path = np.array(angles) + np.outer(np.arange(1, steps + 1) / steps, delta)
+        path[-1] = end[0]
+        xyz = np.full((steps, 3), np.nan)
+        xyz[-1] = (resolved.x, resolved.y, resolved.z)
+        return xyz, path, np.ones(steps, dtype=bool)
+
+
+class TrajectoryExecutor(object):
+    """Streams compiled trajectories to the controller of a meArm.
+
+    Without a control period the frames are written as fast as the bus allows. With a control
+    period, for example the 20ms of a 50Hz PWM cycle, frame k is written at an absolute deadline
+    k periods after the start, extended by the dwell times before it. A frame whose successor is
+    already due when its turn comes is stale and dropped, so a late executor catches up instead
+    of falling further behind. The last frame of each operation and frames with a dwell time are
+    always written.
+    """
+
+    def __init__(self, arm, period: float = None):
+        """__init__
+        Initializes the executor
+
+        :param arm: The arm to move.
+        :type arm: me_arm
+        :param period: The control period in seconds. None to write frames as fast as possible.
+        :type period: float
+        """
+        self._arm = arm
+        self._logger = arm._logger
+        self._period = period
+        self.reset_statistics()
+
+    @property
+    def period(self) -> float:
+        """Gets the control period in seconds, None if frames are written as fast as possible"""
+        return self._period
+
+    @property
+    def statistics(self) -> {}:
+        """Gets the written, dropped and overrun frames and the mean and maximum write jitter in
+        microseconds of the periodic executions since the last reset"""
+        written = self._written
+        return {
+            'written': written,
+            'dropped': self._dropped,
+            'overruns': self._overruns,
+            'jitter_mean_us': self._jitter_total / written / 1000 if written else 0.0,
+            'jitter_max_us': self._jitter_max / 1000
+        }
+
+    def reset_statistics(self):
+        """reset_statistics
+        Resets the frame and jitter statistics.
+        """
+        self._written = 0
+        self._dropped = 0
+        self._overruns = 0
+        self._jitter_total = 0
+        self._jitter_max = 0
+
+    def execute(self, trajectory: Trajectory) -> int:
+        """execute
+        Writes the frames of a trajectory, waiting the dwell time after each frame. The arm
+        position and servo state are updated at the end of each operation.
+
+        :param trajectory: The trajectory, compiled from the current position of the arm.
+        :type trajectory: Trajectory
+
+        :return: The number of movements executed
+        :rtype: int
+        """
+        arm = self._arm
+        if trajectory.start is not arm.position and trajectory.start.distance(arm.position) > 0:
+            msg = "Trajectory was compiled for another start position"
+            self._logger.error(msg)
+            raise Exception(msg)
+
+        start_time = time.perf_counter()
+        commit = arm._controller.commit_frame
+        channels = trajectory.channels
+        gripper = arm._controller.get_servo(channels[3])
+        ticks = trajectory.ticks.tolist()
+        dwell = trajectory.dwell.tolist()
+        period = int(self._period * 1e9) if self._period else 0
+        deadline = time.monotonic_ns()
+        frame = 0
+        movements = 0
+        for end, operation, position, angles, count in trajectory.marks:
+            if period:
+                frame, deadline = self._stream(commit, channels, ticks, dwell, frame, end, period, deadline)
+            while frame < end:
+                commit(dict(zip(channels, ticks[frame])))
+                if dwell[frame] > 0: time.sleep(dwell[frame])
+                frame += 1
+            if operation == TEST:
+                count = arm.test(False)
+                deadline = time.monotonic_ns()
+            elif operation == MOVE_TO:
+                if count: arm._set_joint_angles(position, *angles)
+            else:
+                # records the gripper state, the ticks were written with the frame
+                gripper.stage_angle(angles[0])
+            movements += count
+        if period:
+            # holds the last frame for its period or dwell, the gripper may still be moving
+            self._wait(deadline)
+        self._logger.info("Executed %d frames in %.1f ms", frame, (time.perf_counter() - start_time) * 1000)
+        if period:
+            self._logger.info("Execution statistics: %s", self.statistics)
+        return movements
+
+    def _stream(self, commit, channels: (int, int, int, int), ticks: [[int]], dwell: [float],
+                frame: int, end: int, period: int, deadline: int) -> (int, int):
+        """_stream
+        Writes the frames of one operation on their deadlines.
+
+        :param commit: The commit_frame method of the controller.
+        :param channels: The hip, shoulder, elbow and gripper channel.
+        :param ticks: The ticks of all frames.
+        :param dwell: The dwell times of all frames in seconds.
+        :param frame: The first frame of the operation.
+        :param end: The frame after the last frame of the operation.
+        :param period: The control period in nanoseconds.
+        :param deadline: The deadline of the first frame in nanoseconds of time.monotonic_ns.
+
+        :return: The next frame and its deadline.
+        :rtype: (int, int)
+        """
+        monotonic_ns = time.monotonic_ns
+        while frame < end:
+            pause = dwell[frame]
+            following = deadline + (max(period, int(pause * 1e9)) if pause > 0 else period)
+            now = monotonic_ns()
+            if now >= following and frame + 1 < end and pause <= 0:
+                self._dropped += 1
+            else:
+                self._wait(deadline)
+                jitter = monotonic_ns() - deadline
+                commit(dict(zip(channels, ticks[frame])))
+                if monotonic_ns() > following:
+                    self._overruns += 1
+                self._written += 1
+                self._jitter_total += jitter
+                if jitter > self._jitter_max:
+                    self._jitter_max = jitter
+            deadline = following
+            frame += 1
+        return frame, deadline
+
+    @staticmethod
+    def _wait(deadline: int):
+        """_wait
+        Sleeps until shortly before a deadline and spins for the rest.
+
+        :param deadline: The deadline in nanoseconds of time.monotonic_ns.
+        :type deadline: int
+        """
+        remaining = deadline - time.monotonic_ns()
+        if remaining > SPIN_NS:
+            time.sleep((remaining - SPIN_NS) / 1e9)
+        while time.monotonic_ns() < deadline:
+            pass
@@ -28,14 +28,22 @@
     This library drive GPIO interaction with the Adafruit Servo HAT and provides
     some high level functions to interact with servos on the HAT
 """
+import os
 import logging
 import time
 import math
 import json
+import threading
+from contextlib import contextmanager
 from jsonschema import validate
 from .servo import Servo
 from .servo_attributes import ServoAttributes
 from .schemas import controller_schema as schema
+from . import bus_statistics
+from .async_writer import AsyncWriter
+from .bus_arbiter import bus_key, get_arbiter, BusArbiter
+from .tracing import DEFAULT_SAMPLE_RATE
+from .calibration import CalibrationCache, OscillatorCalibration, oscillator_from_pulse, oscillator_from_frequency
 
 # Registers/etc:
 PCA9685_ADDRESS = 0x40
@@ -56,35 +64,137 @@ ALL_LED_OFF_H = 0xFD
 
 # Bits:
 RESTART = 0x80
+AI = 0x20
 SLEEP = 0x10
 ALLCALL = 0x01
 INVRT = 0x10
 OUTDRV = 0x04
 
+# SMBus block writes carry at most 32 data bytes, i.e. eight channels of four registers each
+MAX_BLOCK_LENGTH = 32
+# Clean registers between two dirty ones are rewritten from the shadow rather than starting
+# a new transaction if the gap is at most this many bytes (one channel).
+MAX_BLOCK_GAP = 4
+# Register ranges (start, end exclusive) holding readable board state
+SHADOW_RANGES = ((MODE1, LED0_ON_L + 4*16), (PRESCALE, PRESCALE + 1))
+# Time the oscillator needs to stabilize after leaving sleep mode
+OSCILLATOR_STARTUP = 0.0005
+
 logger = logging.getLogger('controller')
 
-def ensureI2C(i2c=None):
+# Frames collected by bus_frame on the calling thread
+_frame_batch = threading.local()
+
+# I2C backends selectable by name. The environment variable overrides the configured backend.
+BACKENDS = ('adafruit', 'simulated', 'rdwr')
+BACKEND_ENVIRONMENT_VARIABLE = 'MEARM_I2C_BACKEND'
+
+def resolve_backend(backend: str = None) -> str:
+    """Resolves the I2C backend name from the environment and the configuration"""
+    backend = os.environ.get(BACKEND_ENVIRONMENT_VARIABLE) or backend or 'adafruit'
+    if backend not in BACKENDS:
+        raise ValueError('Unknown I2C backend %s. Must be one of %s' % (backend, ', '.join(BACKENDS)))
+    return backend
+
+def ensureI2C(i2c=None, backend: str = None):
     """Ensures I2C device interface"""
     if i2c is None:
-        logger.info('Initializing I2C.')
-        import Adafruit_GPIO.I2C as I2C
+        backend = resolve_backend(backend)
+        logger.info('Initializing I2C using %s backend.', backend)
+        if backend == 'simulated':
+            from . import simulated_i2c as I2C
+        elif backend == 'rdwr':
+            from . import rdwr_i2c as I2C
+        else:
+            import Adafruit_GPIO.I2C as I2C
         i2c = I2C
     return i2c
 
-def software_reset(i2c=None, **kwargs):
+def _pwm_bytes(on_ticks: int, off_ticks: int) -> [int]:
+    """Packs on/off ticks into the ON_L, ON_H, OFF_L, OFF_H register layout"""
+    return [on_ticks & 0xFF, on_ticks >> 8, off_ticks & 0xFF, off_ticks >> 8]
+
+def software_reset(i2c=None, backend: str = None, **kwargs):
     """Sends a software reset (SWRST) command to all servo drivers on the bus."""
     # Setup I2C interface for device 0x00 to talk to all of them.
-    i2c = ensureI2C(i2c)
+    i2c = ensureI2C(i2c, backend)
     d = i2c.get_i2c_device(0x00, **kwargs)
-    d.writeRaw8(0x06)  # SWRST
+    with get_arbiter(bus_key(i2c, kwargs.get('busnum'))):
+        d.writeRaw8(0x06)  # SWRST
     logger.info('Servo controllers have been reset.')
 
+@contextmanager
+def bus_frame():
+    """bus_frame
+    Collects the frames committed on the calling thread, for example by moving several arms,
+    and commits them together on exit with commit_frames. Boards running asynchronously are
+    not collected. Nested contexts belong to the outermost one. If the body raises, the
+    collected frames are dropped.
+    """
+    if getattr(_frame_batch, 'frames', None) is not None:
+        yield
+        return
+    _frame_batch.frames = frames = {}
+    try:
+        yield
+    finally:
+        _frame_batch.frames = None
+    commit_frames(frames)
+
+def commit_frames(frames: {}):
+    """commit_frames
+    Commits frames of several boards at once. The changed registers of all boards on a bus are
+    written while holding the bus once, in a single transfer if the backend can address several
+    devices in one transfer (a single I2C_RDWR ioctl with the rdwr backend). Boards running
+    asynchronously hand their frame to their background writer as in PCA9685.commit_frame.
+
+    :param frames: The off ticks to set keyed by channel, keyed by board.
+    :type frames: dictionary of PCA9685 -> dictionary of int -> int
+    """
+    buses = {}
+    for controller, frame in frames.items():
+        changed = controller._changed_channels(frame)
+        if not changed:
+            continue
+        if controller._writer is not None:
+            controller._writer.post(changed)
+        else:
+            buses.setdefault(controller._bus, []).append((controller, changed))
+
+    for writes in buses.values():
+        arbiter = writes[0][0]._arbiter
+        with arbiter:
+            dirty = []
+            try:
+                for controller, frame in writes:
+                    controller._stage_frame(frame)
+                    registers = sorted(controller._dirty)
+                    controller._dirty.clear()
+                    dirty.append((controller, registers))
+                blocks = [(controller._device, controller._blocks(registers))
+                          for controller, registers in dirty if registers]
+                if blocks and not bus_statistics.write_combined(blocks):
+                    for device, device_blocks in blocks:
+                        device.write_blocks(device_blocks)
+            except Exception:
+                # as in PCA9685.write_frame, keep the registers dirty and write the frames again
+                for controller, registers in dirty:
+                    controller._dirty.update(registers)
+                for controller, frame in writes:
+                    controller._forget_committed(frame)
+                raise
+            for controller, registers in dirty:
+                if registers:
+                    controller._flushed()
+
 class PCA9685(object):
     """PCA9685 PWM LED/servo controller."""
 
     def __init__(self, address: int = PCA9685_ADDRESS, i2c = None, 
                  frequency: int = 26500000, resolution: int = 4096,
-                 servo_frequency: int = 50, **kwargs):
+                 servo_frequency: int = 50, shadow_verify_interval: int = 0,
+                 backend: str = None, asynchronous: bool = False, calibration_file: str = None,
+                 trace_sample_rate: int = DEFAULT_SAMPLE_RATE, **kwargs):
         """__init__
 
         Initialize the PCA9685.
@@ -108,28 +218,86 @@ class PCA9685(object):
                                 board share the same frequency.
         :type servo_frequency: integer
 
-        :param kwargs: additional arguments
+        :param shadow_verify_interval: Number of flushes after which the register shadow is
+                                       compared against the board to detect drift. 0 disables
+                                       verification.
+        :type shadow_verify_interval: integer
+
+        :param backend: Name of the I2C backend used if i2c is None, 'adafruit', 'simulated' or 'rdwr'.
+                        The MEARM_I2C_BACKEND environment variable takes precedence.
+        :type backend: str
+
+        :param asynchronous: True to write servo frames from a background thread. Servo updates
+                             then return immediately and newer values replace unwritten ones.
+        :type asynchronous: bool
+
+        :param calibration_file: Path of the oscillator calibration cache. If the board has been
+                                 calibrated, the cached oscillator frequency and prescale replace
+                                 frequency and are used for all tick calculations.
+        :type calibration_file: str
+
+        :param trace_sample_rate: The servos on the board log one in trace_sample_rate operations.
+                                  0 disables the logging of servo operations.
+        :type trace_sample_rate: int
+
+        :param kwargs: additional arguments passed to the backend's get_i2c_device
         :type kwards: point to object array
 
         """
-        i2c = ensureI2C(i2c)
+        i2c = ensureI2C(i2c, backend)
+        self._i2c = i2c
         self._servos = {}
         self._servo_frequency = servo_frequency
         self._frequency = frequency
         self._resolution = resolution
         self._address = address
-        self._device = i2c.get_i2c_device(address, **kwargs)
-
-        self.set_all_pwm(0, 0)
-        self._device.write8(MODE2, OUTDRV)
-        self._device.write8(MODE1, ALLCALL)
-
-        time.sleep(0.005)  # wait for oscillator
-        mode = self._device.readU8(MODE1)
-        mode = mode & ~SLEEP  # wake up (reset sleep)
-        self._device.write8(MODE1, mode)
-        time.sleep(0.005)  # wait for oscillator
-        self.set_pwm_freq(self._servo_frequency)
+        self._trace_sample_rate = trace_sample_rate
+        self._bus = bus_key(i2c, kwargs.get('busnum'))
+        self._calibration_cache = None if calibration_file is None else CalibrationCache(calibration_file)
+        self._calibration = None
+        if self._calibration_cache is not None:
+            self._calibration = self._calibration_cache.get(self._bus[1], address)
+            if self._calibration is not None:
+                logger.info('Using calibrated oscillator frequency %f Hz for controller %d',
+                            self._calibration.oscillator, address)
+                self._frequency = self._calibration.oscillator
+        self._device = bus_statistics.InstrumentedDevice(
+            i2c.get_i2c_device(address, **kwargs), bus_statistics.get_statistics(self._bus, address))
+        self._shadow = bytearray(256)
+        self._dirty = set()
+        self._flushes = 0
+        self._drift = 0
+        self._shadow_verify_interval = shadow_verify_interval
+        # all boards on a bus share the arbiter, which also guards the shadow
+        self._arbiter = get_arbiter(self._bus)
+        self._writer = None
+        # last ticks committed per channel, None if the channel was written by other means
+        self._committed = [None] * 16
+        self._commit_lock = threading.Lock()
+        self._skipped_writes = 0
+
+        prescale = self._calculate_prescale(self._servo_frequency)
+        with self._arbiter:
+            # The prescale can only be written while sleeping. If the board already holds the
+            # right value (warm start) it stays awake and the sleep/restart cycle is skipped.
+            restart = self._device.readU8(PRESCALE) != prescale
+            if restart:
+                self._device.write8(MODE1, ALLCALL | AI | SLEEP)
+                self._device.write8(PRESCALE, prescale)
+            else:
+                self._device.write8(MODE1, ALLCALL | AI)
+            # auto-increment is on from here, so the rest goes out as block transfers
+            self._load_shadow()
+            self._stage(MODE1, [ALLCALL | AI, OUTDRV])   # wake up, MODE2 totem pole outputs
+            self._stage(ALL_LED_ON_L, _pwm_bytes(0, 0))
+            self.flush()
+        if restart:
+            time.sleep(OSCILLATOR_STARTUP)
+            with self._arbiter:
+                # RESTART clears itself on the board, so it always goes out and is never shadowed
+                self._device.write8(MODE1, self._read8(MODE1) | RESTART)
+        if asynchronous:
+            self._writer = AsyncWriter(self)
         logger.info("Registered controller on address %d" % address)
 
     @classmethod
@@ -164,12 +332,23 @@ class PCA9685(object):
         :param data: The dictionary containing the servo data. Must adhere to Controller.ControllerSchema
         :type data: dictionary
         """
+        kwargs = {}
+        if 'busnum' in data:
+            kwargs['busnum'] = data['busnum']
+        if resolve_backend(data.get('backend')) == 'simulated' and 'simulation' in data:
+            kwargs.update(data['simulation'])
         instance = cls(
             data['address'],
             None,
             data['frequency'],
             data['resolution'],
-            data['servo_frequency']
+            data['servo_frequency'],
+            data.get('shadow_verify_interval', 0),
+            data.get('backend'),
+            data.get('asynchronous', False),
+            data.get('calibration_file'),
+            data.get('trace_sample_rate', DEFAULT_SAMPLE_RATE),
+            **kwargs
         )
         if data['logging_level'] is not None:
             logger.setLevel(data['logging_level'])
@@ -184,6 +363,15 @@ class PCA9685(object):
         """
         return self._address
 
+    @property
+    def i2c(self):
+        """Gets the I2C interface the board is driven through.
+
+        :return: The I2C interface module.
+        :rtype: Adafruit_GPIO.I2C or controller.simulated_i2c
+        """
+        return self._i2c
+
     @property
     def frequency(self) -> int:
         """Gets the servo frequency configured for the board.
@@ -193,6 +381,28 @@ class PCA9685(object):
         """
         return self._servo_frequency
 
+    @property
+    def tick_length(self) -> float:
+        """Gets the duration of a tick in microseconds. Uses the calibrated oscillator and the
+        prescale the board runs with if the board has been calibrated, the nominal servo
+        frequency otherwise.
+
+        :return: The tick duration in microseconds.
+        :rtype: float
+        """
+        if self._calibration is not None:
+            return self._calibration.tick_length(self._read8(PRESCALE))
+        return 1000000.0 / float(self._servo_frequency) / float(self._resolution)
+
+    @property
+    def calibration(self) -> OscillatorCalibration:
+        """Gets the oscillator calibration of the board.
+
+        :return: The calibration or None if the board has not been calibrated.
+        :rtype: OscillatorCalibration
+        """
+        return self._calibration
+
     @property
     def resolution(self) -> int:
         """Gets the pulse resolution for the board.
@@ -202,6 +412,60 @@ class PCA9685(object):
         """
         return self._resolution
 
+    @property
+    def drift(self) -> int:
+        """Gets the number of registers found to differ between shadow and board.
+
+        :return: The number of drifted registers detected so far.
+        :rtype: int
+        """
+        return self._drift
+
+    @property
+    def writer(self) -> AsyncWriter:
+        """Gets the background writer if the board runs asynchronously.
+
+        :return: The writer or None.
+        :rtype: AsyncWriter
+        """
+        return self._writer
+
+    @property
+    def arbiter(self) -> BusArbiter:
+        """Gets the arbiter of the bus the board is on.
+
+        :return: The bus arbiter, which also reports contention statistics.
+        :rtype: BusArbiter
+        """
+        return self._arbiter
+
+    @property
+    def statistics(self) -> {}:
+        """Gets a snapshot of the I2C transaction statistics for the board address on its bus.
+
+        :return: Transaction, byte and latency counters and histograms per register class.
+        :rtype: dictionary
+        """
+        return bus_statistics.snapshot(self._bus, self._address)
+
+    @property
+    def trace_sample_rate(self) -> int:
+        """Gets the sample rate for logging servo operations.
+
+        :return: One in trace_sample_rate servo operations is logged, 0 for none.
+        :rtype: int
+        """
+        return self._trace_sample_rate
+
+    @property
+    def skipped_writes(self) -> int:
+        """Gets the number of channel writes skipped because the channel already had the ticks.
+
+        :return: The number of skipped channel writes.
+        :rtype: int
+        """
+        return self._skipped_writes
+
     @property
     def servos(self) -> {}:
         """Gets the collection of servos on the board.
@@ -212,6 +476,27 @@ class PCA9685(object):
         return self._resolution
 
 
+    def reset_statistics(self):
+        """reset_statistics
+        Resets the I2C transaction statistics for the board address on its bus and the skipped
+        write count.
+        """
+        bus_statistics.reset(self._bus, self._address)
+        self._skipped_writes = 0
+
+    def committed_ticks(self, channel: int) -> int:
+        """committed_ticks
+        Gets the ticks last committed for a channel with commit_frame.
+
+        :param channel: The channel.
+        :type channel: int
+
+        :return: The ticks, or None if the channel has been changed by set_pwm, set_all_pwm or
+                 set_off since, or never been committed.
+        :rtype: int
+        """
+        return self._committed[channel]
+
     def add_servo(self, channel: int, attributes: ServoAttributes = None):
         """add_servo
         Adds a servo definition for a given channel.
@@ -291,6 +576,70 @@ class PCA9685(object):
         servo = self._servos[channel]
         servo.set_angle(angle)
 
+    def set_servo_angles(self, angles: {}):
+        """set_servo_angles
+        Sets several servos to certain angles and commits them as a single frame.
+
+        :param angles: The angles to set, keyed by channel.
+        :type angles: dictionary of int -> float
+
+        """
+        frame = {}
+        for channel, angle in angles.items():
+            if channel < 0 or channel > 15:
+                raise ValueError('Channel must be between 0 and 15')
+
+            if channel not in self._servos:
+                raise KeyError('There is no servo registered on channel %d' % channel)
+
+            frame[channel] = self._servos[channel].stage_angle(angle)
+        self.commit_frame(frame)
+
+    def calibrate(self, measured_pulse: float = None, ticks: int = None, measured_frequency: float = None,
+                  calibration_file: str = None) -> OscillatorCalibration:
+        """calibrate
+        Calibrates the oscillator frequency from a reference measurement, which is either the
+        width of a pulse of known ticks or the PWM frequency, measured with a scope or logic
+        analyzer on one of the channels. The calibration is applied to the board and all
+        servos and stored in the calibration cache.
+
+        :param measured_pulse: The measured pulse width in milliseconds.
+        :type measured_pulse: float
+
+        :param ticks: The number of off ticks of the measured channel (on ticks being 0).
+        :type ticks: int
+
+        :param measured_frequency: The measured PWM frequency in Hz, as an alternative to the pulse.
+        :type measured_frequency: float
+
+        :param calibration_file: Path of the calibration cache. Defaults to the file the board was
+                                 configured with.
+        :type calibration_file: str
+
+        :return: The calibration.
+        :rtype: OscillatorCalibration
+        """
+        prescale = self._read8(PRESCALE)
+        if measured_frequency is not None:
+            oscillator = oscillator_from_frequency(measured_frequency, prescale, self._resolution)
+        elif measured_pulse is not None and ticks is not None:
+            oscillator = oscillator_from_pulse(ticks, measured_pulse, prescale)
+        else:
+            raise ValueError('Either measured_frequency or measured_pulse and ticks are required')
+        logger.info('Controller %d oscillator calibrated to %f Hz (configured %f Hz)',
+                    self._address, oscillator, self._frequency)
+
+        self._calibration = OscillatorCalibration(self._bus[1], self._address, oscillator, self._resolution, self._servo_frequency)
+        self._frequency = oscillator
+        if calibration_file is not None:
+            self._calibration_cache = CalibrationCache(calibration_file)
+        if self._calibration_cache is None:
+            self._calibration_cache = CalibrationCache()
+        self._calibration_cache.put(self._calibration)
+
+        self.set_pwm_freq(self._servo_frequency)
+        return self._calibration
+
     def set_pwm_freq(self, servo_frequency: int):
         """set_pwm_freq
         Set the PWM frequency to the provided value in hertz.
@@ -299,21 +648,28 @@ class PCA9685(object):
         :type servo_frequency: integer
 
         """
-        prescaleval = float(self._frequency)
-        prescaleval /= float(self._resolution)
-        prescaleval /= float(servo_frequency)
-        prescaleval -= 1
         logger.info('Setting PWM frequency to %d Hz', servo_frequency)
-        logger.info('Estimated pre-scale: %f', prescaleval)
-        prescale = int(math.floor(prescaleval + 0.5))
-        logger.info('Final pre-scale: %d', prescale)
-        oldmode = self._device.readU8(MODE1)
-        newmode = (oldmode & 0x7F) | 0x10    # sleep
-        self._device.write8(MODE1, newmode)  # go to sleep
-        self._device.write8(PRESCALE, prescale)
-        self._device.write8(MODE1, oldmode)
-        time.sleep(0.005)
-        self._device.write8(MODE1, oldmode | 0x80)
+        prescale = self._calculate_prescale(servo_frequency)
+        self.wait()
+        self._servo_frequency = servo_frequency
+        with self._arbiter:
+            restart = self._read8(PRESCALE) != prescale
+            if restart:
+                oldmode = self._read8(MODE1)
+                newmode = (oldmode & 0x7F) | 0x10    # sleep
+                self._write8(MODE1, newmode)         # go to sleep
+                self._write8(PRESCALE, prescale)
+                self._write8(MODE1, oldmode)
+            else:
+                logger.info('Pre-scale already set, skipping sleep cycle')
+        if restart:
+            time.sleep(OSCILLATOR_STARTUP)           # leave the bus to other boards meanwhile
+            with self._arbiter:
+                # RESTART clears itself on the board, so it always goes out and is never shadowed
+                self._device.write8(MODE1, oldmode | 0x80)
+        # the tick length follows the frequency
+        for servo in self._servos.values():
+            servo.refresh()
 
     def set_off(self, channel: int, tf: bool = True):
         """set_off
@@ -327,14 +683,17 @@ class PCA9685(object):
         :type tf: bool
         
         """
-        oldmode = self._device.readU8(LED0_OFF_H+4*channel)
-        if tf == 1:
-            mode = oldmode | 0x10
-            logger.info('Setting servo on channel %d to OFF', channel)
-        else:
-            mode = oldmode & 0xEF
-            logger.info('Setting servo on channel %d to PWM', channel)
-        self._device.write8(LED0_OFF_H+4*channel, mode)
+        self.wait()
+        with self._arbiter:
+            self._forget_committed([channel])
+            oldmode = self._read8(LED0_OFF_H+4*channel)
+            if tf == 1:
+                mode = oldmode | 0x10
+                logger.info('Setting servo on channel %d to OFF', channel)
+            else:
+                mode = oldmode & 0xEF
+                logger.info('Setting servo on channel %d to PWM', channel)
+            self._write8(LED0_OFF_H+4*channel, mode)
 
 
     def set_pwm(self, channel: int, on_ticks: int, off_ticks: int):
@@ -358,10 +717,12 @@ class PCA9685(object):
         if on_ticks > off_ticks:
             raise ValueError('Value for on_ticks must be less than or equal to value for off_ticks')
 
-        self._device.write8(LED0_ON_L+4*channel, on_ticks & 0xFF)
-        self._device.write8(LED0_ON_H+4*channel, on_ticks >> 8)
-        self._device.write8(LED0_OFF_L+4*channel, off_ticks & 0xFF)
-        self._device.write8(LED0_OFF_H+4*channel, off_ticks >> 8)
+        # MODE1 has auto-increment enabled, so all four registers go out in one block transaction
+        self.wait()
+        with self._arbiter:
+            self._forget_committed([channel])
+            self._stage(LED0_ON_L+4*channel, _pwm_bytes(on_ticks, off_ticks))
+            self.flush()
 
     def set_all_pwm(self, on_ticks: int, off_ticks: int):
         """set_pwm
@@ -378,7 +739,256 @@ class PCA9685(object):
             raise ValueError('Value for on_ticks must be greater or equaly to zero')
         if on_ticks > off_ticks:
             raise ValueError('Value for on_ticks must be less than or equal to value for off_ticks')
-        self._device.write8(ALL_LED_ON_L, on_ticks & 0xFF)
-        self._device.write8(ALL_LED_ON_H, on_ticks >> 8)
-        self._device.write8(ALL_LED_OFF_L, off_ticks & 0xFF)
-        self._device.write8(ALL_LED_OFF_H, off_ticks >> 8)
+        self.wait()
+        with self._arbiter:
+            self._forget_committed(range(16))
+            self._stage(ALL_LED_ON_L, _pwm_bytes(on_ticks, off_ticks))
+            self.flush()
+
+    def commit_frame(self, frame: {}):
+        """commit_frame
+        Sets the pulse for several channels at once. Only registers that change are written and
+        channels that are adjacent on the board are coalesced into a single auto-increment
+        block write, so a frame for channels 12 to 15 is at most one I2C transaction.
+
+        Channels that already have the ticks from the last committed frame are dropped from the
+        frame and counted as skipped writes. A frame without changes does not touch the bus.
+
+        If the board runs asynchronously the frame is handed to the background writer and
+        the call returns before the frame is written. Within bus_frame the frame is collected
+        and written with the frames of the other boards on exit.
+
+        :param frame: The off ticks to set, keyed by channel. The on ticks are always 0.
+        :type frame: dictionary of int -> int
+
+        """
+        batch = getattr(_frame_batch, 'frames', None)
+        if batch is not None and self._writer is None:
+            self._validate_frame(frame)
+            batch.setdefault(self, {}).update(frame)
+            return
+
+        frame = self._changed_channels(frame)
+        if not frame:
+            return
+
+        if self._writer is not None:
+            self._writer.post(frame)
+        else:
+            self.write_frame(frame)
+
+    @staticmethod
+    def _validate_frame(frame: {}):
+        for channel, ticks in frame.items():
+            if channel < 0 or channel > 15:
+                raise ValueError('Channel must be between 0 and 15')
+            if ticks < 0:
+                raise ValueError('Value for off_ticks must be greater or equaly to zero')
+
+    def _changed_channels(self, frame: {}) -> {}:
+        """_changed_channels
+        Validates a frame and drops the channels that already have the committed ticks. The
+        remaining channels are committed.
+
+        :return: The changed channels of the frame.
+        :rtype: dictionary of int -> int
+        """
+        self._validate_frame(frame)
+        with self._commit_lock:
+            changed = {channel: ticks for channel, ticks in frame.items() if self._committed[channel] != ticks}
+            self._skipped_writes += len(frame) - len(changed)
+            for channel, ticks in changed.items():
+                self._committed[channel] = ticks
+        return changed
+
+    def write_frame(self, frame: {}):
+        """write_frame
+        Writes a validated frame to the board on the calling thread. The bus is held for the
+        whole frame, so frames of different arms never interleave. If the write fails, the
+        committed ticks of the frame channels are forgotten, so committing them again retries
+        the write instead of skipping it.
+
+        :param frame: The off ticks to set, keyed by channel. The on ticks are always 0.
+        :type frame: dictionary of int -> int
+
+        """
+        with self._arbiter:
+            try:
+                self._stage_frame(frame)
+                self.flush()
+            except Exception:
+                self._forget_committed(frame)
+                raise
+
+    def _stage_frame(self, frame: {}):
+        for channel in sorted(frame):
+            self._stage(LED0_ON_L+4*channel, _pwm_bytes(0, frame[channel]))
+
+    def _forget_committed(self, channels: [int]):
+        """_forget_committed
+        Marks the committed ticks of channels as unknown, so the next commit_frame writes them.
+        Callers hold the arbiter, so a frame committed meanwhile is written after their change.
+
+        :param channels: The channels.
+        :type channels: iterable of int
+        """
+        with self._commit_lock:
+            for channel in channels:
+                self._committed[channel] = None
+
+    def wait(self, timeout: float = None) -> bool:
+        """wait
+        Waits until the background writer has written all posted frames. Returns immediately
+        if the board runs synchronously.
+
+        :param timeout: Maximum time to wait in seconds. None to wait indefinitely.
+        :type timeout: float
+
+        :return: True if all frames have been written, False on timeout.
+        :rtype: bool
+        """
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
+
+    def flush(self):
+        """flush
+        Writes all dirty registers in the shadow to the board. Runs of dirty registers are
+        written as auto-increment block writes.
+        """
+        with self._arbiter:
+            if not self._dirty:
+                return
+            registers = sorted(self._dirty)
+            self._dirty.clear()
+            try:
+                self._device.write_blocks(self._blocks(registers))
+            except Exception:
+                # the board may not have the values, keep them for the next flush
+                self._dirty.update(registers)
+                raise
+            self._flushed()
+
+    def _flushed(self):
+        """_flushed
+        Counts a successful flush and verifies the shadow every shadow-verify-interval flushes.
+        """
+        self._flushes += 1
+        if self._shadow_verify_interval > 0 and self._flushes % self._shadow_verify_interval == 0:
+            self.verify_shadow()
+
+    def _blocks(self, registers: [int]) -> [(int, [int])]:
+        """_blocks
+        Coalesces the shadow values of sorted registers into block writes. The blocks are
+        handed to the device together so backends that support it can combine them into a
+        single bus transfer.
+
+        :return: Tuples of start register and data.
+        :rtype: list
+        """
+        blocks = []
+        start = 0
+        while start < len(registers):
+            end = start + 1
+            while end < len(registers) and \
+                  registers[end] - registers[end-1] <= MAX_BLOCK_GAP + 1 and \
+                  registers[end] - registers[start] < MAX_BLOCK_LENGTH:
+                end += 1
+            first = registers[start]
+            last = registers[end-1]
+            blocks.append((first, list(self._shadow[first:last+1])))
+            start = end
+        return blocks
+
+    def verify_shadow(self) -> int:
+        """verify_shadow
+        Reads the board registers and compares them to the shadow. Registers that differ are
+        logged and the shadow is resynchronized with the board.
+
+        :return: The number of registers that differed.
+        :rtype: int
+        """
+        drift = 0
+        with self._arbiter:
+            for start, end in SHADOW_RANGES:
+                for register, value in zip(range(start, end), self._read_block(start, end - start)):
+                    shadow = self._shadow[register]
+                    if register == MODE1:
+                        value &= ~RESTART
+                    if value != shadow:
+                        logger.warning('Register 0x%02x on controller %d drifted: shadow 0x%02x, board 0x%02x',
+                                       register, self._address, shadow, value)
+                        self._shadow[register] = value
+                        drift += 1
+            if drift:
+                self._forget_committed(range(16))
+            self._drift += drift
+        return drift
+
+    def _calculate_prescale(self, servo_frequency: int) -> int:
+        """_calculate_prescale
+        Calculates the prescale register value for a PWM frequency. The cached prescale is used
+        if the board has been calibrated for the frequency.
+        """
+        if self._calibration is not None and self._calibration.servo_frequency == servo_frequency:
+            return self._calibration.prescale
+        prescaleval = float(self._frequency)
+        prescaleval /= float(self._resolution)
+        prescaleval /= float(servo_frequency)
+        prescaleval -= 1
+        logger.info('Estimated pre-scale: %f', prescaleval)
+        prescale = int(math.floor(prescaleval + 0.5))
+        logger.info('Final pre-scale: %d', prescale)
+        return prescale
+
+    def _load_shadow(self):
+        """_load_shadow
+        Loads the register shadow from the board.
+        """
+        for start, end in SHADOW_RANGES:
+            self._shadow[start:end] = bytes(self._read_block(start, end - start))
+        self._shadow[MODE1] &= ~RESTART
+
+    def _read_block(self, register: int, length: int) -> [int]:
+        """_read_block
+        Reads a range of registers from the board using auto-increment block reads.
+        """
+        if length == 1:
+            return [self._device.readU8(register)]
+        data = []
+        while length > 0:
+            chunk = min(length, MAX_BLOCK_LENGTH)
+            data.extend(self._device.readList(register, chunk))
+            register += chunk
+            length -= chunk
+        return data
+
+    def _read8(self, register: int) -> int:
+        """_read8
+        Reads a register from the shadow.
+        """
+        return self._shadow[register]
+
+    def _write8(self, register: int, value: int):
+        """_write8
+        Writes a register through the shadow. Nothing is sent if the value is unchanged.
+        """
+        self._stage(register, [value])
+        self.flush()
+
+    def _stage(self, register: int, data: [int]):
+        """_stage
+        Updates the shadow for a range of registers and marks the changed ones dirty.
+        """
+        for offset, value in enumerate(data):
+            address = register + offset
+            if address >= ALL_LED_ON_L and address <= ALL_LED_OFF_H:
+                # ALL_LED registers read back as zero but fill every LEDn register when written
+                self._shadow[address] = value
+                self._dirty.add(address)
+                for led in range(LED0_ON_L + address - ALL_LED_ON_L, LED0_ON_L + 4*16, 4):
+                    self._shadow[led] = value
+                    self._dirty.discard(led)
+            elif self._shadow[address] != value:
+                self._shadow[address] = value
+                self._dirty.add(address)
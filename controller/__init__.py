@@ -22,8 +22,13 @@
 # pylint: disable=C0103
 from .schemas import servo_schema as ServoSchema, controller_schema as ControllerSchema
 from .servo import Servo
-from .PCA9685 import PCA9685, software_reset
+from .PCA9685 import PCA9685, software_reset, bus_frame, commit_frames
 from .servo_attributes import ServoAttributes
 from .miuzei_sg90_attributes import MiuzeiSG90Attributes
 from .es08maII_attributes import ES08MAIIAttributes
 from .custom_servo_attributes import CustomServoAttributes
+from .async_writer import AsyncWriter
+from .calibration import OscillatorCalibration, CalibrationCache
+from .bus_arbiter import BusArbiter, snapshot as bus_arbiter_snapshot
+from .bus_statistics import BusStatistics, snapshot as bus_statistics_snapshot, reset as reset_bus_statistics
+from .tracing import Tracer
@@ -0,0 +1,144 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""
+    Asynchronous output stage for a PCA9685. Callers post target ticks per channel and a
+    dedicated thread writes them to the board, newer values replacing unwritten older ones.
+"""
+import logging
+import threading
+
+logger = logging.getLogger('controller.writer')
+
+class AsyncWriter(object):
+    """Coalescing buffer of channel ticks flushed to a controller by a writer thread."""
+
+    def __init__(self, controller):
+        """__init__
+        Initializes the writer and starts its thread.
+
+        :param controller: The controller to write to.
+        :type controller: PCA9685
+        """
+        self._controller = controller
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._busy = False
+        self._running = True
+        self._posted = 0
+        self._superseded = 0
+        self._frames = 0
+        self._errors = 0
+        self._thread = threading.Thread(
+            target=self._run, name='pca9685-writer-%d' % controller.address, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Gets the number of channels waiting to be written.
+
+        :rtype: int
+        """
+        with self._condition:
+            return len(self._pending)
+
+    @property
+    def statistics(self) -> {}:
+        """Gets the number of posted values, values superseded before they were written,
+        frames written and failed frames.
+
+        :rtype: dictionary
+        """
+        with self._condition:
+            return {
+                'posted': self._posted,
+                'superseded': self._superseded,
+                'frames': self._frames,
+                'errors': self._errors
+            }
+
+    def post(self, frame: {}):
+        """post
+        Posts ticks for one or more channels. Values for channels that have not been written
+        yet are replaced.
+
+        :param frame: The off ticks to set, keyed by channel.
+        :type frame: dictionary of int -> int
+        """
+        with self._condition:
+            if not self._running:
+                raise RuntimeError('The writer for controller %d has been stopped' % self._controller.address)
+            for channel, ticks in frame.items():
+                if channel in self._pending:
+                    self._superseded += 1
+                self._pending[channel] = ticks
+            self._posted += len(frame)
+            self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """flush
+        Waits until all posted values have been written.
+
+        :param timeout: Maximum time to wait in seconds. None to wait indefinitely.
+        :type timeout: float
+
+        :return: True if everything was written, False on timeout.
+        :rtype: bool
+        """
+        if threading.current_thread() is self._thread:
+            return True
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def stop(self, timeout: float = None):
+        """stop
+        Writes the remaining values and stops the writer thread.
+
+        :param timeout: Maximum time to wait in seconds. None to wait indefinitely.
+        :type timeout: float
+        """
+        self.flush(timeout)
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        """Writer thread loop."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or not self._running)
+                if not self._pending:
+                    return
+                frame = self._pending
+                self._pending = {}
+                self._busy = True
+            try:
+                self._controller.write_frame(frame)
+            except Exception:       # pylint: disable=W0703
+                logger.exception('Failed to write frame to controller %d', self._controller.address)
+                with self._condition:
+                    self._errors += 1
+            with self._condition:
+                self._frames += 1
+                self._busy = False
+                self._condition.notify_all()
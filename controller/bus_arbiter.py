@@ -0,0 +1,180 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""
+    Arbitration of a shared I2C bus between all controllers attached to it
+"""
+import time
+import threading
+
+_arbiters = {}
+_arbiters_lock = threading.Lock()
+
+def bus_key(i2c, busnum: int = None) -> (str, int):
+    """bus_key
+    Identifies a bus by I2C interface and bus number.
+
+    :param i2c: The I2C interface module.
+    :type i2c: Adafruit_GPIO.I2C or controller.simulated_i2c
+
+    :param busnum: The bus number. None for the interface's default bus.
+    :type busnum: int
+
+    :rtype: (str, int)
+    """
+    if busnum is None:
+        busnum = i2c.get_default_bus()
+    return i2c.__name__, busnum
+
+def get_arbiter(key: (str, int)) -> "BusArbiter":
+    """get_arbiter
+    Gets the arbiter for a bus, creating it on first use.
+
+    :param key: The bus key as returned by bus_key
+    :type key: (str, int)
+
+    :rtype: BusArbiter
+    """
+    with _arbiters_lock:
+        if key not in _arbiters:
+            _arbiters[key] = BusArbiter(key)
+        return _arbiters[key]
+
+def snapshot() -> {}:
+    """snapshot
+    Takes a snapshot of the contention statistics of all buses.
+
+    :return: The statistics keyed by bus key.
+    :rtype: dictionary
+    """
+    with _arbiters_lock:
+        arbiters = list(_arbiters.values())
+    return {a.key: a.statistics for a in arbiters}
+
+
+class BusArbiter(object):
+    """
+    Fair, reentrant lock for one I2C bus. Threads are served in the order they asked for the
+    bus, so frames from independent arms interleave instead of one arm starving another. A
+    thread holding the bus can acquire it again, which lets a controller hold the bus for a
+    whole frame while its helpers lock per transaction.
+    """
+
+    def __init__(self, key: (str, int)):
+        """__init__
+        Initializes the arbiter.
+
+        :param key: The bus key.
+        :type key: (str, int)
+        """
+        self._key = key
+        self._condition = threading.Condition(threading.Lock())
+        self._next_ticket = 0
+        self._serving = 0
+        self._owner = None
+        self._depth = 0
+        self._acquired_at = 0
+        self.reset_statistics()
+
+    @property
+    def key(self) -> (str, int):
+        """Gets the bus key.
+
+        :rtype: (str, int)
+        """
+        return self._key
+
+    @property
+    def statistics(self) -> {}:
+        """Gets the contention statistics. Times are in seconds.
+
+        :return: Number of acquisitions, contended acquisitions, total and maximum wait time,
+                 total hold time and the longest queue of waiting threads.
+        :rtype: dictionary
+        """
+        with self._condition:
+            return {
+                'acquisitions': self._acquisitions,
+                'contended': self._contended,
+                'wait_time': self._wait_time / 1e9,
+                'max_wait': self._max_wait / 1e9,
+                'hold_time': self._hold_time / 1e9,
+                'max_queue': self._max_queue
+            }
+
+    def reset_statistics(self):
+        """reset_statistics
+        Clears the contention statistics.
+        """
+        self._acquisitions = 0
+        self._contended = 0
+        self._wait_time = 0
+        self._max_wait = 0
+        self._hold_time = 0
+        self._max_queue = 0
+
+    def acquire(self):
+        """acquire
+        Acquires the bus, waiting for the threads that asked before.
+        """
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner == me:
+                self._depth += 1
+                return
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._acquisitions += 1
+            if ticket != self._serving or self._owner is not None:
+                self._contended += 1
+                self._max_queue = max(self._max_queue, self._next_ticket - self._serving)
+                start = time.perf_counter_ns()
+                while ticket != self._serving or self._owner is not None:
+                    self._condition.wait()
+                waited = time.perf_counter_ns() - start
+                self._wait_time += waited
+                self._max_wait = max(self._max_wait, waited)
+            self._owner = me
+            self._depth = 1
+            self._acquired_at = time.perf_counter_ns()
+
+    def release(self):
+        """release
+        Releases the bus.
+        """
+        with self._condition:
+            if self._owner != threading.get_ident():
+                raise RuntimeError('Cannot release a bus that is not held by this thread')
+            self._depth -= 1
+            if self._depth > 0:
+                return
+            self._hold_time += time.perf_counter_ns() - self._acquired_at
+            self._owner = None
+            self._serving += 1
+            self._condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
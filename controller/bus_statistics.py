@@ -0,0 +1,324 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""
+    Transaction counters and latency histograms for I2C devices, kept per bus and controller address
+"""
+import time
+import threading
+
+# Register classes of the PCA9685 used to break down the statistics
+REGISTER_CLASSES = ('mode', 'led', 'all_led', 'prescale', 'raw')
+# Latency histogram buckets are powers of two in microseconds; the last bucket is open ended
+HISTOGRAM_BUCKETS = 24
+
+_statistics = {}
+_statistics_lock = threading.Lock()
+
+def register_class(register: int) -> str:
+    """register_class
+    Classifies a PCA9685 register.
+
+    :param register: The register or None for raw transactions without register.
+    :type register: int
+
+    :return: One of REGISTER_CLASSES
+    :rtype: str
+    """
+    if register is None:
+        return 'raw'
+    if register < 0x06:
+        return 'mode'
+    if register < 0x46:
+        return 'led'
+    if register == 0xFE:
+        return 'prescale'
+    return 'all_led'
+
+def get_statistics(bus: (str, int), address: int) -> "BusStatistics":
+    """get_statistics
+    Gets the statistics for a controller address on a bus, creating them on first use.
+
+    :param bus: The bus key as returned by bus_arbiter.bus_key
+    :type bus: (str, int)
+
+    :param address: The controller address.
+    :type address: int
+
+    :rtype: BusStatistics
+    """
+    with _statistics_lock:
+        if (bus, address) not in _statistics:
+            _statistics[(bus, address)] = BusStatistics(bus, address)
+        return _statistics[(bus, address)]
+
+def snapshot(bus: (str, int) = None, address: int = None) -> {}:
+    """snapshot
+    Takes a snapshot of the statistics.
+
+    :param bus: The bus key. None for all buses and addresses.
+    :type bus: (str, int)
+
+    :param address: The controller address. None for all addresses.
+    :type address: int
+
+    :return: The snapshot for the bus and address, or a dictionary of snapshots keyed by
+             (bus, address).
+    :rtype: dictionary
+    """
+    if bus is not None and address is not None:
+        return get_statistics(bus, address).snapshot()
+    with _statistics_lock:
+        statistics = list(_statistics.values())
+    return {(s.bus, s.address): s.snapshot() for s in statistics
+            if (bus is None or s.bus == bus) and (address is None or s.address == address)}
+
+def reset(bus: (str, int) = None, address: int = None):
+    """reset
+    Resets the statistics.
+
+    :param bus: The bus key. None for all buses.
+    :type bus: (str, int)
+
+    :param address: The controller address. None for all addresses.
+    :type address: int
+    """
+    if bus is not None and address is not None:
+        get_statistics(bus, address).reset()
+        return
+    with _statistics_lock:
+        statistics = list(_statistics.values())
+    for s in statistics:
+        if (bus is None or s.bus == bus) and (address is None or s.address == address):
+            s.reset()
+
+def write_combined(writes: [("InstrumentedDevice", [(int, [int])])]) -> bool:
+    """write_combined
+    Writes the register blocks of several devices on one bus in a single transfer, if the bus
+    supports transfers to several devices. The transfer time is shared among the devices by
+    the number of bytes written to each.
+
+    :param writes: Tuples of device and its blocks of start register and data.
+    :type writes: list
+
+    :return: False if the bus cannot combine the writes, nothing has been written then.
+    :rtype: bool
+    """
+    bus = getattr(writes[0][0].device, 'bus', None)
+    if not hasattr(bus, 'write_blocks') or \
+       any(getattr(device.device, 'bus', None) is not bus for device, blocks in writes):
+        return False
+    lengths = [sum(1 + len(data) for register, data in blocks) for device, blocks in writes]
+    start = time.perf_counter_ns()
+    try:
+        bus.write_blocks([(device.device.address, register, data)
+                          for device, blocks in writes for register, data in blocks])
+    finally:
+        elapsed = time.perf_counter_ns() - start
+        total = sum(lengths)
+        for (device, blocks), length in zip(writes, lengths):
+            device.statistics.record(register_class(blocks[0][0]), length, elapsed * length // total)
+    return True
+
+
+class BusStatistics(object):
+    """Counters and histograms of the I2C transactions of one controller address on a bus."""
+
+    def __init__(self, bus: (str, int), address: int):
+        """__init__
+        Initializes the statistics.
+
+        :param bus: The bus key.
+        :type bus: (str, int)
+
+        :param address: The controller address.
+        :type address: int
+        """
+        self._bus = bus
+        self._address = address
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def bus(self) -> (str, int):
+        """Gets the bus key.
+
+        :rtype: (str, int)
+        """
+        return self._bus
+
+    @property
+    def address(self) -> int:
+        """Gets the controller address.
+
+        :rtype: int
+        """
+        return self._address
+
+    def reset(self):
+        """reset
+        Clears all counters and histograms.
+        """
+        with self._lock:
+            self._since = time.perf_counter()
+            # per register class: [transactions, bytes, time in ns, max time in ns, histogram]
+            self._classes = {c: [0, 0, 0, 0, [0] * HISTOGRAM_BUCKETS] for c in REGISTER_CLASSES}
+            self._sizes = {}
+
+    def record(self, register_class: str, length: int, elapsed_ns: int):
+        """record
+        Records a transaction.
+
+        :param register_class: The register class, one of REGISTER_CLASSES
+        :type register_class: str
+
+        :param length: The number of bytes transferred including the register byte.
+        :type length: int
+
+        :param elapsed_ns: The duration of the transaction in nanoseconds.
+        :type elapsed_ns: int
+        """
+        bucket = min((elapsed_ns // 1000).bit_length(), HISTOGRAM_BUCKETS - 1)
+        with self._lock:
+            counters = self._classes[register_class]
+            counters[0] += 1
+            counters[1] += length
+            counters[2] += elapsed_ns
+            if elapsed_ns > counters[3]:
+                counters[3] = elapsed_ns
+            counters[4][bucket] += 1
+            self._sizes[length] = self._sizes.get(length, 0) + 1
+
+    def snapshot(self) -> {}:
+        """snapshot
+        Takes a consistent snapshot of the counters. Times are in seconds, histogram keys are
+        the upper bucket bounds in microseconds (None for the open ended last bucket).
+
+        :return: The statistics as a dictionary
+        :rtype: dictionary
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self._since
+            classes = {}
+            transactions = 0
+            length = 0
+            bus_time = 0
+            for name, (count, size, duration, longest, histogram) in self._classes.items():
+                transactions += count
+                length += size
+                bus_time += duration
+                classes[name] = {
+                    'transactions': count,
+                    'bytes': size,
+                    'time': duration / 1e9,
+                    'max': longest / 1e9,
+                    'histogram': {
+                        (1 << bucket if bucket < HISTOGRAM_BUCKETS - 1 else None): n
+                        for bucket, n in enumerate(histogram) if n > 0
+                    }
+                }
+            sizes = dict(sorted(self._sizes.items()))
+        return {
+            'bus': self._bus,
+            'address': self._address,
+            'transactions': transactions,
+            'bytes': length,
+            'bus_time': bus_time / 1e9,
+            'elapsed': elapsed,
+            'utilization': bus_time / 1e9 / elapsed if elapsed > 0 else 0.0,
+            'classes': classes,
+            'sizes': sizes
+        }
+
+
+class InstrumentedDevice(object):
+    """Wraps an I2C device and records every transaction in BusStatistics."""
+
+    def __init__(self, device, statistics: BusStatistics):
+        """__init__
+        Initializes the wrapper.
+
+        :param device: The I2C device to wrap.
+        :type device: Adafruit_GPIO.I2C.Device
+
+        :param statistics: The statistics to record into.
+        :type statistics: BusStatistics
+        """
+        self._device = device
+        self._statistics = statistics
+
+    @property
+    def device(self):
+        """Gets the wrapped device."""
+        return self._device
+
+    @property
+    def statistics(self) -> BusStatistics:
+        """Gets the statistics the device records into."""
+        return self._statistics
+
+    def __getattr__(self, name):
+        return getattr(self._device, name)
+
+    def _timed(self, register: int, length: int, operation, *args):
+        start = time.perf_counter_ns()
+        try:
+            return operation(*args)
+        finally:
+            self._statistics.record(register_class(register), length, time.perf_counter_ns() - start)
+
+    def writeRaw8(self, value: int):
+        """Write an 8-bit value on the bus (without register)."""
+        return self._timed(None, 1, self._device.writeRaw8, value)
+
+    def write8(self, register: int, value: int):
+        """Write an 8-bit value to the specified register."""
+        return self._timed(register, 2, self._device.write8, register, value)
+
+    def writeList(self, register: int, data: [int]):
+        """Write bytes to the specified register."""
+        return self._timed(register, 1 + len(data), self._device.writeList, register, data)
+
+    def write_blocks(self, blocks: [(int, [int])]):
+        """write_blocks
+        Writes several register blocks. Devices that can combine the blocks into one transfer
+        record a single transaction, others get one write per block.
+
+        :param blocks: Tuples of start register and data.
+        :type blocks: list
+        """
+        if hasattr(self._device, 'write_blocks'):
+            length = sum(1 + len(data) for register, data in blocks)
+            return self._timed(blocks[0][0], length, self._device.write_blocks, blocks)
+        for register, data in blocks:
+            if len(data) == 1:
+                self.write8(register, data[0])
+            else:
+                self.writeList(register, data)
+
+    def readList(self, register: int, length: int) -> bytearray:
+        """Read a length number of bytes from the specified register."""
+        return self._timed(register, 1 + length, self._device.readList, register, length)
+
+    def readU8(self, register: int) -> int:
+        """Read an unsigned byte from the specified register."""
+        return self._timed(register, 2, self._device.readU8, register)
@@ -0,0 +1,226 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""
+    Oscillator calibration for PCA9685 boards. The internal oscillator of each board deviates
+    from its nominal frequency, which shifts every pulse computed from it. A calibration derives
+    the real frequency from a reference measurement and is cached per bus and board address.
+"""
+import os
+import json
+import math
+import threading
+
+DEFAULT_CALIBRATION_FILE = 'pca9685.calibration.json'
+
+_file_lock = threading.Lock()
+
+def oscillator_from_pulse(ticks: int, measured_pulse: float, prescale: int) -> float:
+    """oscillator_from_pulse
+    Calculates the oscillator frequency from the measured width of a pulse of known ticks.
+
+    :param ticks: The number of ticks the measured channel was set to.
+    :type ticks: int
+
+    :param measured_pulse: The measured pulse width in milliseconds.
+    :type measured_pulse: float
+
+    :param prescale: The prescale register value at the time of the measurement.
+    :type prescale: int
+
+    :return: The oscillator frequency in Hz.
+    :rtype: float
+    """
+    if ticks <= 0 or measured_pulse <= 0:
+        raise ValueError('Ticks and measured pulse must be greater than zero')
+    # every tick lasts (prescale + 1) oscillator cycles
+    return ticks * (prescale + 1) / (measured_pulse / 1000.0)
+
+def oscillator_from_frequency(measured_frequency: float, prescale: int, resolution: int = 4096) -> float:
+    """oscillator_from_frequency
+    Calculates the oscillator frequency from the measured PWM frequency.
+
+    :param measured_frequency: The measured PWM frequency in Hz.
+    :type measured_frequency: float
+
+    :param prescale: The prescale register value at the time of the measurement.
+    :type prescale: int
+
+    :param resolution: The pulse resolution of the board.
+    :type resolution: int
+
+    :return: The oscillator frequency in Hz.
+    :rtype: float
+    """
+    if measured_frequency <= 0:
+        raise ValueError('Measured frequency must be greater than zero')
+    return measured_frequency * resolution * (prescale + 1)
+
+def prescale_for(oscillator: float, resolution: int, servo_frequency: float) -> int:
+    """prescale_for
+    Calculates the prescale register value for a PWM frequency.
+
+    :param oscillator: The oscillator frequency in Hz.
+    :type oscillator: float
+
+    :param resolution: The pulse resolution of the board.
+    :type resolution: int
+
+    :param servo_frequency: The desired PWM frequency in Hz.
+    :type servo_frequency: float
+
+    :rtype: int
+    """
+    return int(math.floor(oscillator / resolution / servo_frequency - 1 + 0.5))
+
+
+class OscillatorCalibration(object):
+    """Calibrated oscillator frequency and resulting prescale of one board."""
+
+    def __init__(self, busnum: int, address: int, oscillator: float, resolution: int, servo_frequency: float):
+        """__init__
+        Initializes the calibration and derives the prescale.
+
+        :param busnum: The number of the bus the board is on.
+        :type busnum: int
+
+        :param address: The board address.
+        :type address: int
+
+        :param oscillator: The calibrated oscillator frequency in Hz.
+        :type oscillator: float
+
+        :param resolution: The pulse resolution of the board.
+        :type resolution: int
+
+        :param servo_frequency: The PWM frequency the prescale is calculated for.
+        :type servo_frequency: float
+        """
+        self.busnum = busnum
+        self.address = address
+        self.oscillator = oscillator
+        self.resolution = resolution
+        self.servo_frequency = servo_frequency
+        self.prescale = prescale_for(oscillator, resolution, servo_frequency)
+
+    def tick_length(self, prescale: int = None) -> float:
+        """tick_length
+        Gets the duration of a tick in microseconds.
+
+        :param prescale: The prescale register value. None for the prescale of the calibrated
+                         servo frequency.
+        :type prescale: int
+
+        :rtype: float
+        """
+        if prescale is None:
+            prescale = self.prescale
+        return (prescale + 1) * 1000000.0 / self.oscillator
+
+    @classmethod
+    def from_dict(cls, data: {}):
+        """from_dict
+        Generates OscillatorCalibration from dictionary
+        :param data: The dictionary containing the calibration data.
+        :type data: dictionary
+        """
+        instance = cls(data['busnum'], data['address'], data['oscillator'], data['resolution'], data['servo_frequency'])
+        instance.prescale = data['prescale']
+        return instance
+
+    def to_dict(self) -> {}:
+        """to_dict
+        Returns the calibration as a dictionary
+        :rtype: dictionary
+        """
+        return {
+            'busnum': self.busnum,
+            'address': self.address,
+            'oscillator': self.oscillator,
+            'resolution': self.resolution,
+            'servo_frequency': self.servo_frequency,
+            'prescale': self.prescale
+        }
+
+
+class CalibrationCache(object):
+    """Json file with the oscillator calibrations of all boards, keyed by bus number and address."""
+
+    def __init__(self, path: str = DEFAULT_CALIBRATION_FILE):
+        """__init__
+        Initializes the cache.
+
+        :param path: The path of the cache file.
+        :type path: str
+        """
+        self._path = path
+
+    @property
+    def path(self) -> str:
+        """Gets the path of the cache file.
+
+        :rtype: str
+        """
+        return self._path
+
+    def get(self, busnum: int, address: int) -> OscillatorCalibration:
+        """get
+        Gets the calibration for a board.
+
+        :param busnum: The number of the bus the board is on.
+        :type busnum: int
+
+        :param address: The board address.
+        :type address: int
+
+        :return: The calibration or None if the board has not been calibrated.
+        :rtype: OscillatorCalibration
+        """
+        data = self._load().get(self._key(busnum, address))
+        return None if data is None else OscillatorCalibration.from_dict(data)
+
+    def put(self, calibration: OscillatorCalibration):
+        """put
+        Stores the calibration for a board.
+
+        :param calibration: The calibration.
+        :type calibration: OscillatorCalibration
+        """
+        with _file_lock:
+            data = self._load()
+            data[self._key(calibration.busnum, calibration.address)] = calibration.to_dict()
+            temp = self._path + '.tmp'
+            with open(temp, 'w') as file:
+                json.dump(data, file, indent=4)
+            os.replace(temp, self._path)
+
+    @staticmethod
+    def _key(busnum: int, address: int) -> str:
+        """Builds the key of a board in the cache file."""
+        return '%d:%d' % (busnum, address)
+
+    def _load(self) -> {}:
+        """Reads the cache file. A missing file is an empty cache."""
+        if not os.path.exists(self._path):
+            return {}
+        with open(self._path) as file:
+            return json.load(file)
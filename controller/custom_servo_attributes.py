@@ -21,6 +21,7 @@
 #
 # pylint: disable=C0103
 import json
+from bisect import bisect_right
 from jsonschema import validate
 from .servo_attributes import ServoAttributes
 from .schemas import servo_schema as schema
@@ -34,12 +35,79 @@ class CustomServoAttributes(ServoAttributes):
     Implements an abstract base class for servo properties
     """
 
-    max_pulse = 0
-    min_pulse = 0
-    neutral_pulse = 0
-    min_angle = 0
-    max_angle = 0
-    neutral_angle = 0
+    __slots__ = ('max_pulse', 'min_pulse', 'neutral_pulse', 'min_angle', 'max_angle', 'neutral_angle',
+                 '_curve_angles', '_curve_pulses', '_curve_slopes')
+
+    def __init__(self):
+        """__init__
+        Initializes all pulses and angles to 0.
+        """
+        self.max_pulse = 0
+        self.min_pulse = 0
+        self.neutral_pulse = 0
+        self.min_angle = 0
+        self.max_angle = 0
+        self.neutral_angle = 0
+        self._curve_angles = None
+        self._curve_pulses = None
+        self._curve_slopes = None
+
+    @property
+    def curve(self) -> [(float, float)]:
+        """Gets the calibration curve as points from angle to pulse.
+        :return: The (angle, pulse) points between which pulses are interpolated, by angle.
+        :rtype: list of tuple
+        """
+        if self._curve_angles is None:
+            return super().curve
+        return list(zip(self._curve_angles, self._curve_pulses))
+
+    def set_curve(self, points: [(float, float)]):
+        """set_curve
+        Sets an N-point calibration curve. Pulses are then interpolated linearly between the two
+        curve points around an angle instead of between the min, neutral and max pulses.
+
+        :param points: The (angle, pulse) points of the curve. The curve must cover the angle range
+                       and the pulses must strictly increase or strictly decrease with the angle.
+        :type points: list of tuple
+        """
+        points = sorted(points)
+        angles = [float(angle) for angle, pulse in points]
+        pulses = [float(pulse) for angle, pulse in points]
+        if len(points) < 2:
+            raise ValueError('A calibration curve needs at least two points')
+        for a0, a1 in zip(angles, angles[1:]):
+            if a0 == a1:
+                raise ValueError('Calibration curve has two points for angle %f' % a0)
+        steps = [p1 - p0 for p0, p1 in zip(pulses, pulses[1:])]
+        if not (all(step > 0 for step in steps) or all(step < 0 for step in steps)):
+            raise ValueError('Calibration curve pulses must be strictly monotonic in the angle')
+        if angles[0] > self.min_angle or angles[-1] < self.max_angle:
+            raise ValueError('Calibration curve from %f to %f does not cover the angle range %f to %f' %
+                             (angles[0], angles[-1], self.min_angle, self.max_angle))
+        self._curve_slopes = [(p1 - p0) / (a1 - a0) for a0, a1, p0, p1 in zip(angles, angles[1:], pulses, pulses[1:])]
+        self._curve_angles = angles
+        self._curve_pulses = pulses
+
+    def pulse_from_angle(self, angle: float) -> float:
+        """pulse_from_angle
+        Interpolates the pulse for an angle on the calibration curve, if there is one.
+
+        :param angle: The angle for which to calculate the pulse
+        :type angle: float
+
+        :return: The pulse length in ms
+        :rtype: float
+        """
+        angles = self._curve_angles
+        if angles is None:
+            return super().pulse_from_angle(angle)
+        segment = bisect_right(angles, angle) - 1
+        if segment >= len(angles) - 1:
+            return self._curve_pulses[-1]
+        if segment < 0:
+            return self._curve_pulses[0]
+        return self._curve_pulses[segment] + self._curve_slopes[segment] * (angle - angles[segment])
 
     @classmethod
     def from_json_file(cls, json_file:str):
@@ -80,4 +148,6 @@ class CustomServoAttributes(ServoAttributes):
         instance.min_angle = data['angle']['min']
         instance.max_angle = data['angle']['max']
         instance.neutral_angle = data['angle']['neutral']
+        if 'curve' in data:
+            instance.set_curve([(point['angle'], point['pulse']) for point in data['curve']])
         return instance
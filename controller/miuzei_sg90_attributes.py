@@ -31,6 +31,8 @@ class MiuzeiSG90Attributes(ServoAttributes):
     Implements an abstract base class for servo properties
     """
 
+    __slots__ = ()
+
     max_pulse = 2.3
     min_pulse = 0.6
     neutral_pulse = 1.4
@@ -0,0 +1,296 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""
+    I2C backend talking to /dev/i2c-N directly with the I2C_RDWR ioctl. Several messages,
+    for example all register blocks of a frame, are combined into a single ioctl call. The
+    module mirrors the interface of Adafruit_GPIO.I2C (get_i2c_device and the Device methods).
+    All file descriptor operations go through an exchangeable IO layer, so the backend can be
+    run against a fake device instead of the kernel driver.
+"""
+import os
+import ctypes
+import threading
+
+I2C_RDWR = 0x0707
+I2C_M_RD = 0x0001
+I2C_RDWR_IOCTL_MAX_MSGS = 42
+DEFAULT_BUSNUM = 1
+
+class i2c_msg(ctypes.Structure):
+    """struct i2c_msg from linux/i2c.h"""
+    _fields_ = [
+        ('addr', ctypes.c_uint16),
+        ('flags', ctypes.c_uint16),
+        ('len', ctypes.c_uint16),
+        ('buf', ctypes.POINTER(ctypes.c_uint8))
+    ]
+
+class i2c_rdwr_ioctl_data(ctypes.Structure):
+    """struct i2c_rdwr_ioctl_data from linux/i2c-dev.h"""
+    _fields_ = [
+        ('msgs', ctypes.POINTER(i2c_msg)),
+        ('nmsgs', ctypes.c_uint32)
+    ]
+
+
+class OsIO(object):
+    """File descriptor layer using the operating system."""
+
+    def open(self, path: str) -> int:
+        """Opens a device file for reading and writing."""
+        return os.open(path, os.O_RDWR)
+
+    def ioctl(self, fd: int, request: int, arg):
+        """Issues an ioctl."""
+        import fcntl
+        return fcntl.ioctl(fd, request, arg)
+
+    def close(self, fd: int):
+        """Closes a file descriptor."""
+        os.close(fd)
+
+
+class SimulatedIO(object):
+    """
+    Fake file descriptor layer executing I2C_RDWR messages against the boards of the
+    simulated I2C bus. Counts ioctl calls and messages.
+    """
+
+    def __init__(self):
+        self.ioctls = 0
+        self.messages = 0
+        self._pointers = {}
+
+    def open(self, path: str) -> int:
+        """Returns the bus number as file descriptor."""
+        return int(path.rsplit('-', 1)[1])
+
+    def ioctl(self, fd: int, request: int, arg):
+        """Executes the messages of an I2C_RDWR request."""
+        from . import simulated_i2c
+        if request != I2C_RDWR:
+            raise OSError('Unsupported ioctl 0x%04x' % request)
+        bus = simulated_i2c.get_bus(fd)
+        self.ioctls += 1
+        for index in range(arg.nmsgs):
+            msg = arg.msgs[index]
+            self.messages += 1
+            board = bus.attach(msg.addr)
+            if msg.flags & I2C_M_RD:
+                data = board.read(self._pointers.get((fd, msg.addr), 0), msg.len)
+                for offset, value in enumerate(data):
+                    msg.buf[offset] = value
+            else:
+                data = [msg.buf[offset] for offset in range(msg.len)]
+                self._pointers[(fd, msg.addr)] = data[0]
+                if len(data) > 1:
+                    board.write(data[0], data[1:])
+        return 0
+
+    def close(self, fd: int):
+        """Nothing to close."""
+        pass
+
+
+_io = OsIO()
+_buses = {}
+_buses_lock = threading.Lock()
+
+def set_io(io):
+    """set_io
+    Replaces the file descriptor layer, for example with SimulatedIO. Buses opened before keep
+    their layer.
+
+    :param io: Object with open(path), ioctl(fd, request, arg) and close(fd) methods.
+    :type io: OsIO
+    """
+    global _io
+    _io = io
+
+def get_default_bus() -> int:
+    """Returns the default bus number."""
+    return DEFAULT_BUSNUM
+
+def get_bus(busnum: int = None) -> "RdwrBus":
+    """get_bus
+    Gets the bus with the given number, opening it on first use.
+
+    :param busnum: The bus number. Defaults to get_default_bus().
+    :type busnum: int
+
+    :rtype: RdwrBus
+    """
+    if busnum is None:
+        busnum = get_default_bus()
+    with _buses_lock:
+        if busnum not in _buses:
+            _buses[busnum] = RdwrBus(busnum, _io)
+        return _buses[busnum]
+
+def get_i2c_device(address: int, busnum: int = None, **kwargs) -> "RdwrDevice":
+    """get_i2c_device
+    Gets a device handle for an address.
+
+    :param address: The device address.
+    :type address: int
+
+    :param busnum: The bus number.
+    :type busnum: int
+
+    :param kwargs: Ignored. Accepted for compatibility with Adafruit_GPIO.I2C.
+    :type kwargs: dictionary
+
+    :rtype: RdwrDevice
+    """
+    return RdwrDevice(get_bus(busnum), address)
+
+
+class RdwrBus(object):
+    """An open /dev/i2c-N bus."""
+
+    def __init__(self, busnum: int, io):
+        """__init__
+        Opens the bus.
+
+        :param busnum: The bus number.
+        :type busnum: int
+
+        :param io: The file descriptor layer.
+        :type io: OsIO
+        """
+        self._busnum = busnum
+        self._io = io
+        self._fd = io.open('/dev/i2c-%d' % busnum)
+
+    @property
+    def busnum(self) -> int:
+        """Gets the bus number."""
+        return self._busnum
+
+    def transfer(self, messages: [(int, int, bytearray)]):
+        """transfer
+        Executes messages as combined transactions, one ioctl per I2C_RDWR_IOCTL_MAX_MSGS
+        messages. Read messages receive their data in the given buffers.
+
+        :param messages: Tuples of address, flags (0 or I2C_M_RD) and data buffer.
+        :type messages: list
+        """
+        for start in range(0, len(messages), I2C_RDWR_IOCTL_MAX_MSGS):
+            chunk = messages[start:start + I2C_RDWR_IOCTL_MAX_MSGS]
+            msgs = (i2c_msg * len(chunk))()
+            buffers = []
+            for msg, (address, flags, data) in zip(msgs, chunk):
+                buffer = (ctypes.c_uint8 * len(data)).from_buffer(data)
+                buffers.append(buffer)
+                msg.addr = address
+                msg.flags = flags
+                msg.len = len(data)
+                msg.buf = buffer
+            request = i2c_rdwr_ioctl_data(msgs, len(chunk))
+            self._io.ioctl(self._fd, I2C_RDWR, request)
+            del buffers
+
+    def write_blocks(self, blocks: [(int, int, [int])]):
+        """write_blocks
+        Writes register blocks of several devices on the bus in a single ioctl.
+
+        :param blocks: Tuples of device address, start register and data.
+        :type blocks: list
+        """
+        self.transfer([(address, 0, bytearray([register] + list(data))) for address, register, data in blocks])
+
+    def close(self):
+        """Closes the bus."""
+        self._io.close(self._fd)
+
+
+class RdwrDevice(object):
+    """Device handle with the interface of Adafruit_GPIO.I2C.Device plus combined block writes."""
+
+    def __init__(self, bus: RdwrBus, address: int):
+        self._bus = bus
+        self._address = address
+
+    @property
+    def bus(self) -> RdwrBus:
+        """Gets the bus of the device."""
+        return self._bus
+
+    @property
+    def address(self) -> int:
+        """Gets the device address."""
+        return self._address
+
+    def write_blocks(self, blocks: [(int, [int])]):
+        """write_blocks
+        Writes several register blocks in a single ioctl.
+
+        :param blocks: Tuples of start register and data.
+        :type blocks: list
+        """
+        self._bus.write_blocks([(self._address, register, data) for register, data in blocks])
+
+    def writeRaw8(self, value: int):
+        """Write an 8-bit value on the bus (without register)."""
+        self._bus.transfer([(self._address, 0, bytearray([value & 0xFF]))])
+
+    def write8(self, register: int, value: int):
+        """Write an 8-bit value to the specified register."""
+        self._bus.transfer([(self._address, 0, bytearray([register, value & 0xFF]))])
+
+    def write16(self, register: int, value: int):
+        """Write a 16-bit value to the specified register."""
+        self._bus.transfer([(self._address, 0, bytearray([register, value & 0xFF, (value >> 8) & 0xFF]))])
+
+    def writeList(self, register: int, data: [int]):
+        """Write bytes to the specified register."""
+        self.write_blocks([(register, data)])
+
+    def readList(self, register: int, length: int) -> bytearray:
+        """Read a length number of bytes from the specified register."""
+        data = bytearray(length)
+        self._bus.transfer([(self._address, 0, bytearray([register])), (self._address, I2C_M_RD, data)])
+        return data
+
+    def readRaw8(self) -> int:
+        """Read an 8-bit value on the bus (without register)."""
+        data = bytearray(1)
+        self._bus.transfer([(self._address, I2C_M_RD, data)])
+        return data[0]
+
+    def readU8(self, register: int) -> int:
+        """Read an unsigned byte from the specified register."""
+        return self.readList(register, 1)[0]
+
+    def readS8(self, register: int) -> int:
+        """Read a signed byte from the specified register."""
+        result = self.readU8(register)
+        return result - 256 if result > 127 else result
+
+    def readU16(self, register: int, little_endian: bool = True) -> int:
+        """Read an unsigned 16-bit value from the specified register."""
+        low, high = self.readList(register, 2)
+        result = (high << 8) | low
+        if not little_endian:
+            result = ((result << 8) & 0xFF00) + (result >> 8)
+        return result
@@ -34,6 +34,20 @@ controller_schema = {
                 "frequency" : {"type" : "number"},
                 "resolution" : {"type": "number"},
                 "servo_frequency": {"type": "number"},
+                "shadow_verify_interval": {"type": "number"},
+                "backend": {"type": "string", "enum": ["adafruit", "simulated", "rdwr"]},
+                "asynchronous": {"type": "boolean"},
+                "calibration_file": {"type": "string"},
+                "trace_sample_rate": {"type": "integer", "minimum": 0},
+                "busnum": {"type": "number"},
+                "simulation": {
+                    "type": "object",
+                    "properties": {
+                        "latency": {"type": "number"},
+                        "bus_speed": {"type": "number"},
+                        "oscillator": {"type": "number"}
+                    }
+                },
                 "logging_level": {"type": "string", "enum": ["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG", "NOTSET"]}
             },
             "required": [ "address", "frequency", "resolution", "servo_frequency" ]
@@ -58,11 +72,24 @@ servo_schema = {
             },
             "required": [ "max", "min", "neutral" ]
         },
+        "curve_point": {
+            "type" : "object",
+            "properties" : {
+                "angle" : {"type" : "number"},
+                "pulse" : {"type" : "number"}
+            },
+            "required": [ "angle", "pulse" ]
+        },
         "servo_attributes": {
             "type" : "object",
             "properties" : {
                 "pulse": { "$ref": "#/definitions/range"},
-                "angle": { "$ref": "#/definitions/range"}
+                "angle": { "$ref": "#/definitions/range"},
+                "curve": {
+                    "type": "array",
+                    "items": { "$ref": "#/definitions/curve_point"},
+                    "minItems": 2
+                }
             },
             "required": [ "pulse", "angle" ]
         },
@@ -26,12 +26,25 @@
 import logging
 import time
 import math
+from array import array
+from bisect import bisect_right
+import numpy as np
 from .servo_attributes import ServoAttributes
 from .miuzei_sg90_attributes import MiuzeiSG90Attributes
+from .tracing import Tracer, DEFAULT_SAMPLE_RATE
+
+# Number of grid steps per tick on the steepest part of the angle to pulse curve when searching the
+# angles at which the ticks change.
+TABLE_OVERSAMPLING = 4
 
 class Servo(object):
     """Represents a servo on the controller."""
 
+    __slots__ = ('_logger', '_tracer', '_controller', '_channel', '_attributes',
+                 '_ticks', '_angle', '_pulse',
+                 '_servo_min', '_servo_max', '_servo_neutral', '_tick_length', '_angle_resolution',
+                 '_table', '_table_breaks', '_table_array', '_table_breaks_array')
+
     def __init__(self, controller, channel: int, attributes: ServoAttributes = MiuzeiSG90Attributes()):
         """__init__
         Initialize Servo
@@ -47,6 +60,7 @@ class Servo(object):
 
         """
         self._logger = logging.getLogger('controller.servo')
+        self._tracer = Tracer(self._logger.name, getattr(controller, 'trace_sample_rate', DEFAULT_SAMPLE_RATE))
         self._controller = controller
         self._channel = channel
         self._attributes = attributes
@@ -58,10 +72,7 @@ class Servo(object):
         self._angle = 0
         self._pulse = 0
 
-        #caluclate boundary ticks for servo
-        self._servo_min = self._calculate_servo_ticks_from_pulse(self._attributes.min_pulse)
-        self._servo_max = self._calculate_servo_ticks_from_pulse(self._attributes.max_pulse)
-        self._servo_neutral = self._calculate_servo_ticks_from_pulse(self._attributes.neutral_pulse)
+        self.refresh()
         
         #initialize servo
         self.set_angle(self._attributes.neutral_angle)
@@ -102,6 +113,134 @@ class Servo(object):
         """
         return self._ticks
 
+    @property
+    def angle_resolution(self) -> float:
+        """Gets the angle change that moves the servo by at most one tick.
+
+        :return: The angle per tick on the steepest part of the calibration curve.
+        :rtype: float
+        """
+        return self._angle_resolution
+
+    @property
+    def tracer(self) -> Tracer:
+        """Gets the tracer counting and sampling the servo operations.
+
+        :return: The tracer.
+        :rtype: Tracer
+        """
+        return self._tracer
+
+
+    def refresh(self):
+        """refresh
+        Recalculates the boundary ticks and the angle lookup table of the servo, for example after
+        the controller has been calibrated.
+        """
+        self._servo_min = self._calculate_servo_ticks_from_pulse(self._attributes.min_pulse)
+        self._servo_max = self._calculate_servo_ticks_from_pulse(self._attributes.max_pulse)
+        self._servo_neutral = self._calculate_servo_ticks_from_pulse(self._attributes.neutral_pulse)
+        self._build_table()
+
+    def _build_table(self):
+        """_build_table
+        Builds the lookup table from angle to ticks. The table holds the angles at which the ticks
+        change and the ticks from each of these angles on, so a lookup bisects the angles and gives
+        exactly the ticks of _calculate_servo_ticks_from_angle. The angles are found on a grid fine
+        enough that the ticks change at most once between grid points, including the points of the
+        calibration curve, and then narrowed down to neighbouring floats.
+        """
+        attributes = self._attributes
+        self._tick_length = self._controller.tick_length / 1000.0           # ms per tick
+        slope = 0.0
+        curve = attributes.curve
+        for (a0, p0), (a1, p1) in zip(curve, curve[1:]):
+            if a1 > a0:
+                slope = max(slope, abs(p1 - p0) / self._tick_length / (a1 - a0))
+        low = attributes.min_angle
+        high = attributes.max_angle
+        span = high - low
+        self._angle_resolution = 1.0 / slope if slope > 0 else span
+        size = max(1, int(math.ceil(span * slope * TABLE_OVERSAMPLING)))
+        grid = sorted(set([low + span * index / size for index in range(size)] + [high] +
+                          [angle for angle, pulse in curve if low < angle < high]))
+
+        breaks = []
+        table = array('H', [self._table_ticks(low)])
+        for start, end in zip(grid, grid[1:]):
+            ticks = self._table_ticks(end)
+            while table[-1] != ticks:
+                breaks.append(self._find_break(start, end, table[-1], ticks))
+                table.append(self._table_ticks(breaks[-1]))
+                start = breaks[-1]
+        self._table = table
+        self._table_breaks = breaks
+        self._table_array = np.frombuffer(table, dtype=np.uint16)
+        self._table_breaks_array = np.array(breaks, dtype=float)
+
+    def _find_break(self, below: float, above: float, current: int, ticks: int) -> float:
+        """_find_break
+        Finds the first angle after below at which the ticks change. The pulse is linear between
+        below and above, so the angle is usually within a few floats of the secant. The search
+        gallops away from the secant to bracket the angle and bisects the bracket.
+
+        :param below: An angle with the current ticks
+        :type below: float
+        :param above: A later angle with other ticks
+        :type above: float
+        :param current: The ticks at below
+        :type current: int
+        :param ticks: The ticks at above
+        :type ticks: int
+
+        :return: The first float angle with other ticks than the current ticks
+        :rtype: float
+        """
+        edge = (current + 1 if ticks > current else current) * self._tick_length
+        p0 = self._calculate_pulse_from_angle(below)
+        p1 = self._calculate_pulse_from_angle(above)
+        guess = below + (edge - p0) * (above - below) / (p1 - p0) if p1 != p0 else below
+        if below < guess < above:
+            step = math.ulp(guess)
+            if self._table_ticks(guess) == current:
+                below = guess
+                while below + step < above:
+                    if self._table_ticks(below + step) != current:
+                        above = below + step
+                        break
+                    below += step
+                    step *= 2
+            else:
+                above = guess
+                while above - step > below:
+                    if self._table_ticks(above - step) == current:
+                        below = above - step
+                        break
+                    above -= step
+                    step *= 2
+        while True:
+            middle = (below + above) / 2
+            if middle <= below or middle >= above:
+                return above
+            if self._table_ticks(middle) == current:
+                below = middle
+            else:
+                above = middle
+
+    def _table_ticks(self, angle: float) -> int:
+        """_table_ticks
+        Calculates the ticks for an angle in range like _calculate_servo_ticks_from_angle, keeping
+        the pulse within the pulse range.
+
+        :param angle: The angle for which to calculate the ticks
+        :type angle: float
+
+        :return: The number of ticks to achieve the angle
+        :rtype: int
+        """
+        attributes = self._attributes
+        pulse = min(max(self._calculate_pulse_from_angle(angle), attributes.min_pulse), attributes.max_pulse)
+        return self._calculate_servo_ticks_from_pulse(pulse)
 
     def _calculate_servo_ticks_from_pulse(self, pulse: float) -> int:
         """calculate_servo_ticks_from_pulse
@@ -114,20 +253,18 @@ class Servo(object):
         :rtype: int
         """
 
-        if str(pulse) < str(self._attributes.min_pulse) or str(pulse) > str(self._attributes.max_pulse):
+        if pulse < self._attributes.min_pulse or pulse > self._attributes.max_pulse:
             raise Exception('Pulse %f out of range. Must be between %f and %f' %
                             (pulse, self._attributes.min_pulse, self._attributes.max_pulse))
 
-        pulse_length = 1000000.0                              # 1,000,000 us per second
-        pulse_length /= float(self._controller.frequency)     # signal frequency
-        pulse_length /= float(self._controller.resolution)    # pusle resolution
+        pulse_length = self._controller.tick_length           # us per tick
         pulse *= 1000.0
         pulse //= pulse_length
         return int(pulse)
 
     def _calculate_servo_ticks_from_angle(self, angle: float) -> (float, int):
         """_calculate_servo_ticks_from_angle
-        Calculate the number of on ticks to achieve a certain servo angle.
+        Calculate the number of on ticks to achieve a certain servo angle without the lookup table.
         
         :param angle: The angle for which to calculate the ticks
         :type angle: float
@@ -140,16 +277,72 @@ class Servo(object):
             raise Exception('Angle %f out of range. Must be between %f and %f' %
                             (angle, self._attributes.min_angle, self._attributes.max_angle))
 
-        pulse = self._attributes.neutral_pulse
-        if angle > self._attributes.neutral_angle:
-            pulse += ((angle - self._attributes.neutral_angle) * (self._attributes.max_pulse - self._attributes.neutral_pulse)) / \
-                (self._attributes.max_angle - self._attributes.neutral_angle)
-        elif angle < self._attributes.neutral_angle:
-            pulse -= ((angle + self._attributes.neutral_angle) * (self._attributes.neutral_pulse - self._attributes.min_pulse)) / \
-                (self._attributes.min_angle + self._attributes.neutral_angle)
-        self._logger.info('Angle %f -> pulse %f', angle, pulse)
+        pulse = self._calculate_pulse_from_angle(angle)
+        self._tracer.trace('interpolate', 'Angle %f -> pulse %f', angle, pulse)
         return self._calculate_servo_ticks_from_pulse(pulse), pulse
 
+    def _calculate_pulse_from_angle(self, angle: float) -> float:
+        """_calculate_pulse_from_angle
+        Interpolates the pulse for a servo angle between the neutral and the limit pulses.
+
+        :param angle: The angle for which to calculate the pulse
+        :type angle: float
+
+        :return: The pulse length in ms
+        :rtype: float
+        """
+        return self._attributes.pulse_from_angle(angle)
+
+    def _lookup_ticks(self, angle: float) -> int:
+        """_lookup_ticks
+        Looks up the ticks for a servo angle in the table built by refresh.
+
+        :param angle: The angle for which to look up the ticks
+        :type angle: float
+
+        :return: The number of ticks to achieve the angle
+        :rtype: int
+        """
+        if angle < self._attributes.min_angle or angle > self._attributes.max_angle:
+            raise Exception('Angle %f out of range. Must be between %f and %f' %
+                            (angle, self._attributes.min_angle, self._attributes.max_angle))
+        return self._table[bisect_right(self._table_breaks, angle)]
+
+    def ticks_from_angles(self, angles: np.ndarray) -> np.ndarray:
+        """ticks_from_angles
+        Vectorized version of the angle lookup used by set_angle. Maps an array of angles, for
+        example a whole trajectory, to ticks in one call.
+
+        :param angles: The angles for which to look up the ticks
+        :type angles: numpy.ndarray
+
+        :return: The number of ticks for each angle
+        :rtype: numpy.ndarray
+        """
+        angles = np.asarray(angles, dtype=float)
+        bad = (angles < self._attributes.min_angle) | (angles > self._attributes.max_angle)
+        if bad.any():
+            raise Exception('Angle %f out of range. Must be between %f and %f' %
+                            (angles[bad][0], self._attributes.min_angle, self._attributes.max_angle))
+        return self._table_array[np.searchsorted(self._table_breaks_array, angles, side='right')]
+
+    def ticks_from_pulses(self, pulses: np.ndarray) -> np.ndarray:
+        """ticks_from_pulses
+        Vectorized version of the pulse calculation used by set_pulse.
+
+        :param pulses: The pulse lengths in ms
+        :type pulses: numpy.ndarray
+
+        :return: The number of ticks for each pulse
+        :rtype: numpy.ndarray
+        """
+        pulses = np.asarray(pulses, dtype=float)
+        bad = (pulses < self._attributes.min_pulse) | (pulses > self._attributes.max_pulse)
+        if bad.any():
+            raise Exception('Pulse %f out of range. Must be between %f and %f' %
+                            (pulses[bad][0], self._attributes.min_pulse, self._attributes.max_pulse))
+        return np.floor_divide(pulses * 1000.0, self._controller.tick_length).astype(np.int64)
+
     def set_pulse(self, pulse: float):
         """set_pulse
         Sets the servo to a certain pulse width.
@@ -158,8 +351,8 @@ class Servo(object):
         :type pulse: float
         """
         ticks = self._calculate_servo_ticks_from_pulse(pulse)
-        self._logger.info('Channel %d: %f pulse -> %d ticks', self._channel, pulse, ticks)
-        self._controller.set_pwm(self._channel, 0, ticks)
+        self._tracer.trace('pulse', 'Channel %d: %f pulse -> %d ticks', self._channel, pulse, ticks)
+        self._controller.commit_frame({self._channel: ticks})
         self._pulse = pulse
         self._ticks = ticks
 
@@ -170,9 +363,24 @@ class Servo(object):
         :param angle: The desired angle to achieve. 
         :type angle: float
         """
-        ticks, pulse = self._calculate_servo_ticks_from_angle(angle)
-        self._logger.info('Channel %d: %f angle -> %d ticks', self._channel, angle, ticks)
-        self._controller.set_pwm(self._channel, 0, ticks)
+        ticks = self.stage_angle(angle)
+        self._controller.commit_frame({self._channel: ticks})
+
+    def stage_angle(self, angle: float) -> int:
+        """stage_angle
+        Calculates the ticks for a certain angle and records them as the servo state without
+        writing to the controller. The caller is responsible for committing the ticks,
+        usually as part of a frame via PCA9685.commit_frame.
+
+        :param angle: The desired angle to achieve.
+        :type angle: float
+
+        :return: The number of ticks to achieve the angle
+        :rtype: int
+        """
+        ticks = self._lookup_ticks(angle)
+        self._tracer.trace('angle', 'Channel %d: %f angle -> %d ticks', self._channel, angle, ticks)
         self._angle = angle
         self._ticks = ticks
-        self._pulse = pulse
+        self._pulse = ticks * self._tick_length
+        return ticks
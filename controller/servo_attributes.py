@@ -31,6 +31,8 @@ class ServoAttributes(metaclass=ABCMeta):
     Implements an abstract base class for servo properties
     """
 
+    __slots__ = ()
+
     @property
     @abstractmethod
     def min_pulse(self) -> float:
@@ -84,3 +86,30 @@ class ServoAttributes(metaclass=ABCMeta):
         :rtype: float
         """
         pass
+
+    @property
+    def curve(self) -> [(float, float)]:
+        """Gets the calibration curve as points from angle to pulse.
+        :return: The (angle, pulse) points between which pulses are interpolated, by angle.
+        :rtype: list of tuple
+        """
+        return [(self.min_angle, self.min_pulse), (self.neutral_angle, self.neutral_pulse), (self.max_angle, self.max_pulse)]
+
+    def pulse_from_angle(self, angle: float) -> float:
+        """pulse_from_angle
+        Interpolates the pulse for an angle between the neutral and the limit pulses.
+
+        :param angle: The angle for which to calculate the pulse
+        :type angle: float
+
+        :return: The pulse length in ms
+        :rtype: float
+        """
+        pulse = self.neutral_pulse
+        if angle > self.neutral_angle:
+            pulse += ((angle - self.neutral_angle) * (self.max_pulse - self.neutral_pulse)) / \
+                (self.max_angle - self.neutral_angle)
+        elif angle < self.neutral_angle:
+            pulse -= ((angle + self.neutral_angle) * (self.neutral_pulse - self.min_pulse)) / \
+                (self.min_angle + self.neutral_angle)
+        return pulse
@@ -0,0 +1,394 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""
+    In-memory I2C bus with simulated PCA9685 boards. The module mirrors the interface of
+    Adafruit_GPIO.I2C (get_i2c_device and the Device read/write methods) so it can be used
+    as a drop-in backend to run the controller, arm and server without a Raspberry Pi.
+"""
+import os
+import time
+import threading
+
+DEFAULT_BUSNUM = 1
+DEFAULT_OSCILLATOR = 25000000
+
+# PCA9685 registers and bits modelled by the simulation
+MODE1 = 0x00
+MODE2 = 0x01
+SUBADR1 = 0x02
+SUBADR2 = 0x03
+SUBADR3 = 0x04
+ALLCALLADR = 0x05
+LED0_ON_L = 0x06
+LED15_OFF_H = 0x45
+ALL_LED_ON_L = 0xFA
+ALL_LED_OFF_H = 0xFD
+PRESCALE = 0xFE
+RESTART = 0x80
+AI = 0x20
+SLEEP = 0x10
+FULL = 0x10
+SWRST = 0x06
+
+_buses = {}
+_buses_lock = threading.Lock()
+
+def get_default_bus() -> int:
+    """Returns the default bus number of the simulation."""
+    return DEFAULT_BUSNUM
+
+def get_bus(busnum: int = None) -> "SimulatedBus":
+    """get_bus
+    Gets the simulated bus with the given number, creating it on first use.
+
+    :param busnum: The bus number. Defaults to get_default_bus().
+    :type busnum: int
+
+    :return: The simulated bus.
+    :rtype: SimulatedBus
+    """
+    if busnum is None:
+        busnum = get_default_bus()
+    with _buses_lock:
+        if busnum not in _buses:
+            _buses[busnum] = SimulatedBus(
+                busnum,
+                float(os.environ.get('MEARM_I2C_LATENCY', 0.0)),
+                int(os.environ.get('MEARM_I2C_BUS_SPEED', 0)))
+        return _buses[busnum]
+
+def get_i2c_device(address: int, busnum: int = None, latency: float = None,
+                   bus_speed: int = None, oscillator: int = None, **kwargs) -> "SimulatedDevice":
+    """get_i2c_device
+    Gets a device handle for an address on a simulated bus. A PCA9685 is attached to the
+    address if there is none yet. Address 0x00 is the general call address used for SWRST.
+
+    :param address: The device address.
+    :type address: int
+
+    :param busnum: The bus number.
+    :type busnum: int
+
+    :param latency: Fixed time per transaction in seconds. Leaves the bus setting as is if None.
+    :type latency: float
+
+    :param bus_speed: Bus clock in Hz used to add the per byte transfer time. 0 disables it.
+    :type bus_speed: int
+
+    :param oscillator: Internal oscillator frequency of a newly attached board in Hz.
+    :type oscillator: int
+
+    :param kwargs: Ignored. Accepted for compatibility with Adafruit_GPIO.I2C.
+    :type kwargs: dictionary
+
+    :return: The device handle.
+    :rtype: SimulatedDevice
+    """
+    bus = get_bus(busnum)
+    if latency is not None:
+        bus.latency = latency
+    if bus_speed is not None:
+        bus.bus_speed = bus_speed
+    if address != 0x00:
+        bus.attach(address, oscillator or DEFAULT_OSCILLATOR)
+    return SimulatedDevice(bus, address)
+
+def reset():
+    """reset
+    Removes all simulated buses and boards.
+    """
+    with _buses_lock:
+        _buses.clear()
+
+
+class SimulatedPCA9685(object):
+    """Register level model of a PCA9685."""
+
+    def __init__(self, address: int, oscillator: int = DEFAULT_OSCILLATOR):
+        """__init__
+        Initializes the board in its power-on state.
+
+        :param address: The board address.
+        :type address: int
+
+        :param oscillator: The internal oscillator frequency in Hz.
+        :type oscillator: int
+        """
+        self.address = address
+        self.oscillator = oscillator
+        self.registers = bytearray(256)
+        self._awake_since = None
+        self.power_on_reset()
+
+    def power_on_reset(self):
+        """Restores the power-on register values."""
+        self.registers[:] = bytes(256)
+        self.registers[MODE1] = SLEEP | 0x01
+        self.registers[MODE2] = 0x04
+        self.registers[SUBADR1] = 0xE2
+        self.registers[SUBADR2] = 0xE4
+        self.registers[SUBADR3] = 0xE8
+        self.registers[ALLCALLADR] = 0xE0
+        for channel in range(16):
+            self.registers[LED0_ON_L + 4*channel + 3] = FULL
+        self.registers[PRESCALE] = 0x1E
+        self._awake_since = None
+
+    @property
+    def sleeping(self) -> bool:
+        """True if the oscillator is off."""
+        return bool(self.registers[MODE1] & SLEEP)
+
+    @property
+    def oscillator_stable(self) -> bool:
+        """True if the oscillator has been awake for the 500us it needs to stabilize."""
+        return self._awake_since is not None and time.perf_counter() - self._awake_since >= 0.0005
+
+    @property
+    def pwm_frequency(self) -> float:
+        """The PWM frequency in Hz resulting from oscillator and prescale."""
+        return self.oscillator / (4096.0 * (self.registers[PRESCALE] + 1))
+
+    def get_pwm(self, channel: int) -> (int, int, bool, bool):
+        """get_pwm
+        Gets the output state of a channel.
+
+        :param channel: The channel.
+        :type channel: int
+
+        :return: on ticks, off ticks, full on and full off flags
+        :rtype: (int, int, bool, bool)
+        """
+        base = LED0_ON_L + 4*channel
+        r = self.registers
+        return (r[base] | (r[base+1] & 0x0F) << 8, r[base+2] | (r[base+3] & 0x0F) << 8,
+                bool(r[base+1] & FULL), bool(r[base+3] & FULL))
+
+    def pulse_width(self, channel: int) -> float:
+        """pulse_width
+        Gets the pulse width a channel currently outputs.
+
+        :param channel: The channel.
+        :type channel: int
+
+        :return: The pulse width in microseconds. 0 if the board sleeps or the channel is off.
+        :rtype: float
+        """
+        on, off, full_on, full_off = self.get_pwm(channel)
+        if self.sleeping or full_off:
+            return 0.0
+        period = 1000000.0 / self.pwm_frequency
+        if full_on:
+            return period
+        return ((off - on) % 4096) * period / 4096.0
+
+    def write(self, register: int, data: bytes):
+        """write
+        Writes data starting at a register, honouring the MODE1 auto-increment bit.
+        """
+        for value in data:
+            self._write_register(register, value)
+            if self.registers[MODE1] & AI:
+                register = self._next_register(register)
+
+    def read(self, register: int, length: int) -> bytearray:
+        """read
+        Reads data starting at a register, honouring the MODE1 auto-increment bit.
+        """
+        data = bytearray()
+        for dummy in range(length):
+            if ALL_LED_ON_L <= register <= ALL_LED_OFF_H:
+                data.append(0)                    # ALL_LED registers are write only
+            else:
+                data.append(self.registers[register])
+            if self.registers[MODE1] & AI:
+                register = self._next_register(register)
+        return data
+
+    def _next_register(self, register: int) -> int:
+        """Auto-increment skips the reserved range and wraps after PRESCALE."""
+        if register == LED15_OFF_H:
+            return ALL_LED_ON_L
+        if register >= PRESCALE:
+            return MODE1
+        return register + 1
+
+    def _write_register(self, register: int, value: int):
+        """Applies the side effects of writing a single register."""
+        if register == MODE1:
+            old = self.registers[MODE1]
+            if value & RESTART:
+                value &= ~RESTART                 # writing 1 clears RESTART and resumes PWM
+            elif old & RESTART:
+                value |= RESTART
+            if value & SLEEP and not old & SLEEP:
+                value |= RESTART                  # PWM was running when put to sleep
+                self._awake_since = None
+            elif not value & SLEEP and old & SLEEP:
+                self._awake_since = time.perf_counter()
+            self.registers[MODE1] = value
+        elif register == PRESCALE:
+            if self.sleeping:                     # prescale can only be set while sleeping
+                self.registers[PRESCALE] = max(value, 0x03)
+        elif ALL_LED_ON_L <= register <= ALL_LED_OFF_H:
+            for channel in range(16):
+                self.registers[LED0_ON_L + 4*channel + register - ALL_LED_ON_L] = value
+        elif register <= LED15_OFF_H:
+            self.registers[register] = value
+
+
+class SimulatedBus(object):
+    """A simulated I2C bus with a configurable cost per transaction."""
+
+    def __init__(self, busnum: int, latency: float = 0.0, bus_speed: int = 0):
+        """__init__
+        Initializes the bus.
+
+        :param busnum: The bus number.
+        :type busnum: int
+
+        :param latency: Fixed time per transaction in seconds.
+        :type latency: float
+
+        :param bus_speed: Bus clock in Hz used to add the per byte transfer time. 0 disables it.
+        :type bus_speed: int
+        """
+        self.busnum = busnum
+        self.latency = latency
+        self.bus_speed = bus_speed
+        self.devices = {}
+        self.transactions = 0
+        self._lock = threading.Lock()
+
+    def attach(self, address: int, oscillator: int = DEFAULT_OSCILLATOR) -> SimulatedPCA9685:
+        """attach
+        Attaches a PCA9685 to the bus if there is none on the address yet.
+
+        :param address: The board address.
+        :type address: int
+
+        :param oscillator: The internal oscillator frequency in Hz.
+        :type oscillator: int
+
+        :return: The board on the address.
+        :rtype: SimulatedPCA9685
+        """
+        with self._lock:
+            if address not in self.devices:
+                self.devices[address] = SimulatedPCA9685(address, oscillator)
+            return self.devices[address]
+
+    def transfer(self, address: int, length: int, operation):
+        """transfer
+        Performs a single transaction on the bus. The bus is held for the simulated duration
+        of the transaction, so concurrent callers serialize as on a real bus.
+
+        :param address: The target address.
+        :type address: int
+
+        :param length: Number of payload bytes including the register byte.
+        :type length: int
+
+        :param operation: Callable receiving the board (or None for the general call address).
+        :type operation: callable
+
+        :return: The result of operation.
+        """
+        with self._lock:
+            duration = self.latency
+            if self.bus_speed > 0:
+                duration += 9.0 * (length + 1) / self.bus_speed    # address byte + payload, 9 clocks each
+            if duration > 0:
+                time.sleep(duration)
+            self.transactions += 1
+            if address == 0x00:
+                return operation(None)
+            if address not in self.devices:
+                raise IOError('No device acknowledged address 0x%02x on bus %d' % (address, self.busnum))
+            return operation(self.devices[address])
+
+
+class SimulatedDevice(object):
+    """Device handle with the same interface as Adafruit_GPIO.I2C.Device."""
+
+    def __init__(self, bus: SimulatedBus, address: int):
+        self._bus = bus
+        self._address = address
+
+    @property
+    def bus(self) -> SimulatedBus:
+        """The bus the device is on."""
+        return self._bus
+
+    @property
+    def board(self) -> SimulatedPCA9685:
+        """The simulated board behind the handle."""
+        return self._bus.devices.get(self._address)
+
+    def writeRaw8(self, value: int):
+        """Write an 8-bit value on the bus (without register)."""
+        def operation(board):
+            # only the general call SWRST has an effect; a plain byte just sets the register pointer
+            if board is None and value & 0xFF == SWRST:
+                for device in self._bus.devices.values():
+                    device.power_on_reset()
+        self._bus.transfer(self._address, 1, operation)
+
+    def write8(self, register: int, value: int):
+        """Write an 8-bit value to the specified register."""
+        self._bus.transfer(self._address, 2, lambda board: board.write(register, [value & 0xFF]))
+
+    def write16(self, register: int, value: int):
+        """Write a 16-bit value to the specified register."""
+        data = [value & 0xFF, (value >> 8) & 0xFF]
+        self._bus.transfer(self._address, 3, lambda board: board.write(register, data))
+
+    def writeList(self, register: int, data: [int]):
+        """Write bytes to the specified register."""
+        data = [value & 0xFF for value in data]
+        self._bus.transfer(self._address, 1 + len(data), lambda board: board.write(register, data))
+
+    def readList(self, register: int, length: int) -> bytearray:
+        """Read a length number of bytes from the specified register."""
+        return self._bus.transfer(self._address, 1 + length, lambda board: board.read(register, length))
+
+    def readRaw8(self) -> int:
+        """Read an 8-bit value on the bus (without register). The simulation returns MODE1."""
+        return self._bus.transfer(self._address, 1, lambda board: board.read(MODE1, 1)[0])
+
+    def readU8(self, register: int) -> int:
+        """Read an unsigned byte from the specified register."""
+        return self._bus.transfer(self._address, 2, lambda board: board.read(register, 1)[0])
+
+    def readS8(self, register: int) -> int:
+        """Read a signed byte from the specified register."""
+        result = self.readU8(register)
+        return result - 256 if result > 127 else result
+
+    def readU16(self, register: int, little_endian: bool = True) -> int:
+        """Read an unsigned 16-bit value from the specified register."""
+        low, high = self.readList(register, 2)
+        result = (high << 8) | low
+        if not little_endian:
+            result = ((result << 8) & 0xFF00) + (result >> 8)
+        return result
@@ -0,0 +1,60 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Tests for the controller package. The boards run on the simulated I2C backend."""
+import os
+import time
+import unittest
+from controller import PCA9685, simulated_i2c
+
+
+def wait_until(condition, timeout: float = 5.0):
+    """Polls a condition until it holds or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('Condition not reached within %f seconds' % timeout)
+        time.sleep(0.001)
+
+
+class ControllerTestCase(unittest.TestCase):
+    """Runs the boards on a fresh simulated bus without latency."""
+
+    def setUp(self):
+        self._backend = os.environ.pop('MEARM_I2C_BACKEND', None)
+        simulated_i2c.reset()
+
+    def tearDown(self):
+        simulated_i2c.reset()
+        if self._backend is not None:
+            os.environ['MEARM_I2C_BACKEND'] = self._backend
+
+    def controller(self, address: int = 0x40, **kwargs) -> PCA9685:
+        """Creates a board on the simulated bus.
+
+        :param address: The address of the board.
+        :type address: int
+        :param kwargs: Additional arguments for PCA9685.
+
+        :rtype: PCA9685
+        """
+        return PCA9685(address, None, backend='simulated', latency=0, bus_speed=0, **kwargs)
@@ -0,0 +1,76 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the asynchronous output stage of the PCA9685."""
+import unittest
+from controller.test import ControllerTestCase, wait_until
+
+
+class TestAsyncWriter(ControllerTestCase):
+    """Coalescing and flushing of posted frames"""
+
+    def setUp(self):
+        super().setUp()
+        self.pwm = self.controller(asynchronous=True)
+        self.writer = self.pwm.writer
+
+    def tearDown(self):
+        self.writer.stop(5)
+        super().tearDown()
+
+    def board(self):
+        return self.pwm._device.device.board
+
+    def test_frames_are_written(self):
+        self.pwm.commit_frame({0: 300, 1: 310})
+        self.assertTrue(self.pwm.wait(5))
+        self.assertEqual([self.board().get_pwm(channel)[1] for channel in (0, 1)], [300, 310])
+
+    def test_newer_values_replace_unwritten(self):
+        with self.pwm.arbiter:
+            self.pwm.commit_frame({0: 300})
+            # the writer has taken the frame and waits for the bus
+            wait_until(lambda: self.writer.pending == 0)
+            self.pwm.commit_frame({1: 310})
+            self.pwm.commit_frame({1: 320})
+            self.assertFalse(self.pwm.wait(0.01))
+            self.assertEqual(self.writer.pending, 1)
+        self.assertTrue(self.pwm.wait(5))
+        self.assertEqual(self.writer.statistics, {'posted': 3, 'superseded': 1, 'frames': 2, 'errors': 0})
+        self.assertEqual(self.board().get_pwm(1)[1], 320)
+
+    def test_direct_writes_wait_for_posted_frames(self):
+        self.pwm.commit_frame({0: 300})
+        self.pwm.set_pwm(0, 0, 200)
+        self.assertEqual(self.board().get_pwm(0)[1], 200)
+        self.assertEqual(self.writer.pending, 0)
+
+    def test_stop(self):
+        self.pwm.commit_frame({0: 300})
+        self.writer.stop(5)
+        self.assertEqual(self.board().get_pwm(0)[1], 300)
+        with self.assertRaises(RuntimeError):
+            self.writer.post({0: 310})
+
+
+if __name__ == '__main__':
+    unittest.main()
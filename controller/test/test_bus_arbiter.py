@@ -0,0 +1,95 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the bus arbiter."""
+import time
+import threading
+import unittest
+from itertools import groupby
+from controller.bus_arbiter import BusArbiter
+from controller.test import wait_until
+
+
+class TestBusArbiter(unittest.TestCase):
+    """Fair and reentrant bus locking"""
+
+    def test_threads_are_served_in_arrival_order(self):
+        arbiter = BusArbiter(('test', 0))
+        order = []
+        def worker(name):
+            with arbiter:
+                order.append(name)
+        threads = []
+        with arbiter:
+            for index in range(8):
+                thread = threading.Thread(target=worker, args=(index,))
+                thread.start()
+                threads.append(thread)
+                wait_until(lambda: arbiter.statistics['contended'] == index + 1)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, list(range(8)))
+        statistics = arbiter.statistics
+        self.assertEqual(statistics['acquisitions'], 9)
+        self.assertEqual(statistics['max_queue'], 9)
+
+    def test_alternating_threads_interleave(self):
+        arbiter = BusArbiter(('test', 1))
+        order = []
+        turns = threading.Barrier(2)
+        def worker(name):
+            turns.wait()
+            for dummy in range(20):
+                with arbiter:
+                    order.append(name)
+                    time.sleep(0.0005)
+        threads = [threading.Thread(target=worker, args=(name,)) for name in 'ab']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        # a thread asking again queues behind the other, so while both run neither gets the bus twice in a row
+        self.assertEqual(len(order), 40)
+        self.assertEqual(max(len(list(run)) for name, run in groupby(order[4:-4])), 1)
+
+    def test_reentrant(self):
+        arbiter = BusArbiter(('test', 2))
+        with arbiter:
+            with arbiter:
+                pass
+            acquired = []
+            thread = threading.Thread(target=lambda: (arbiter.acquire(), acquired.append(True), arbiter.release()))
+            thread.start()
+            thread.join(0.05)
+            self.assertEqual(acquired, [])
+        thread.join(5)
+        self.assertEqual(acquired, [True])
+        self.assertEqual(arbiter.statistics['acquisitions'], 2)
+
+    def test_release_by_other_thread(self):
+        arbiter = BusArbiter(('test', 3))
+        with self.assertRaises(RuntimeError):
+            arbiter.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
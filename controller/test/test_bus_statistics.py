@@ -0,0 +1,101 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the I2C transaction statistics."""
+import unittest
+from controller import bus_statistics, simulated_i2c
+from controller.bus_statistics import BusStatistics, register_class
+from controller.test import ControllerTestCase
+
+
+class TestBusStatistics(unittest.TestCase):
+    """Counters and histograms of one controller"""
+
+    def test_register_classes(self):
+        self.assertEqual([register_class(r) for r in (None, 0x00, 0x06, 0x45, 0xFA, 0xFE)],
+                         ['raw', 'mode', 'led', 'led', 'all_led', 'prescale'])
+
+    def test_record(self):
+        statistics = BusStatistics(('test', 1), 0x40)
+        statistics.record('led', 5, 3000)
+        statistics.record('led', 5, 100000)
+        statistics.record('mode', 2, 1 << 40)
+        snapshot = statistics.snapshot()
+        self.assertEqual((snapshot['bus'], snapshot['address']), (('test', 1), 0x40))
+        self.assertEqual((snapshot['transactions'], snapshot['bytes']), (3, 12))
+        self.assertEqual(snapshot['sizes'], {2: 1, 5: 2})
+        led = snapshot['classes']['led']
+        self.assertEqual((led['transactions'], led['bytes'], led['max']), (2, 10, 0.0001))
+        self.assertAlmostEqual(led['time'], 0.000103)
+        self.assertEqual(led['histogram'], {4: 1, 128: 1})
+        self.assertEqual(snapshot['classes']['mode']['histogram'], {None: 1})
+
+    def test_reset(self):
+        statistics = BusStatistics(('test', 1), 0x40)
+        statistics.record('led', 5, 3000)
+        statistics.reset()
+        snapshot = statistics.snapshot()
+        self.assertEqual((snapshot['transactions'], snapshot['bytes'], snapshot['sizes']), (0, 0, {}))
+
+
+class TestControllerStatistics(ControllerTestCase):
+    """Statistics recorded by the controllers"""
+
+    def setUp(self):
+        super().setUp()
+        bus_statistics.reset()
+
+    def test_transactions_are_counted(self):
+        pwm = self.controller()
+        pwm.reset_statistics()
+        bus = simulated_i2c.get_bus()
+        transactions = bus.transactions
+        pwm.commit_frame({0: 300, 15: 300})
+        pwm.verify_shadow()
+        self.assertEqual(pwm.statistics['transactions'], bus.transactions - transactions)
+
+    def test_buses_are_kept_apart(self):
+        first = self.controller(busnum=1)
+        second = self.controller(busnum=2)
+        first.reset_statistics()
+        second.reset_statistics()
+        first.commit_frame({0: 300})
+        self.assertEqual(first.statistics['transactions'], 1)
+        self.assertEqual(second.statistics['transactions'], 0)
+        snapshots = bus_statistics.snapshot(address=0x40)
+        self.assertEqual(sorted(bus for bus, address in snapshots), [first.arbiter.key, second.arbiter.key])
+
+    def test_reset_statistics(self):
+        first = self.controller(busnum=1)
+        second = self.controller(busnum=2)
+        first.commit_frame({0: 300})
+        first.commit_frame({0: 300})
+        self.assertEqual(first.skipped_writes, 1)
+        first.reset_statistics()
+        self.assertEqual((first.statistics['transactions'], first.skipped_writes), (0, 0))
+        self.assertGreater(second.statistics['transactions'], 0)
+        bus_statistics.reset(second.arbiter.key)
+        self.assertEqual(second.statistics['transactions'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
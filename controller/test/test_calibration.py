@@ -0,0 +1,135 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the oscillator calibration of the PCA9685."""
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from controller import MiuzeiSG90Attributes
+from controller.calibration import OscillatorCalibration, CalibrationCache, oscillator_from_pulse, \
+    oscillator_from_frequency, prescale_for
+from controller.PCA9685 import PRESCALE
+from controller.test import ControllerTestCase
+
+
+class TestCalibration(unittest.TestCase):
+    """Oscillator calculations"""
+
+    def test_oscillator_from_measurements(self):
+        self.assertAlmostEqual(oscillator_from_frequency(50.0, 121), 50.0 * 4096 * 122)
+        # 300 ticks of 122 cycles at 25 MHz
+        self.assertAlmostEqual(oscillator_from_pulse(300, 300 * 122 / 25000.0, 121), 25000000.0)
+        with self.assertRaises(ValueError):
+            oscillator_from_pulse(0, 1.5, 121)
+
+    def test_prescale_and_tick_length(self):
+        calibration = OscillatorCalibration(1, 0x40, 25000000.0, 4096, 50)
+        self.assertEqual(calibration.prescale, prescale_for(25000000.0, 4096, 50))
+        self.assertAlmostEqual(calibration.tick_length(), (calibration.prescale + 1) / 25.0)
+        self.assertAlmostEqual(calibration.tick_length(100), 101 / 25.0)
+
+
+class TestCalibrationCache(unittest.TestCase):
+    """Storing calibrations in the cache file"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'pca9685.calibration.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_round_trip(self):
+        calibration = OscillatorCalibration(1, 0x40, 25312000.0, 4096, 50)
+        calibration.prescale = 122
+        CalibrationCache(self.path).put(calibration)
+        loaded = CalibrationCache(self.path).get(1, 0x40)
+        self.assertEqual(loaded.to_dict(), calibration.to_dict())
+        self.assertIsNone(CalibrationCache(self.path).get(1, 0x41))
+        self.assertIsNone(CalibrationCache(os.path.join(self.directory, 'missing.json')).get(1, 0x40))
+
+    def test_boards_on_different_buses(self):
+        cache = CalibrationCache(self.path)
+        cache.put(OscillatorCalibration(1, 0x40, 25100000.0, 4096, 50))
+        cache.put(OscillatorCalibration(2, 0x40, 24900000.0, 4096, 50))
+        self.assertEqual(cache.get(1, 0x40).oscillator, 25100000.0)
+        self.assertEqual(cache.get(2, 0x40).oscillator, 24900000.0)
+        with open(self.path) as file:
+            self.assertEqual(sorted(json.load(file)), ['1:64', '2:64'])
+
+
+class TestCalibratedController(ControllerTestCase):
+    """Tick length of a calibrated board"""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'pca9685.calibration.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super().tearDown()
+
+    def real_tick_length(self, pwm) -> float:
+        """Tick length in microseconds of the simulated board."""
+        return 1000000.0 / pwm._device.device.board.pwm_frequency / 4096.0
+
+    def test_calibrate(self):
+        pwm = self.controller(calibration_file=self.path)
+        pwm.add_servo(0, MiuzeiSG90Attributes())
+        servo = pwm.get_servo(0)
+        pwm.calibrate(measured_frequency=pwm._device.device.board.pwm_frequency)
+        self.assertAlmostEqual(pwm.calibration.oscillator, 25000000.0)
+        self.assertAlmostEqual(pwm.tick_length, self.real_tick_length(pwm))
+        self.assertAlmostEqual(servo._tick_length * 1000.0, pwm.tick_length)
+        self.assertEqual(CalibrationCache(self.path).get(1, 0x40).to_dict(), pwm.calibration.to_dict())
+
+    def test_tick_length_at_another_frequency(self):
+        pwm = self.controller(calibration_file=self.path)
+        pwm.calibrate(measured_frequency=pwm._device.device.board.pwm_frequency)
+        pwm = self.controller(calibration_file=self.path, servo_frequency=60)
+        self.assertIsNotNone(pwm.calibration)
+        self.assertNotEqual(pwm._read8(PRESCALE), pwm.calibration.prescale)
+        self.assertAlmostEqual(pwm.tick_length, self.real_tick_length(pwm))
+        self.assertAlmostEqual(pwm.tick_length, 1000000.0 / 60 / 4096, delta=0.05)
+
+    def test_set_pwm_freq_updates_servos(self):
+        pwm = self.controller(calibration_file=self.path)
+        pwm.add_servo(0, MiuzeiSG90Attributes())
+        servo = pwm.get_servo(0)
+        pwm.calibrate(measured_frequency=pwm._device.device.board.pwm_frequency)
+        pwm.set_pwm_freq(60)
+        self.assertEqual(pwm.frequency, 60)
+        self.assertAlmostEqual(pwm.tick_length, self.real_tick_length(pwm))
+        self.assertAlmostEqual(servo._tick_length * 1000.0, pwm.tick_length)
+
+    def test_calibration_is_per_bus(self):
+        pwm = self.controller(calibration_file=self.path, busnum=1)
+        pwm.calibrate(measured_frequency=pwm._device.device.board.pwm_frequency)
+        self.assertIsNone(self.controller(calibration_file=self.path, busnum=2).calibration)
+        self.assertIsNotNone(self.controller(calibration_file=self.path, busnum=1).calibration)
+
+
+if __name__ == '__main__':
+    unittest.main()
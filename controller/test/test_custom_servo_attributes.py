@@ -0,0 +1,89 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the calibration curves of CustomServoAttributes."""
+import unittest
+from controller import CustomServoAttributes
+
+
+class TestCalibrationCurve(unittest.TestCase):
+    """set_curve, curve and the interpolation on the curve"""
+
+    points = [(-90.0, 0.5), (-30.0, 1.1), (0.0, 1.5), (45.0, 1.9), (90.0, 2.5)]
+
+    def setUp(self):
+        self.attributes = CustomServoAttributes.from_dict({
+            'pulse': {'min': 0.5, 'neutral': 1.5, 'max': 2.5},
+            'angle': {'min': -90.0, 'neutral': 0.0, 'max': 90.0}
+        })
+
+    def test_default_curve(self):
+        self.assertEqual(self.attributes.curve, [(-90.0, 0.5), (0.0, 1.5), (90.0, 2.5)])
+
+    def test_curve_is_sorted_by_angle(self):
+        self.attributes.set_curve(list(reversed(self.points)))
+        self.assertEqual(self.attributes.curve, self.points)
+
+    def test_interpolation_between_points(self):
+        self.attributes.set_curve(self.points)
+        self.assertAlmostEqual(self.attributes.pulse_from_angle(-60.0), 0.8)
+        self.assertAlmostEqual(self.attributes.pulse_from_angle(-15.0), 1.3)
+        self.assertAlmostEqual(self.attributes.pulse_from_angle(22.5), 1.7)
+        self.assertAlmostEqual(self.attributes.pulse_from_angle(60.0), 2.1)
+
+    def test_curve_points_and_endpoints(self):
+        self.attributes.set_curve(self.points)
+        for angle, pulse in self.points:
+            self.assertEqual(self.attributes.pulse_from_angle(angle), pulse)
+        self.assertEqual(self.attributes.pulse_from_angle(-95.0), 0.5)
+        self.assertEqual(self.attributes.pulse_from_angle(95.0), 2.5)
+
+    def test_decreasing_curve(self):
+        self.attributes.set_curve([(-90.0, 2.5), (0.0, 1.5), (90.0, 0.5)])
+        self.assertAlmostEqual(self.attributes.pulse_from_angle(45.0), 1.0)
+
+    def test_from_dict(self):
+        attributes = CustomServoAttributes.from_dict({
+            'pulse': {'min': 0.5, 'neutral': 1.5, 'max': 2.5},
+            'angle': {'min': -90.0, 'neutral': 0.0, 'max': 90.0},
+            'curve': [{'angle': angle, 'pulse': pulse} for angle, pulse in self.points]
+        })
+        self.assertEqual(attributes.curve, self.points)
+
+    def test_rejects_curves_that_are_not_monotonic(self):
+        for points in ([(-90.0, 0.5), (0.0, 1.8), (45.0, 1.6), (90.0, 2.5)],
+                       [(-90.0, 0.5), (0.0, 1.5), (45.0, 1.5), (90.0, 2.5)]):
+            with self.assertRaises(ValueError):
+                self.attributes.set_curve(points)
+        self.assertEqual(self.attributes.curve, [(-90.0, 0.5), (0.0, 1.5), (90.0, 2.5)])
+
+    def test_rejects_invalid_curves(self):
+        for points in ([(-90.0, 0.5)],
+                       [(-90.0, 0.5), (0.0, 1.5), (0.0, 1.6), (90.0, 2.5)],
+                       [(-80.0, 0.6), (90.0, 2.5)],
+                       [(-90.0, 0.5), (80.0, 2.4)]):
+            with self.assertRaises(ValueError):
+                self.attributes.set_curve(points)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for controller.PCA9685 on the simulated backend."""
+import unittest
+from unittest import mock
+from controller import Servo, MiuzeiSG90Attributes
+from controller.PCA9685 import MODE1, PRESCALE, LED0_ON_L, SHADOW_RANGES
+from controller.test import ControllerTestCase
+
+
+def failing_once(operation):
+    """Wraps a device operation so that its first call raises an IOError."""
+    calls = []
+    def wrapper(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise IOError('Simulated bus error')
+        return operation(*args)
+    return wrapper
+
+
+class TestRegisterShadow(ControllerTestCase):
+    """Register shadow and coalesced flushes of dirty registers"""
+
+    def board(self, pwm):
+        return pwm._device.device.board
+
+    def written(self, pwm, operation):
+        """Runs an operation and returns the register blocks it wrote to the board."""
+        blocks = []
+        write_blocks = pwm._device.write_blocks
+        def record(data):
+            blocks.extend((register, list(values)) for register, values in data)
+            return write_blocks(data)
+        with mock.patch.object(pwm._device, 'write_blocks', record):
+            operation()
+        return blocks
+
+    def test_shadow_matches_board(self):
+        pwm = self.controller()
+        pwm.commit_frame({0: 300, 7: 400})
+        board = self.board(pwm)
+        for start, end in SHADOW_RANGES:
+            self.assertEqual(pwm._shadow[start:end], board.registers[start:end])
+
+    def test_warm_start_keeps_prescale(self):
+        pwm = self.controller()
+        prescale = self.board(pwm).registers[PRESCALE]
+        transactions = pwm._device.device.bus.transactions
+        self.controller()
+        board = self.board(pwm)
+        self.assertFalse(board.sleeping)
+        self.assertEqual(board.registers[PRESCALE], prescale)
+        self.assertLess(pwm._device.device.bus.transactions - transactions, transactions)
+
+    def test_only_changed_registers_are_written(self):
+        pwm = self.controller()
+        pwm.commit_frame({0: 300})
+        self.assertEqual(self.written(pwm, lambda: pwm.commit_frame({0: 301})), [(LED0_ON_L + 2, [45])])
+        self.assertEqual(self.written(pwm, lambda: pwm.set_pwm(0, 0, 301)), [])
+
+    def test_adjacent_channels_are_coalesced(self):
+        pwm = self.controller()
+        blocks = self.written(pwm, lambda: pwm.commit_frame({12: 300, 13: 300, 14: 300, 15: 300}))
+        self.assertEqual([register for register, values in blocks], [LED0_ON_L + 4*12 + 2])
+        self.assertEqual(len(blocks[0][1]), 14)
+
+    def test_distant_channels_are_separate_blocks(self):
+        pwm = self.controller()
+        blocks = self.written(pwm, lambda: pwm.commit_frame({0: 300, 15: 300}))
+        self.assertEqual([register for register, values in blocks], [LED0_ON_L + 2, LED0_ON_L + 4*15 + 2])
+
+    def test_failed_flush_keeps_registers_dirty(self):
+        pwm = self.controller()
+        with mock.patch.object(pwm._device, 'write_blocks', failing_once(pwm._device.write_blocks)):
+            with self.assertRaises(IOError):
+                pwm.set_pwm(0, 0, 300)
+            pwm.flush()
+        self.assertEqual(self.board(pwm).get_pwm(0)[1], 300)
+
+    def test_verify_shadow_detects_drift(self):
+        pwm = self.controller(shadow_verify_interval=1)
+        pwm.commit_frame({0: 300})
+        self.board(pwm).registers[LED0_ON_L + 4*5 + 2] = 0x55
+        self.assertEqual(pwm.verify_shadow(), 1)
+        self.assertEqual(pwm.drift, 1)
+        self.assertEqual(pwm._shadow[LED0_ON_L + 4*5 + 2], 0x55)
+        self.assertIsNone(pwm.committed_ticks(0))
+        self.assertEqual(pwm.verify_shadow(), 0)
+        self.assertEqual(pwm._read8(MODE1), self.board(pwm).registers[MODE1])
+
+
+class TestCommitFrame(ControllerTestCase):
+    """Skipping channels that already have their committed ticks"""
+
+    def board(self, pwm):
+        return pwm._device.device.board
+
+    def test_unchanged_channels_are_skipped(self):
+        pwm = self.controller()
+        bus = pwm._device.device.bus
+        pwm.commit_frame({0: 300, 1: 310})
+        transactions = bus.transactions
+        pwm.commit_frame({0: 300, 1: 310})
+        self.assertEqual(bus.transactions, transactions)
+        self.assertEqual(pwm.skipped_writes, 2)
+        pwm.commit_frame({0: 300, 1: 320})
+        self.assertEqual(pwm.skipped_writes, 3)
+        self.assertEqual(self.board(pwm).get_pwm(1)[1], 320)
+
+    def test_servo_writes_are_counted_by_the_controller(self):
+        pwm = self.controller()
+        servo = Servo(pwm, 0, MiuzeiSG90Attributes())
+        skipped = pwm.skipped_writes
+        servo.set_angle(10.0)
+        servo.set_angle(10.0)
+        servo.set_pulse(servo.pulse)
+        self.assertEqual(pwm.skipped_writes, skipped + 2)
+        self.assertFalse(hasattr(servo, 'skipped_writes'))
+
+    def test_direct_writes_forget_committed_ticks(self):
+        pwm = self.controller()
+        pwm.commit_frame({0: 300, 1: 310, 2: 320})
+        pwm.set_pwm(0, 0, 200)
+        pwm.set_off(1)
+        self.assertEqual((pwm.committed_ticks(0), pwm.committed_ticks(1), pwm.committed_ticks(2)), (None, None, 320))
+        pwm.set_off(1, False)
+        pwm.commit_frame({0: 300, 1: 310})
+        self.assertEqual(self.board(pwm).get_pwm(0)[1], 300)
+        self.assertEqual(pwm.skipped_writes, 0)
+        pwm.set_all_pwm(0, 250)
+        self.assertEqual([pwm.committed_ticks(channel) for channel in range(16)], [None] * 16)
+
+    def test_failed_write_is_retried(self):
+        pwm = self.controller()
+        with mock.patch.object(pwm._device, 'write_blocks', failing_once(pwm._device.write_blocks)):
+            with self.assertRaises(IOError):
+                pwm.commit_frame({0: 300})
+            self.assertIsNone(pwm.committed_ticks(0))
+            pwm.commit_frame({0: 300})
+        self.assertEqual(pwm.committed_ticks(0), 300)
+        self.assertEqual(pwm.skipped_writes, 0)
+        self.assertEqual(self.board(pwm).get_pwm(0)[1], 300)
+
+    def test_failed_asynchronous_write_is_retried(self):
+        pwm = self.controller(asynchronous=True)
+        try:
+            with mock.patch.object(pwm._device, 'write_blocks', failing_once(pwm._device.write_blocks)):
+                pwm.commit_frame({0: 300})
+                self.assertTrue(pwm.wait(5))
+                self.assertEqual(pwm.writer.statistics['errors'], 1)
+                self.assertIsNone(pwm.committed_ticks(0))
+                pwm.commit_frame({0: 300})
+                self.assertTrue(pwm.wait(5))
+            self.assertEqual(self.board(pwm).get_pwm(0)[1], 300)
+        finally:
+            pwm.writer.stop(5)
+
+
+if __name__ == '__main__':
+    unittest.main()
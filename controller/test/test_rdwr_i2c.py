@@ -0,0 +1,124 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the I2C_RDWR backend against the simulated file descriptor layer."""
+import unittest
+from unittest import mock
+from controller import PCA9685, rdwr_i2c, simulated_i2c, bus_frame, commit_frames
+from controller.rdwr_i2c import SimulatedIO, I2C_M_RD, I2C_RDWR_IOCTL_MAX_MSGS
+from controller.simulated_i2c import MODE1, PRESCALE, LED0_ON_L
+from controller.test import ControllerTestCase
+
+
+class TestRdwrBackend(ControllerTestCase):
+    """Combined transfers through rdwr_i2c"""
+
+    def setUp(self):
+        super().setUp()
+        self.io = SimulatedIO()
+        buses = mock.patch.dict(rdwr_i2c._buses, clear=True)
+        buses.start()
+        self.addCleanup(buses.stop)
+        io = mock.patch.object(rdwr_i2c, '_io', self.io)
+        io.start()
+        self.addCleanup(io.stop)
+
+    def board(self, address: int = 0x40):
+        return simulated_i2c.get_bus(rdwr_i2c.DEFAULT_BUSNUM).devices[address]
+
+    def test_block_writes_share_an_ioctl(self):
+        device = rdwr_i2c.get_i2c_device(0x40)
+        device.write8(MODE1, 0x20)
+        ioctls, messages = self.io.ioctls, self.io.messages
+        device.write_blocks([(LED0_ON_L, [0, 0, 0x2C, 0x01]), (LED0_ON_L + 4*15, [0, 0, 0x36, 0x01])])
+        self.assertEqual((self.io.ioctls - ioctls, self.io.messages - messages), (1, 2))
+        self.assertEqual(self.board().get_pwm(0)[1], 300)
+        self.assertEqual(self.board().get_pwm(15)[1], 310)
+
+    def test_read_is_one_combined_transaction(self):
+        device = rdwr_i2c.get_i2c_device(0x40)
+        device.write8(MODE1, 0x20)
+        device.writeList(LED0_ON_L, [1, 2, 3, 4])
+        ioctls = self.io.ioctls
+        self.assertEqual(list(device.readList(LED0_ON_L, 4)), [1, 2, 3, 4])
+        self.assertEqual(device.readU16(LED0_ON_L + 2), 0x0403)
+        self.assertEqual(self.io.ioctls - ioctls, 2)
+
+    def test_messages_are_split_at_the_ioctl_limit(self):
+        bus = rdwr_i2c.get_bus()
+        count = I2C_RDWR_IOCTL_MAX_MSGS + 5
+        bus.transfer([(0x40, 0, bytearray([PRESCALE, 0x79])) for dummy in range(count)])
+        self.assertEqual((self.io.ioctls, self.io.messages), (2, count))
+
+    def test_read_messages_receive_data(self):
+        bus = rdwr_i2c.get_bus()
+        data = bytearray(1)
+        bus.transfer([(0x40, 0, bytearray([PRESCALE])), (0x40, I2C_M_RD, data)])
+        self.assertEqual(data[0], self.board().registers[PRESCALE])
+
+    def test_controller_frame_is_one_ioctl(self):
+        pwm = PCA9685.from_dict({
+            'address': 0x40, 'frequency': 26500000, 'resolution': 4096, 'servo_frequency': 50,
+            'backend': 'rdwr', 'logging_level': None
+        })
+        self.assertIs(pwm.i2c, rdwr_i2c)
+        ioctls = self.io.ioctls
+        pwm.commit_frame({0: 300, 7: 305, 15: 310})
+        self.assertEqual(self.io.ioctls - ioctls, 1)
+        self.assertEqual([self.board().get_pwm(channel)[1] for channel in (0, 7, 15)], [300, 305, 310])
+
+    def rdwr_controller(self, address: int) -> PCA9685:
+        return PCA9685.from_dict({
+            'address': address, 'frequency': 26500000, 'resolution': 4096, 'servo_frequency': 50,
+            'backend': 'rdwr', 'logging_level': None
+        })
+
+    def test_two_arm_frame_is_one_ioctl(self):
+        left, right = self.rdwr_controller(0x40), self.rdwr_controller(0x41)
+        ioctls, messages = self.io.ioctls, self.io.messages
+        with bus_frame():
+            left.commit_frame({12: 300, 13: 310, 14: 320})
+            right.commit_frame({12: 330, 13: 340, 14: 350})
+            self.assertEqual(self.io.ioctls, ioctls)
+        self.assertEqual((self.io.ioctls - ioctls, self.io.messages - messages), (1, 2))
+        self.assertEqual([self.board(0x40).get_pwm(channel)[1] for channel in (12, 13, 14)], [300, 310, 320])
+        self.assertEqual([self.board(0x41).get_pwm(channel)[1] for channel in (12, 13, 14)], [330, 340, 350])
+
+    def test_commit_frames_skips_unchanged_boards(self):
+        left, right = self.rdwr_controller(0x40), self.rdwr_controller(0x41)
+        commit_frames({left: {0: 300}, right: {0: 310}})
+        ioctls, messages = self.io.ioctls, self.io.messages
+        commit_frames({left: {0: 300}, right: {0: 320}})
+        self.assertEqual((self.io.ioctls - ioctls, self.io.messages - messages), (1, 1))
+        self.assertEqual((self.board(0x40).get_pwm(0)[1], self.board(0x41).get_pwm(0)[1]), (300, 320))
+
+    def test_failed_bus_frame_is_written_again(self):
+        left, right = self.rdwr_controller(0x40), self.rdwr_controller(0x41)
+        with mock.patch.object(rdwr_i2c.RdwrBus, 'write_blocks', side_effect=OSError('nack')):
+            with self.assertRaises(OSError):
+                commit_frames({left: {0: 300}, right: {0: 310}})
+        commit_frames({left: {0: 300}, right: {0: 310}})
+        self.assertEqual((self.board(0x40).get_pwm(0)[1], self.board(0x41).get_pwm(0)[1]), (300, 310))
+
+
+if __name__ == '__main__':
+    unittest.main()
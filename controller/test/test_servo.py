@@ -0,0 +1,82 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the angle to ticks lookup of controller.Servo."""
+import random
+import unittest
+import numpy as np
+from controller import Servo, MiuzeiSG90Attributes, ES08MAIIAttributes, CustomServoAttributes
+from controller.test import ControllerTestCase
+
+
+class TestLookupTable(ControllerTestCase):
+    """The lookup table against the interpolation it replaces"""
+
+    def attributes(self):
+        custom = CustomServoAttributes()
+        custom.min_pulse, custom.neutral_pulse, custom.max_pulse = 0.5, 1.5, 2.5
+        custom.min_angle, custom.neutral_angle, custom.max_angle = -90.0, 0.0, 90.0
+        custom.set_curve([(-90.0, 0.5), (-30.0, 1.1), (0.0, 1.5), (45.0, 1.9), (90.0, 2.5)])
+        return [MiuzeiSG90Attributes(), ES08MAIIAttributes(), custom]
+
+    def angles(self, servo, attributes):
+        generator = random.Random(11)
+        angles = [generator.uniform(attributes.min_angle, attributes.max_angle) for _ in range(20000)]
+        angles += servo._table_breaks + [np.nextafter(angle, -np.inf) for angle in servo._table_breaks]
+        return angles + [attributes.min_angle, attributes.max_angle, attributes.neutral_angle]
+
+    def test_lookup_is_exact(self):
+        pwm = self.controller()
+        for attributes in self.attributes():
+            servo = Servo(pwm, 0, attributes)
+            for angle in self.angles(servo, attributes):
+                try:
+                    expected = servo._calculate_servo_ticks_from_angle(angle)[0]
+                except Exception:
+                    # the interpolated pulse can round just outside the pulse range at the limits
+                    continue
+                self.assertEqual(servo._lookup_ticks(angle), expected, angle)
+
+    def test_batch_matches_lookup(self):
+        pwm = self.controller()
+        for attributes in self.attributes():
+            servo = Servo(pwm, 0, attributes)
+            angles = self.angles(servo, attributes)
+            self.assertEqual(servo.ticks_from_angles(np.array(angles)).tolist(),
+                             [servo._lookup_ticks(angle) for angle in angles])
+
+    def test_range_check_is_exact(self):
+        pwm = self.controller()
+        attributes = MiuzeiSG90Attributes()
+        servo = Servo(pwm, 0, attributes)
+        for angle in (-85.01, 85.05, np.nextafter(attributes.min_angle, -np.inf), np.nextafter(attributes.max_angle, np.inf)):
+            with self.assertRaises(Exception):
+                servo._lookup_ticks(angle)
+            with self.assertRaises(Exception):
+                servo.ticks_from_angles(np.array([0.0, angle]))
+        servo._lookup_ticks(attributes.min_angle)
+        servo._lookup_ticks(attributes.max_angle)
+        servo.ticks_from_angles(np.array([attributes.min_angle, attributes.max_angle]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the simulated I2C bus and PCA9685 board."""
+import os
+import time
+import unittest
+from controller import simulated_i2c
+from controller.PCA9685 import resolve_backend, BACKEND_ENVIRONMENT_VARIABLE
+from controller.simulated_i2c import MODE1, PRESCALE, LED0_ON_L, ALL_LED_ON_L, AI, SLEEP, RESTART, SWRST
+from controller.test import ControllerTestCase
+
+
+class TestSimulatedBoard(ControllerTestCase):
+    """Register semantics of the simulated PCA9685"""
+
+    def device(self, address: int = 0x40, **kwargs):
+        return simulated_i2c.get_i2c_device(address, latency=0, bus_speed=0, **kwargs)
+
+    def test_power_on_state(self):
+        board = self.device().board
+        self.assertTrue(board.sleeping)
+        self.assertEqual(board.get_pwm(0), (0, 0, False, True))
+        self.assertEqual(board.pulse_width(0), 0.0)
+
+    def test_auto_increment(self):
+        device = self.device()
+        device.writeList(LED0_ON_L, [1, 2, 3, 4])
+        self.assertEqual(list(device.readList(LED0_ON_L, 4)), [4, 4, 4, 4])
+        self.assertEqual(list(device.board.registers[LED0_ON_L:LED0_ON_L + 4]), [4, 0, 0, 16])
+        device.write8(MODE1, AI | SLEEP)
+        device.writeList(LED0_ON_L, [1, 2, 3, 4])
+        self.assertEqual(list(device.readList(LED0_ON_L, 4)), [1, 2, 3, 4])
+
+    def test_prescale_only_while_sleeping(self):
+        device = self.device()
+        device.write8(PRESCALE, 121)
+        device.write8(MODE1, AI)
+        device.write8(PRESCALE, 30)
+        self.assertEqual(device.readU8(PRESCALE), 121)
+        self.assertAlmostEqual(device.board.pwm_frequency, 25000000 / 4096.0 / 122)
+
+    def test_sleep_sets_restart(self):
+        device = self.device()
+        device.write8(MODE1, AI)
+        device.write8(MODE1, AI | SLEEP)
+        self.assertTrue(device.readU8(MODE1) & RESTART)
+        device.write8(MODE1, AI)
+        device.write8(MODE1, AI | RESTART)
+        self.assertFalse(device.readU8(MODE1) & RESTART)
+
+    def test_all_led_registers(self):
+        device = self.device()
+        device.write8(MODE1, AI)
+        device.writeList(ALL_LED_ON_L, [0, 0, 0x2C, 0x01])
+        self.assertEqual([device.board.get_pwm(channel)[1] for channel in range(16)], [300] * 16)
+        self.assertEqual(list(device.readList(ALL_LED_ON_L, 4)), [0, 0, 0, 0])
+
+    def test_software_reset(self):
+        device = self.device()
+        device.write8(MODE1, AI)
+        self.device(0x00).writeRaw8(SWRST)
+        self.assertTrue(device.board.sleeping)
+
+    def test_unknown_address(self):
+        device = self.device()
+        with self.assertRaises(IOError):
+            simulated_i2c.SimulatedDevice(device.bus, 0x41).readU8(MODE1)
+
+    def test_latency(self):
+        device = simulated_i2c.get_i2c_device(0x40, latency=0.002, bus_speed=0)
+        start = time.perf_counter()
+        for dummy in range(5):
+            device.write8(MODE1, AI)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.01)
+        self.assertEqual(device.bus.transactions, 5)
+
+
+class TestBackendSelection(ControllerTestCase):
+    """Choosing the backend from the configuration and the environment"""
+
+    def test_environment_takes_precedence(self):
+        self.assertEqual(resolve_backend(None), 'adafruit')
+        self.assertEqual(resolve_backend('simulated'), 'simulated')
+        os.environ[BACKEND_ENVIRONMENT_VARIABLE] = 'rdwr'
+        try:
+            self.assertEqual(resolve_backend('simulated'), 'rdwr')
+        finally:
+            del os.environ[BACKEND_ENVIRONMENT_VARIABLE]
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            resolve_backend('spi')
+
+    def test_controller_on_simulated_bus(self):
+        pwm = self.controller()
+        board = pwm._device.device.board
+        self.assertFalse(board.sleeping)
+        # prescale for the nominal 26.5 MHz oscillator of the controller at 50 Hz
+        self.assertEqual(board.registers[PRESCALE], 128)
+        pwm.commit_frame({3: 307})
+        self.assertEqual(board.get_pwm(3), (0, 307, False, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
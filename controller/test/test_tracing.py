@@ -0,0 +1,118 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the sampled hot path tracing."""
+import logging
+import threading
+import unittest
+from controller import tracing
+from controller.tracing import Tracer
+
+
+class RecordingHandler(logging.Handler):
+    """Keeps the handled records and the threads they were handled on."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+        self.threads.append(threading.current_thread())
+
+
+class TestTracer(unittest.TestCase):
+    """Sampling and the queued logging of Tracer"""
+
+    def setUp(self):
+        tracing.stop()
+        self.handler = RecordingHandler()
+        self.logger = logging.getLogger('controller.test.tracing')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+        self.addCleanup(tracing.stop)
+
+    def test_one_in_sample_rate_events_is_logged(self):
+        tracer = Tracer(self.logger.name, sample_rate=3)
+        for step in range(10):
+            tracer.trace('step', 'step %d', step)
+        tracer.trace('clamp', 'clamped')
+        tracing.stop()
+        self.assertEqual(tracer.counters, {'step': 10, 'clamp': 1})
+        self.assertEqual([record.getMessage() for record in self.handler.records], ['step 2', 'step 5', 'step 8'])
+
+    def test_sample_rate_one_logs_every_event(self):
+        tracer = Tracer(self.logger.name, sample_rate=1)
+        tracer.trace('step', 'first')
+        tracer.trace('clamp', 'second')
+        tracing.stop()
+        self.assertEqual([record.getMessage() for record in self.handler.records], ['first', 'second'])
+        self.assertTrue(all(record.levelno == logging.INFO for record in self.handler.records))
+
+    def test_reset(self):
+        tracer = Tracer(self.logger.name, sample_rate=0)
+        tracer.trace('step', 'step')
+        tracer.reset()
+        self.assertEqual(tracer.counters, {})
+
+    def test_records_are_handled_on_the_listener_thread(self):
+        tracer = Tracer(self.logger.name, sample_rate=1)
+        args = ('deferred',)
+        tracer.trace('step', 'message %s', *args)
+        tracing.stop()
+        self.assertEqual(len(self.handler.records), 1)
+        record = self.handler.records[0]
+        self.assertNotEqual(self.handler.threads[0], threading.current_thread())
+        # the queue handler leaves the record unformatted, the listener formats it
+        self.assertEqual((record.msg, record.args), ('message %s', args))
+        self.assertEqual(record.getMessage(), 'message deferred')
+
+    def test_listener_restarts_after_stop(self):
+        tracer = Tracer(self.logger.name, sample_rate=1)
+        tracer.trace('step', 'before')
+        tracing.stop()
+        tracer.trace('step', 'after')
+        tracing.stop()
+        self.assertEqual([record.getMessage() for record in self.handler.records], ['before', 'after'])
+
+    def test_disabled_sampling_is_a_no_op(self):
+        tracer = Tracer(self.logger.name, sample_rate=0)
+        for step in range(5):
+            tracer.trace('step', 'step %d', step)
+        self.assertIsNone(tracing._listener)
+        self.assertEqual(tracer.counters, {'step': 5})
+        self.assertEqual(self.handler.records, [])
+
+    def test_disabled_logger_is_a_no_op(self):
+        self.logger.setLevel(logging.WARNING)
+        tracer = Tracer(self.logger.name, sample_rate=1)
+        tracer.trace('step', 'step')
+        self.assertIsNone(tracing._listener)
+        self.assertEqual(tracer.counters, {'step': 1})
+        self.assertEqual(self.handler.records, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
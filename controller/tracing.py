@@ -0,0 +1,140 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""
+    Cheap instrumentation for hot paths. Every traced event increments a counter and only one in
+    N events is logged. Sampled records are queued and formatted and handled on a listener thread,
+    so the calling thread never waits for formatting or the log handlers.
+"""
+import atexit
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_SAMPLE_RATE = 100
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue handler leaving the record untouched. Formatting happens on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class _ForwardHandler(logging.Handler):
+    """Hands queued records to the logger they were created for and through it to its handlers."""
+
+    def emit(self, record: logging.LogRecord):
+        logging.getLogger(record.name).handle(record)
+
+_queue = queue.SimpleQueue()
+_handler = _DeferredQueueHandler(_queue)
+_listener = None
+_listener_lock = threading.Lock()
+
+def _start_listener():
+    """Starts the listener thread on first use."""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = QueueListener(_queue, _ForwardHandler())
+            _listener.start()
+            atexit.register(stop)
+
+def stop():
+    """stop
+    Stops the listener thread after handling the queued records.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class Tracer(object):
+    """Counts hot path events and logs a sample of them."""
+
+    def __init__(self, name: str, sample_rate: int = DEFAULT_SAMPLE_RATE):
+        """__init__
+        Initialize Tracer
+
+        :param name: Name of the logger sampled records are logged to. Its level applies.
+        :type name: str
+
+        :param sample_rate: Log one in sample_rate events of each kind. 0 disables logging,
+                            1 logs every event.
+        :type sample_rate: int
+        """
+        self._logger = logging.getLogger(name)
+        self._sample_rate = int(sample_rate)
+        self._counters = {}
+
+    @property
+    def sample_rate(self) -> int:
+        """Gets the sample rate.
+
+        :return: One in sample_rate events is logged, 0 for none.
+        :rtype: int
+        """
+        return self._sample_rate
+
+    @sample_rate.setter
+    def sample_rate(self, value: int):
+        """Sets the sample rate.
+
+        :param value: One in value events is logged, 0 for none.
+        :type value: int
+        """
+        self._sample_rate = int(value)
+
+    @property
+    def counters(self) -> {}:
+        """Gets the event counters.
+
+        :return: Number of events by kind.
+        :rtype: dictionary
+        """
+        return dict(self._counters)
+
+    def reset(self):
+        """reset
+        Resets the event counters.
+        """
+        self._counters = {}
+
+    def trace(self, event: str, msg: str, *args):
+        """trace
+        Counts an event and logs it at INFO level if it is sampled. The message is only
+        formatted for sampled events, on the listener thread.
+
+        :param event: The kind of event, used as counter key.
+        :type event: str
+
+        :param msg: The log message, formatted with args.
+        :type msg: str
+        """
+        count = self._counters.get(event, 0) + 1
+        self._counters[event] = count
+        if self._sample_rate > 0 and count % self._sample_rate == 0 and self._logger.isEnabledFor(logging.INFO):
+            if _listener is None:
+                _start_listener()
+            _handler.handle(self._logger.makeRecord(self._logger.name, logging.INFO, '(trace)', 0, msg, args, None))
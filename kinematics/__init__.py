@@ -24,4 +24,4 @@
     Kinematics module to translate cartesian/polar coordinates into servo angles for 
     meArm.
 """
-from .kinematics import Point, Kinematics
+from .kinematics import Point, Kinematics, IncrementalSolver
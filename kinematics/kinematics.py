@@ -24,13 +24,19 @@
     Kinematics and reverse kinematics to determine cartesians from angles and vice versa
 """
 import math
+import threading
+from collections import OrderedDict
+import numpy as np
 
 
 class Point(object):
     """
-    Represents a point in space
+    Represents a point in space. Points created from cartesian coordinates calculate their
+    polar coordinates on first access.
     """
 
+    __slots__ = ('x', 'y', 'z', '_r', '_lng', '_lat', '_polar', '_useRadians')
+
     def __init__(self, useRadians: bool = False):
         """
         Initializes the object
@@ -41,11 +47,65 @@ class Point(object):
         self.x = 0.0
         self.y = 0.0
         self.z = 0.0
-        self.r = 0.0
-        self.lng = 0.0
-        self.lat = 0.0
+        self._r = 0.0
+        self._lng = 0.0
+        self._lat = 0.0
+        self._polar = True
         self._useRadians = useRadians
 
+    @property
+    def r(self) -> float:
+        """Gets the radius (magnitude)"""
+        if not self._polar: self._calculatePolar()
+        return self._r
+
+    @r.setter
+    def r(self, value: float):
+        if not self._polar: self._calculatePolar()
+        self._r = value
+
+    @property
+    def lng(self) -> float:
+        """Gets the longitude"""
+        if not self._polar: self._calculatePolar()
+        return self._lng
+
+    @lng.setter
+    def lng(self, value: float):
+        if not self._polar: self._calculatePolar()
+        self._lng = value
+
+    @property
+    def lat(self) -> float:
+        """Gets the latitude"""
+        if not self._polar: self._calculatePolar()
+        return self._lat
+
+    @lat.setter
+    def lat(self, value: float):
+        if not self._polar: self._calculatePolar()
+        self._lat = value
+
+    def _calculatePolar(self):
+        """
+        Calculates the polar coordinates from the cartesian coordinates. Points on the z axis
+        get a longitude of 90 degrees, like the origin.
+        """
+        x, y, z = self.x, self.y, self.z
+        r = math.sqrt(x*x + y*y + z*z)
+        xy = math.sqrt(x*x*1.0 + y*y*1.0)
+        lat = math.pi/2 if r == 0 else math.acos(z / r)
+        lng = math.pi/2 if xy == 0 else math.acos(x / xy)
+        if y < 0:
+            lng = -lng
+        if not self._useRadians:
+            lat = math.degrees(lat)
+            lng = math.degrees(lng)
+        self._r = r
+        self._lat = lat
+        self._lng = lng
+        self._polar = True
+
     @classmethod
     def fromCartesian(cls, x: float, y: float, z: float, useRadians: bool = False) -> "Point":
         """
@@ -67,18 +127,7 @@ class Point(object):
         p.x = x
         p.y = y
         p.z = z
-        p.r = math.sqrt(x*x + y*y + z*z)
-        if p.r == 0:
-            p.lat = math.pi/2
-            p.lng = math.pi/2
-        else:
-            p.lat = math.acos(z / p.r)
-            p.lng = math.acos(x / math.sqrt(x*x*1.0 +y*y*1.0))
-        if y < 0:
-            p.lng = -p.lng
-        if not useRadians:
-            p.lat = math.degrees(p.lat)
-            p.lng = math.degrees(p.lng)
+        p._polar = False
         return p
 
     @classmethod
@@ -105,9 +154,9 @@ class Point(object):
             lngPrime = math.radians(lng)
 
         p = cls(useRadians)
-        p.r = r
-        p.lng = latPrime
-        p.lat = lngPrime
+        p._r = r
+        p._lng = lng
+        p._lat = lat
         p.x = r * math.sin(latPrime) * math.cos(lngPrime)
         p.y = r * math.sin(latPrime) * math.sin(lngPrime)
         p.z = r * math.cos(latPrime)
@@ -145,7 +194,8 @@ class Kinematics(object):
     """Determine cartesians from angles and vice versa."""
 
     def __init__(self, useRadians: bool = False, shoulderToElbow: float = 80.0,
-                 elbowToWrist: float = 80.0, wristToHand: float = 60.0):
+                 elbowToWrist: float = 80.0, wristToHand: float = 60.0,
+                 cacheSize: int = 0):
         """
         Initializes the object for the desired geometry
 
@@ -157,11 +207,60 @@ class Kinematics(object):
         :type elbowToWrist:     float
         :param wristToHand:     Lenght from wrist to gripper in mm
         :type wristToHand:      float
+        :param cacheSize:       Number of fromCartesian results to keep, least recently used
+                                first out. 0 disables the cache. Entries are keyed by the exact
+                                coordinates, so cached angles equal the uncached ones.
+        :type cacheSize:        int
         """
         self._useRadians = useRadians
         self._shoulderToElbow = shoulderToElbow
         self._elbowToWrist = elbowToWrist
         self._wristToHand = wristToHand
+        self._cacheSize = cacheSize
+        self._cache = OrderedDict() if cacheSize > 0 else None
+        self._cacheLock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def cacheStatistics(self) -> {}:
+        """Gets size, capacity, hits and misses of the fromCartesian cache"""
+        return {
+            'size': 0 if self._cache is None else len(self._cache),
+            'capacity': self._cacheSize,
+            'hits': self._hits,
+            'misses': self._misses
+        }
+
+    def clearCache(self):
+        """
+        Empties the fromCartesian cache and resets its statistics
+        """
+        with self._cacheLock:
+            if self._cache is not None:
+                self._cache.clear()
+            self._hits = 0
+            self._misses = 0
+
+    @property
+    def useRadians(self) -> bool:
+        """Gets whether angles are expressed in radians"""
+        return self._useRadians
+
+    @property
+    def shoulderToElbow(self) -> float:
+        """Gets the length from the shoulder joint to the elbow joint in mm"""
+        return self._shoulderToElbow
+
+    @property
+    def elbowToWrist(self) -> float:
+        """Gets the length from the elbow joint to the wrist in mm"""
+        return self._elbowToWrist
+
+    @property
+    def wristToHand(self) -> float:
+        """Gets the length from the wrist to the gripper in mm"""
+        return self._wristToHand
 
     def calculateAngle(self, leg1: float, leg2: float, opp: float) -> float:
         """
@@ -276,6 +375,29 @@ class Kinematics(object):
         :return:    Servo actuation angles to achieve desired coordinates
         :rtype:     (float, float, float)
         """
+        cache = self._cache
+        if cache is None:
+            return self._fromCartesian(x, y, z)
+
+        key = (x, y, z)
+        with self._cacheLock:
+            angles = cache.get(key)
+            if angles is not None:
+                cache.move_to_end(key)
+                self._hits += 1
+                return angles
+            self._misses += 1
+        angles = self._fromCartesian(x, y, z)
+        with self._cacheLock:
+            cache[key] = angles
+            if len(cache) > self._cacheSize:
+                cache.popitem(last=False)
+        return angles
+
+    def _fromCartesian(self, x: float, y: float, z: float) -> (float, float, float):
+        """
+        Uncached fromCartesian
+        """
         _pi = math.pi
         if not self._useRadians:
             _pi = 180
@@ -295,3 +417,281 @@ class Kinematics(object):
         a_elbow = c - a_shoulder
 
         return a_hip, a_shoulder, a_elbow
+
+    def jointRates(self, a0: float, a1: float, a2: float, dx: float, dy: float, dz: float) -> (float, float, float):
+        """
+        Calculates the servo angle changes for a small displacement of the claw point with the
+        Jacobian of the arm. Close to the fully stretched or folded arm the rates are infinite.
+
+        :param a0:      Hip angle
+        :type a0:       float
+        :param a1:      Shoulder angle
+        :type a1:       float
+        :param a2:      Elbow angle
+        :type a2:       float
+        :param dx:      x - displacement
+        :type dx:       float
+        :param dy:      y - displacement
+        :type dy:       float
+        :param dz:      z - displacement
+        :type dz:       float
+        :return:        Hip, shoulder and elbow angle changes
+        :rtype:         (float, float, float)
+        """
+        if not self._useRadians:
+            a0 = math.radians(a0)
+            a1 = math.radians(a1)
+            a2 = math.radians(a2)
+        s0 = math.sin(a0)
+        c0 = math.cos(a0)
+        s1 = math.sin(a1)
+        c1 = math.cos(a1)
+        s2 = math.sin(a2)
+        c2 = math.cos(a2)
+        u = self._shoulderToElbow * s1 + self._elbowToWrist * s2 + self._wristToHand
+        inner = s1 * c2 + c1 * s2               # sin(a1 + a2), the inner elbow angle
+        if inner <= IncrementalSolver.SINGULARITY or u <= 0:
+            return math.inf, math.inf, math.inf
+
+        du = dx * s0 + dy * c0
+        det = self._shoulderToElbow * self._elbowToWrist * inner
+        d0 = (dx * c0 - dy * s0) / u
+        d1 = self._elbowToWrist * (s2 * du - c2 * dz) / det
+        d2 = self._shoulderToElbow * (s1 * du + c1 * dz) / det
+        if self._useRadians:
+            return d0, d1, d2
+        return math.degrees(d0), math.degrees(d1), math.degrees(d2)
+
+    def _cart2polar_batch(self, x: np.ndarray, y: np.ndarray) -> (np.ndarray, np.ndarray):
+        """
+        Vectorized version of cart2polar
+
+        :param x:   x coordinates in mm
+        :type x:    numpy.ndarray
+        :param y:   y coordinates in mm
+        :type y:    numpy.ndarray
+        :return:    Polar coordinates
+        :rtype:     (numpy.ndarray, numpy.ndarray)
+        """
+        r = np.hypot(x, y)
+        # the sign is taken from y as in cart2polar, so y = -0.0 gives pi rather than -pi
+        alpha = np.arctan2(np.abs(y), x)
+        alpha = np.where(y < 0, -alpha, alpha)
+        if not self._useRadians:
+            alpha = np.degrees(alpha)
+        return r, alpha
+
+    def _polar2cart_batch(self, r, alpha: np.ndarray) -> (np.ndarray, np.ndarray):
+        """
+        Vectorized version of polar2cart
+
+        :param r:       Radius in mm (magnitude)
+        :type r:        numpy.ndarray
+        :param alpha:   Angle in degrees or radians (depending on construction)(bearing)
+        :type alpha:    numpy.ndarray
+        :return:        Cartesian coordinates
+        :rtype:         (numpy.ndarray, numpy.ndarray)
+        """
+        if not self._useRadians:
+            alpha = np.radians(alpha)
+        return r * np.cos(alpha), r * np.sin(alpha)
+
+    def _calculateAngle_batch(self, leg1, leg2, opp) -> np.ndarray:
+        """
+        Vectorized version of calculateAngle. Invalid triangles give NaN instead of raising.
+
+        :param leg1:    Length of leg one
+        :type leg1:     float or numpy.ndarray
+        :param leg2:    Length of leg two
+        :type leg2:     float or numpy.ndarray
+        :param opp:     Lengths of opposing side
+        :type opp:      numpy.ndarray
+        :return:        The angles between the legs
+        :rtype:         numpy.ndarray
+        """
+        leg1, leg2, opp = np.broadcast_arrays(leg1, leg2, opp)
+        degenerate = (leg1 == 0) | (leg2 == 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = ((leg1*leg1 + leg2*leg2 - opp*opp) * 1.0)/(2.0 * leg1 * leg2)
+        c = np.where(degenerate, 1.0, c)
+        invalid = (c > 1) | (c < -1)
+        alpha = np.arccos(np.clip(c, -1.0, 1.0))
+        alpha[invalid] = np.nan
+        if not self._useRadians:
+            alpha = np.degrees(alpha)
+        alpha[degenerate] = 0.0
+        return alpha
+
+    def toCartesian_batch(self, angles: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of toCartesian
+
+        :param angles:  Hip, shoulder and elbow angles, one row per arm position
+        :type angles:   numpy.ndarray of shape (N, 3)
+        :return:        Cartesian coordinates, one row (x, y, z) per arm position
+        :rtype:         numpy.ndarray of shape (N, 3)
+        """
+        angles = np.asarray(angles, dtype=float).reshape(-1, 3)
+        _pi = math.pi
+        if not self._useRadians:
+            _pi = 180
+
+        u01, v01 = self._polar2cart_batch(self._shoulderToElbow, _pi/2 - angles[:, 1])
+        u12, v12 = self._polar2cart_batch(self._elbowToWrist, angles[:, 2] - _pi/2)
+        u = u01 + u12 + self._wristToHand
+        v = v01 + v12
+
+        # note x/y reversal as in toCartesian
+        y, x = self._polar2cart_batch(u, angles[:, 0])
+        return np.stack((x, y, v), axis=1)
+
+    def fromCartesian_batch(self, xyz: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of fromCartesian. Points the arm geometry cannot reach come back as
+        rows of NaN instead of raising, so np.isnan(result).any(axis=1) masks them.
+
+        :param xyz: Coordinates to be achieved, one row (x, y, z) per point
+        :type xyz:  numpy.ndarray of shape (N, 3)
+        :return:    Hip, shoulder and elbow angles, one row per point
+        :rtype:     numpy.ndarray of shape (N, 3)
+        """
+        xyz = np.asarray(xyz, dtype=float).reshape(-1, 3)
+        _pi = math.pi
+        if not self._useRadians:
+            _pi = 180
+
+        r, a_hip = self._cart2polar_batch(xyz[:, 1], xyz[:, 0])
+        r -= self._wristToHand
+        r1, theta = self._cart2polar_batch(r, xyz[:, 2])
+
+        b = self._calculateAngle_batch(self._shoulderToElbow, r1, self._elbowToWrist)
+        c = self._calculateAngle_batch(self._shoulderToElbow, self._elbowToWrist, r1)
+
+        a_shoulder = _pi/2 - b - theta
+        a_elbow = c - a_shoulder
+        angles = np.stack((a_hip, a_shoulder, a_elbow), axis=1)
+        angles[np.isnan(b) | np.isnan(c)] = np.nan
+        return angles
+
+
+class IncrementalSolver(object):
+    """
+    Inverse kinematics for small steps. The joint angles are updated from the previous solution
+    with the analytic Jacobian of the arm linkage instead of being solved from scratch. If the
+    step is too long, the arm is close to being fully stretched or folded, or the position error
+    of the update exceeds the tolerance, the closed-form Kinematics.fromCartesian is used.
+    """
+
+    # sine of the inner elbow angle below which the Jacobian is considered singular
+    SINGULARITY = 1e-3
+
+    def __init__(self, kinematics: Kinematics, tolerance: float = 0.01, maxStep: float = 10.0,
+                 iterations: int = 2):
+        """
+        Initializes the solver
+
+        :param kinematics:  The closed-form kinematics used for the fallback and the arm geometry
+        :type kinematics:   Kinematics
+        :param tolerance:   Largest accepted position error of an incremental update in mm
+        :type tolerance:    float
+        :param maxStep:     Longest step in mm for which an incremental update is attempted
+        :type maxStep:      float
+        :param iterations:  Number of Jacobian updates tried before falling back to the closed form
+        :type iterations:   int
+        """
+        self._kinematics = kinematics
+        self._tolerance2 = tolerance * tolerance
+        self._maxStep2 = maxStep * maxStep
+        self._iterations = iterations
+        self._state = None
+        self._incremental = 0
+        self._fallbacks = 0
+
+    @property
+    def kinematics(self) -> Kinematics:
+        """Gets the closed-form kinematics"""
+        return self._kinematics
+
+    @property
+    def statistics(self) -> {}:
+        """Gets the number of incremental and closed-form solutions"""
+        return {'incremental': self._incremental, 'fallbacks': self._fallbacks}
+
+    def reset(self):
+        """
+        Forgets the previous solution, so the next solve uses the closed form
+        """
+        self._state = None
+
+    def _forward(self, t0: float, t1: float, t2: float) -> tuple:
+        """
+        Forward kinematics in radians, keeping the sines and cosines for the Jacobian
+
+        :return:    Angles, position, sines and cosines and the horizontal reach u
+        :rtype:     tuple
+        """
+        k = self._kinematics
+        s0 = math.sin(t0)
+        c0 = math.cos(t0)
+        s1 = math.sin(t1)
+        c1 = math.cos(t1)
+        s2 = math.sin(t2)
+        c2 = math.cos(t2)
+        u = k._shoulderToElbow * s1 + k._elbowToWrist * s2 + k._wristToHand
+        z = k._shoulderToElbow * c1 - k._elbowToWrist * c2
+        return (t0, t1, t2, u * s0, u * c0, z, s0, c0, s1, c1, s2, c2, u)
+
+    def solve(self, x: float, y: float, z: float) -> (float, float, float):
+        """
+        Calculates the servo actuation angles for a cartesian coordinate, incrementally from
+        the previous solution where possible
+
+        :param x:   x - coordiante to be achieved
+        :type x:    float
+        :param y:   y - coordinate to be achieved
+        :type y:    float
+        :param z:   z - coordinate to be achieved
+        :type z:    float
+        :return:    Servo actuation angles to achieve desired coordinates
+        :rtype:     (float, float, float)
+        """
+        k = self._kinematics
+        state = self._state
+        if state is not None:
+            dx = x - state[3]
+            dy = y - state[4]
+            dz = z - state[5]
+            if dx*dx + dy*dy + dz*dz <= self._maxStep2:
+                # Newton steps, the first one usually lands within the tolerance for short steps
+                for _ in range(self._iterations):
+                    t0, t1, t2, px, py, pz, s0, c0, s1, c1, s2, c2, u = state
+                    inner = s1 * c2 + c1 * s2           # sin(t1 + t2), the inner elbow angle
+                    if inner <= self.SINGULARITY or u <= 0:
+                        break
+                    # hip: rotation in the horizontal plane, then the 2x2 system of the arm plane
+                    d0 = (dx * c0 - dy * s0) / u
+                    du = dx * s0 + dy * c0
+                    det = k._shoulderToElbow * k._elbowToWrist * inner
+                    d1 = k._elbowToWrist * (s2 * du - c2 * dz) / det
+                    d2 = k._shoulderToElbow * (s1 * du + c1 * dz) / det
+                    state = self._forward(t0 + d0, t1 + d1, t2 + d2)
+                    dx = x - state[3]
+                    dy = y - state[4]
+                    dz = z - state[5]
+                    if dx*dx + dy*dy + dz*dz <= self._tolerance2:
+                        if -math.pi < state[0] <= math.pi and state[8] * state[11] + state[9] * state[10] > 0:
+                            self._state = state
+                            self._incremental += 1
+                            if k._useRadians:
+                                return state[0], state[1], state[2]
+                            return math.degrees(state[0]), math.degrees(state[1]), math.degrees(state[2])
+                        break
+
+        self._state = None
+        angles = k.fromCartesian(x, y, z)
+        self._fallbacks += 1
+        if k._useRadians:
+            self._state = self._forward(*angles)
+        else:
+            self._state = self._forward(math.radians(angles[0]), math.radians(angles[1]), math.radians(angles[2]))
+        return angles
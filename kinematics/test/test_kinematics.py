@@ -0,0 +1,194 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for the inverse kinematics."""
+import math
+import random
+import unittest
+import numpy as np
+from kinematics import Kinematics, IncrementalSolver
+
+
+class TestKinematicsCache(unittest.TestCase):
+    """fromCartesian with the LRU cache"""
+
+    def setUp(self):
+        random.seed(7)
+        self.points = [(random.uniform(-150, 150), random.uniform(20, 200), random.uniform(-50, 150)) for _ in range(2000)]
+
+    def solve(self, kinematics, points):
+        angles = []
+        for point in points:
+            try:
+                angles.append(kinematics.fromCartesian(*point))
+            except Exception:
+                angles.append(None)
+        return angles
+
+    def test_cached_angles_are_exact(self):
+        cached = Kinematics(False, 80, 80, 68, 256)
+        uncached = Kinematics(False, 80, 80, 68)
+        points = self.points + [(x + 1e-9, y, z) for x, y, z in self.points]
+        self.assertEqual(self.solve(cached, points + points), self.solve(uncached, points + points))
+
+    def test_neighbouring_points_are_separate_entries(self):
+        kinematics = Kinematics(False, 80, 80, 68, 16)
+        point = (20.0, 150.0, 40.0)
+        neighbour = (20.0 + 1e-6, 150.0, 40.0)
+        angles = kinematics.fromCartesian(*point)
+        self.assertNotEqual(kinematics.fromCartesian(*neighbour), angles)
+        self.assertEqual(kinematics.fromCartesian(*point), angles)
+        statistics = kinematics.cacheStatistics
+        self.assertEqual((statistics['size'], statistics['hits'], statistics['misses']), (2, 1, 2))
+
+    def test_repeated_points_hit(self):
+        kinematics = Kinematics(False, 80, 80, 68, 4096)
+        points = self.points[:100]
+        self.solve(kinematics, points)
+        self.solve(kinematics, points)
+        statistics = kinematics.cacheStatistics
+        reachable = len([a for a in self.solve(Kinematics(False, 80, 80, 68), points) if a is not None])
+        self.assertEqual(statistics['hits'], reachable)
+        self.assertEqual(statistics['misses'], 200 - reachable)
+
+    def test_capacity_and_clear(self):
+        kinematics = Kinematics(False, 80, 80, 68, 10)
+        self.solve(kinematics, self.points[:100])
+        self.assertLessEqual(kinematics.cacheStatistics['size'], 10)
+        kinematics.clearCache()
+        statistics = kinematics.cacheStatistics
+        self.assertEqual((statistics['size'], statistics['hits'], statistics['misses']), (0, 0, 0))
+
+
+class TestBatch(unittest.TestCase):
+    """The vectorized kinematics against the scalar functions"""
+
+    def setUp(self):
+        random.seed(13)
+        self.points = [(random.uniform(-250, 250), random.uniform(-250, 250), random.uniform(-150, 200)) for _ in range(2000)]
+        # on the axes, behind the arm and at the origin
+        self.points += [(0.0, 0.0, 0.0), (0.0, 0.0, 50.0), (-100.0, 0.0, 20.0), (-100.0, -0.0, 20.0), (0.0, -120.0, 10.0)]
+
+    def test_from_cartesian(self):
+        for useRadians in (False, True):
+            kinematics = Kinematics(useRadians, 80, 80, 68)
+            batch = kinematics.fromCartesian_batch(np.array(self.points))
+            unreachable = 0
+            for point, angles in zip(self.points, batch):
+                try:
+                    expected = kinematics.fromCartesian(*point)
+                except Exception:
+                    unreachable += 1
+                    self.assertTrue(np.isnan(angles).all(), point)
+                    continue
+                np.testing.assert_allclose(angles, expected, rtol=0, atol=1e-9, err_msg=str(point))
+            self.assertGreater(unreachable, 0)
+            self.assertLess(unreachable, len(self.points))
+
+    def test_to_cartesian(self):
+        for useRadians in (False, True):
+            kinematics = Kinematics(useRadians, 80, 80, 68)
+            scale = np.pi / 180 if useRadians else 1.0
+            angles = [(random.uniform(-90, 90) * scale, random.uniform(0, 150) * scale, random.uniform(-30, 120) * scale)
+                      for _ in range(500)]
+            batch = kinematics.toCartesian_batch(np.array(angles))
+            np.testing.assert_allclose(batch, [kinematics.toCartesian(*a) for a in angles], rtol=0, atol=1e-9)
+
+
+class TestIncrementalSolver(unittest.TestCase):
+    """IncrementalSolver against the closed form"""
+
+    def setUp(self):
+        self.kinematics = Kinematics(False, 80, 80, 68)
+
+    def path(self, start, end, steps):
+        return [tuple(a + (b - a) * i / steps for a, b in zip(start, end)) for i in range(steps + 1)]
+
+    def assertSolves(self, angles, point, tolerance=0.01):
+        error = math.sqrt(sum((a - b) ** 2 for a, b in zip(self.kinematics.toCartesian(*angles), point)))
+        self.assertLessEqual(error, tolerance, point)
+
+    def test_small_steps_are_incremental(self):
+        for useRadians in (False, True):
+            self.kinematics = Kinematics(useRadians, 80, 80, 68)
+            solver = IncrementalSolver(self.kinematics)
+            points = self.path((-40.0, 120.0, 20.0), (60.0, 140.0, 60.0), 100)
+            for point in points:
+                angles = solver.solve(*point)
+                self.assertSolves(angles, point)
+                closed = self.kinematics.fromCartesian(*point)
+                np.testing.assert_allclose(angles, closed, rtol=0, atol=0.001 if useRadians else 0.05)
+            self.assertEqual(solver.statistics, {'incremental': len(points) - 1, 'fallbacks': 1})
+
+    def test_large_step_falls_back(self):
+        solver = IncrementalSolver(self.kinematics, maxStep=10.0)
+        solver.solve(0.0, 120.0, 40.0)
+        self.assertEqual(solver.solve(30.0, 120.0, 40.0), self.kinematics.fromCartesian(30.0, 120.0, 40.0))
+        self.assertEqual(solver.statistics, {'incremental': 0, 'fallbacks': 2})
+        solver.solve(31.0, 120.0, 40.0)
+        self.assertEqual(solver.statistics, {'incremental': 1, 'fallbacks': 2})
+
+    def test_reset_falls_back(self):
+        solver = IncrementalSolver(self.kinematics)
+        solver.solve(0.0, 120.0, 40.0)
+        solver.reset()
+        self.assertEqual(solver.solve(1.0, 120.0, 40.0), self.kinematics.fromCartesian(1.0, 120.0, 40.0))
+        self.assertEqual(solver.statistics, {'incremental': 0, 'fallbacks': 2})
+
+    def test_unreachable_point_raises(self):
+        solver = IncrementalSolver(self.kinematics)
+        solver.solve(0.0, 200.0, 40.0)
+        with self.assertRaises(Exception):
+            solver.solve(0.0, 400.0, 40.0)
+
+
+class TestJointRates(unittest.TestCase):
+    """jointRates against differences of the closed form"""
+
+    def test_rates_match_closed_form(self):
+        random.seed(17)
+        for useRadians in (False, True):
+            kinematics = Kinematics(useRadians, 80, 80, 68)
+            for _ in range(200):
+                point = (random.uniform(-100, 100), random.uniform(80, 180), random.uniform(-20, 100))
+                direction = [random.uniform(-1, 1) for _ in range(3)]
+                try:
+                    angles = kinematics.fromCartesian(*point)
+                    h = 1e-4
+                    moved = kinematics.fromCartesian(*(p + h * d for p, d in zip(point, direction)))
+                except Exception:
+                    continue
+                inner = angles[1] + angles[2] if useRadians else math.radians(angles[1] + angles[2])
+                if math.sin(inner) < 0.05:
+                    # close to the stretched or folded arm the differences are not linear
+                    continue
+                rates = kinematics.jointRates(*angles, *direction)
+                expected = [(b - a) / h for a, b in zip(angles, moved)]
+                np.testing.assert_allclose(rates, expected, rtol=1e-3, atol=1e-4)
+
+    def test_stretched_arm_is_singular(self):
+        kinematics = Kinematics(False, 80, 80, 68)
+        self.assertEqual(kinematics.jointRates(0.0, 90.0, 90.0, 1.0, 0.0, 0.0), (math.inf, math.inf, math.inf))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Unit tests for Point."""
+import math
+import unittest
+from kinematics import Point
+
+
+def eager_polar(x: float, y: float, z: float) -> (float, float, float):
+    """Polar coordinates in degrees as the eager Point computed them."""
+    r = math.sqrt(x*x + y*y + z*z)
+    lat = 90.0 if r == 0 else math.degrees(math.acos(z / r))
+    lng = 90.0 if x == 0 and y == 0 else math.degrees(math.atan2(y, x))
+    return r, lng, lat
+
+
+class TestPoint(unittest.TestCase):
+    """Lazy polar coordinates of Point"""
+
+    points = [(10.0, 20.0, 30.0), (-35.5, 120.25, -12.0), (50.0, -80.0, 5.0), (0.0, 0.0, 40.0),
+              (0.0, 0.0, 0.0), (-60.0, 0.0, 0.0)]
+
+    def test_polar_is_computed_on_first_access(self):
+        p = Point.fromCartesian(3.0, 4.0, 0.0)
+        self.assertFalse(p._polar)
+        self.assertEqual(p.r, 5.0)
+        self.assertTrue(p._polar)
+        p.x = 6.0
+        # the cartesian coordinates are not tracked after the first access
+        self.assertEqual(p.r, 5.0)
+
+    def test_polar_matches_eager_values(self):
+        for x, y, z in self.points:
+            p = Point.fromCartesian(x, y, z)
+            r, lng, lat = eager_polar(x, y, z)
+            self.assertAlmostEqual(p.r, r)
+            self.assertAlmostEqual(p.lng, lng)
+            self.assertAlmostEqual(p.lat, lat)
+            self.assertEqual(p.toDict(), {'x': x, 'y': y, 'z': z, 'r': p.r, 'lng': p.lng, 'lat': p.lat})
+
+    def test_polar_in_radians(self):
+        for x, y, z in self.points:
+            p = Point.fromCartesian(x, y, z, True)
+            r, lng, lat = eager_polar(x, y, z)
+            self.assertAlmostEqual(p.lng, math.radians(lng))
+            self.assertAlmostEqual(p.lat, math.radians(lat))
+
+    def test_setter_keeps_the_other_coordinates(self):
+        p = Point.fromCartesian(10.0, 20.0, 30.0)
+        p.r = 1.0
+        r, lng, lat = eager_polar(10.0, 20.0, 30.0)
+        self.assertEqual(p.r, 1.0)
+        self.assertAlmostEqual(p.lng, lng)
+        self.assertAlmostEqual(p.lat, lat)
+
+    def test_from_polar_round_trip(self):
+        for x, y, z in self.points[:4]:
+            for useRadians in (False, True):
+                p = Point.fromCartesian(x, y, z, useRadians)
+                q = Point.fromPolar(p.r, p.lng, p.lat, useRadians)
+                self.assertEqual((q.r, q.lng, q.lat), (p.r, p.lng, p.lat))
+                self.assertAlmostEqual(q.x, x)
+                self.assertAlmostEqual(q.y, y)
+                self.assertAlmostEqual(q.z, z)
+
+    def test_slots(self):
+        p = Point.fromCartesian(1.0, 2.0, 3.0)
+        self.assertFalse(hasattr(p, '__dict__'))
+        with self.assertRaises(AttributeError):
+            p.w = 4.0
+
+
+if __name__ == '__main__':
+    unittest.main()
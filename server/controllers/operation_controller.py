@@ -154,31 +154,29 @@ def operate(id, operations):  # noqa: E501
             if len(operations) > 25:
                 return 'Too many operations. Reduce the number of operations to 10 or less', 413
             arm = me_arm.get(id)
+            steps = []
             for dummy, val in enumerate(operations):
                 if val.type == 'moveTo':
                     if val.target.x is None or val.target.y is None or val.target.z is None:
                         target = Kinematics_Point.fromPolar(val.target.r, val.target.lat, val.target.lng)
                     else:
                         target = Kinematics_Point.fromCartesian(val.target.x, val.target.y, val.target.z)
-                    num_ops += arm.go_to_point(target, 2.5, False)
-                    common.status[id].position = Point(
-                        arm.position.x,
-                        arm.position.y,
-                        arm.position.z,
-                        arm.position.r,
-                        arm.position.lat,
-                        arm.position.lng)
-                elif val.type == 'grab':
-                    arm.close()
-                    num_ops += 1
-                elif val.type == 'release':
-                    arm.open()
-                    num_ops += 1
-                elif val.type == 'test':
-                    num_ops += arm.test(False)
+                    steps.append((val.type, target))
+                elif val.type in ('grab', 'release', 'test'):
+                    steps.append((val.type, None))
                 else:
                     raise ValueError(Operation)
-                _restart_timeout(id)
+            # unreachable points are left out of the trajectory, as go_to_point(..., False) skips them
+            trajectory = arm.compile_operations(steps, 2.5)
+            num_ops = arm.execute_trajectory(trajectory)
+            common.status[id].position = Point(
+                arm.position.x,
+                arm.position.y,
+                arm.position.z,
+                arm.position.r,
+                arm.position.lat,
+                arm.position.lng)
+            _restart_timeout(id)
     except ValueError:
         return 'Incorrect operation type. Only moveTo, grab and release are supported', 400
 
@@ -22,6 +22,9 @@
 # coding: utf-8
 """Unit Tests for the meArm Operations controller."""
 from __future__ import absolute_import
+import uuid
+import datetime
+from unittest import mock
 from flask import json
 from six import BytesIO
 from server.models.inline_response200 import InlineResponse200  # noqa: E501
@@ -29,7 +32,10 @@ from server.models.inline_response2001 import InlineResponse2001  # noqa: E501
 from server.models.inline_response2002 import InlineResponse2002  # noqa: E501
 from server.models.operations import Operations  # noqa: E501
 from server.models.status import Status  # noqa: E501
+from server.controllers import operation_controller
+from server import common
 from server.test import BaseTestCase
+from kinematics import Point as Kinematics_Point
 
 
 class TestOperationController(BaseTestCase):
@@ -75,6 +81,44 @@ class TestOperationController(BaseTestCase):
         self.assert200(response,
                        'Response body is : ' + response.data.decode('utf-8'))
 
+    def test_operate_skips_unreachable_targets(self):
+        """Test case for operate with an unreachable target
+
+        The unreachable target is skipped and the other operations are executed.
+        """
+        arm = mock.MagicMock()
+        arm.position = Kinematics_Point.fromCartesian(0.0, 150.0, 50.0)
+        trajectory = arm.compile_operations.return_value
+        trajectory.unreachable_targets = [0]
+        arm.execute_trajectory.return_value = 1
+        token = uuid.uuid4()
+        state = {
+            'token': {'arm1': token},
+            'status': {'arm1': Status(common.HOSTNAME, common.VERSION, True, datetime.datetime.now(), 0, None)},
+            'inactivity_timer': {'arm1': None}
+        }
+        operations = [{'type': 'moveTo', 'target': {'x': 400.0, 'y': 400.0, 'z': 400.0}},
+                      {'type': 'grab'}]
+        with mock.patch.object(operation_controller, 'me_arm') as arms, mock.patch.dict(common.__dict__, state):
+            arms.get_names.return_value = ['arm1']
+            arms.get.return_value = arm
+            try:
+                response = self.client.open(
+                    '/Avanade.meArm/1.0.0/arm/arm1/operate',
+                    method='POST',
+                    data=json.dumps(operations),
+                    content_type='application/json',
+                    headers=[('token', str(token))])
+            finally:
+                if common.inactivity_timer['arm1'] is not None:
+                    common.inactivity_timer['arm1'].cancel()
+        self.assert200(response,
+                       'Response body is : ' + response.data.decode('utf-8'))
+        self.assertEqual(response.json['numberOfMovements'], 1)
+        steps = arm.compile_operations.call_args[0][0]
+        self.assertEqual([step[0] for step in steps], ['moveTo', 'grab'])
+        arm.execute_trajectory.assert_called_once_with(trajectory)
+
 
 if __name__ == '__main__':
     import unittest
@@ -22,6 +22,7 @@
 # pylint: disable=C0103
 """Simple test for servo actuation"""
 import math
+import numpy as np
 from random import randint
 from kinematics import Kinematics
 
@@ -86,7 +87,28 @@ def test():
 
     print("test completed")
 
+def batch_test():
+    """Compares the batch kinematics against the scalar versions on random points and angles.
+    """
+    points = np.random.uniform(-250, 250, (100000, 3))
+    angles = kinematics.fromCartesian_batch(points)
+    failed = 0
+    for point, batch in zip(points, angles):
+        try:
+            scalar = kinematics.fromCartesian(*point.tolist())
+        except Exception:
+            scalar = (math.nan, math.nan, math.nan)
+        if not np.array_equal(np.array(scalar), batch, equal_nan=True):
+            failed += 1
+    angles = np.random.uniform(-89.5, 89.5, (100000, 3))
+    points = kinematics.toCartesian_batch(angles)
+    for angle, batch in zip(angles, points):
+        if not np.array_equal(np.array(kinematics.toCartesian(*angle.tolist())), batch):
+            failed += 1
+    print("batch test completed, %d mismatches" % failed)
+
 if random:
     random_test()
+    batch_test()
 else:
     test()
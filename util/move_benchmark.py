@@ -0,0 +1,86 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Measures CPU time and memory allocations per step of long straight line moves on the simulated backend"""
+import os
+import sys
+import json
+import time
+import tracemalloc
+os.environ['MEARM_I2C_BACKEND'] = 'simulated'
+os.environ.setdefault('MEARM_I2C_LATENCY', '0')
+os.environ.setdefault('MEARM_I2C_BUS_SPEED', '0')
+from arm import me_arm
+from kinematics import Point
+
+resolution = 0.5
+repeat = 20
+
+with open('me_arm.json') as file:
+    data = json.load(file)
+me_arm.boot_from_dict(data)
+arm = me_arm.get(list(me_arm.get_names())[0])
+arm.turn_on()
+arm.reachability                    # wait for the index instead of timing its build
+start = arm.position
+a = Point.fromCartesian(start.x - 60, start.y - 20, start.z + 20)
+b = Point.fromCartesian(start.x + 60, start.y - 20, start.z + 20)
+arm.go_directly_to_point(a)
+
+def point_size(point: Point) -> int:
+    """Returns the memory used by a point including its instance dictionary, if any.
+    :param point: The point.
+    :type point: Point
+    :return: The size in bytes.
+    :rtype: int
+    """
+    size = sys.getsizeof(point)
+    if hasattr(point, '__dict__'):
+        size += sys.getsizeof(point.__dict__)
+    return size
+
+def measure(mode: str) -> float:
+    """Returns the CPU time per step of repeated moves between a and b in an inverse kinematics mode.
+    :param mode: The inverse kinematics mode, 'closed-form' or 'incremental'.
+    :type mode: str
+    :return: CPU time per step in seconds.
+    :rtype: float
+    """
+    arm.ik_mode = mode
+    arm.go_directly_to_point(a)
+    steps = 0
+    begin = time.process_time()
+    for i in range(repeat):
+        steps += arm.go_to_point(b if i % 2 == 0 else a, resolution)
+    elapsed = time.process_time() - begin
+    print("%s: %d steps, %.1f us CPU per step %s" % (mode, steps, elapsed / steps * 1e6, arm.ik_statistics))
+    return elapsed / steps
+
+for mode in ('closed-form', 'incremental'):
+    measure(mode)
+
+tracemalloc.start()
+arm.go_to_point(b if repeat % 2 == 0 else a, resolution)
+peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+
+print("%d bytes peak traced memory during a move, %d bytes per Point" % (peak, point_size(Point.fromCartesian(1, 2, 3))))
@@ -0,0 +1,57 @@
+# Copyright (c) 2018 Avanade
+# Author: Thor Schueler
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# pylint: disable=C0103
+"""Benchmark of the angle to ticks calculation of controller.Servo on the simulated backend"""
+import time
+import numpy as np
+from random import uniform
+from controller import PCA9685, Servo, MiuzeiSG90Attributes
+
+count = 200000
+pwm = PCA9685(0x40, None, backend='simulated', simulation={'latency': 0, 'bus_speed': 0})
+attributes = MiuzeiSG90Attributes()
+servo = Servo(pwm, 0, attributes)
+angles = [uniform(attributes.min_angle + 0.01, attributes.max_angle - 0.01) for _ in range(count)]
+
+def measure(name: str, operation):
+    """Runs an operation over all angles and prints the calls per second.
+    :param name: The name of the operation.
+    :type name: str
+    :param operation: Callable taking an angle.
+    :type operation: callable
+    """
+    start = time.perf_counter()
+    for angle in angles:
+        operation(angle)
+    elapsed = time.perf_counter() - start
+    print("%-40s %12.0f calls/s" % (name, count / elapsed))
+
+print("Lookup table: %d entries for %d ticks" % (len(servo._table), servo._table[-1] - servo._table[0]))
+measure("interpolation (before)", servo._calculate_servo_ticks_from_angle)
+measure("lookup table (after)", servo._lookup_ticks)
+measure("stage_angle", servo.stage_angle)
+
+batch = np.array(angles)
+start = time.perf_counter()
+servo.ticks_from_angles(batch)
+elapsed = time.perf_counter() - start
+print("%-40s %12.0f angles/s" % ("ticks_from_angles (batch)", count / elapsed))